@@ -8,14 +8,18 @@ if str(ROOT) not in sys.path:
 
 
 import streamlit as st
-from sentence_transformers import SentenceTransformer
-
-from rag.retrieval.retrieve import Retriever
-from rag.retrieval.context import build_context
-from rag.llm.gemini_client import get_client, generate_answer
-from rag.prompts import SYSTEM_PROMPT_ALL, SYSTEM_PROMPT_PROJECT
+from rag.embeddings import load_embedder as create_embedder
+from rag.engine import QueryEngine
+from rag.retrieval.registry import RetrieverRegistry
+from rag.retrieval.routing import load_router
+from rag.retrieval.query_embeddings import encode_query
+from rag.retrieval.rerank import CrossEncoderReranker
+from rag.llm.gemini_client import get_client, get_scheduler, generate_answer_stream
+from rag.llm.answer_cache import AnswerCache
+from rag.llm.scheduler import is_rate_limit_error
+from rag.service import connect as connect_service
+from rag.tracing import JsonlSink, set_sink, span, start_trace
 from config import PROJECTS as PROJECT_CONFIG
-from sentence_transformers import util
 import config
 PROJECT_ROUTING = config.PROJECT_ROUTING
 
@@ -69,15 +73,93 @@ if "query_count" not in st.session_state:
     st.session_state.query_count = 0
 
 MAX_QUERIES_PER_SESSION = 10
-MAX_CHUNKS = 10  # keep context small for free-tier stability
 
 
 # -------------------------------------------------
 # Cached resources
 # -------------------------------------------------
+@st.cache_resource
+def init_tracing():
+    # One process-wide sink; every query trace is appended to it
+    if config.TRACE_PATH is not None:
+        set_sink(JsonlSink(config.TRACE_PATH))
+    return True
+
+
+@st.cache_resource
+def load_service():
+    # (RemoteEmbedder, RemoteRegistry): one model copy per host, shared by all workers
+    return connect_service(config.SERVICE_URL)
+
+
 @st.cache_resource
 def load_embedder():
-    return SentenceTransformer("all-MiniLM-L6-v2")
+    if config.SERVICE_URL:
+        return load_service()[0]
+
+    # The embedding stack (torch or onnxruntime) is imported here, on first use
+    with span("load_embedder", model=config.EMBEDDING_MODEL, backend=config.EMBEDDING_BACKEND):
+        return create_embedder(
+            config.EMBEDDING_MODEL, config.EMBEDDING_BACKEND, config.EMBEDDING_MODEL_DIR
+        )
+
+
+@st.cache_resource
+def load_registry():
+    if config.SERVICE_URL:
+        return load_service()[1]
+
+    # Shared across sessions: each index is read from disk once per process
+    return RetrieverRegistry(
+        embedder=load_embedder(),
+        hybrid=config.HYBRID_RETRIEVAL,
+        rrf_k=config.RRF_K,
+    )
+
+
+@st.cache_resource
+def load_project_router():
+    # Stale matrices (routing or model changed) are rebuilt on load
+    return load_router(
+        embedder=load_embedder(),
+        path=config.ROUTING_MATRIX_PATH,
+        routing=PROJECT_ROUTING,
+    )
+
+
+@st.cache_resource
+def load_answer_cache():
+    return AnswerCache(
+        path=config.ANSWER_CACHE_PATH,
+        ttl_seconds=config.ANSWER_CACHE_TTL_SECONDS,
+        max_entries=config.ANSWER_CACHE_MAX_ENTRIES,
+        similarity_threshold=config.ANSWER_CACHE_SIMILARITY,
+    )
+
+
+@st.cache_resource
+def load_engine():
+    return QueryEngine(
+        embedder=load_embedder(),
+        registry=load_registry(),
+        project_indexes=PROJECTS,
+        router=load_project_router(),
+        combined_index=config.COMBINED_INDEX_PATH,
+        reranker=load_reranker(),
+        answer_cache=load_answer_cache(),
+        token_budget=config.CONTEXT_TOKEN_BUDGET,
+        mmr_lambda=config.MMR_LAMBDA,
+    )
+
+
+@st.cache_resource
+def load_reranker():
+    if not config.RERANK_ENABLED:
+        return None
+    return CrossEncoderReranker(
+        model_name=config.RERANK_MODEL,
+        budget_ms=config.RERANK_BUDGET_MS,
+    )
 
 
 # -------------------------------------------------
@@ -173,82 +255,99 @@ if st.button("Ask question") and question:
         st.stop()
 
     st.session_state.query_count += 1
+    init_tracing()
+
+    context = None
+    context_report = None
+    rerank_report = None
+    trace = None
 
     with st.spinner("Retrieving and reasoning..."):
         try:
-            embedder = load_embedder()
-            docs = []
-
-            if project_name == "All Projects":
-                # --- Stage 1: project routing ---
-                query_emb = embedder.encode(question, convert_to_tensor=True)
-
-                project_scores = []
-                for project, desc in PROJECT_ROUTING.items():
-                    desc_emb = embedder.encode(desc, convert_to_tensor=True)
-                    score = util.cos_sim(query_emb, desc_emb).item()
-                    project_scores.append((project, score))
-
-                # Select top 3 most relevant projects
-                top_projects = [
-                    p for p, _ in sorted(project_scores, key=lambda x: x[1], reverse=True)[:3]
-                ]
-
-                # --- Stage 2: retrieve only from selected projects ---
-                docs = []
-                for project in top_projects:
-                    retriever = Retriever(
-                        index_dir=PROJECTS[project],
-                        embedder=embedder,
+            with start_trace("query", scope=project_name) as root:
+                trace = root.trace
+                embedder = load_embedder()
+                engine = load_engine()
+
+                # Encoded once; routing, retrieval and the answer cache share this vector
+                query_emb = encode_query(embedder, question)
+
+                # Routing (All Projects), retrieval, optional rerank, token-budgeted packing
+                retrieval = engine.retrieve(question, scope=project_name, query_vec=query_emb)
+                context = retrieval.context
+                context_report = retrieval.context_report
+                rerank_report = retrieval.rerank_report
+
+                # Repeated (or near-identical) questions skip Gemini entirely
+                cached = engine.lookup_cached(retrieval)
+
+                if cached is not None:
+                    answer_text = cached.answer
+                    model_label = cached.model
+                    st.markdown(answer_text.replace("\\n", "\n"))
+                    st.caption(f"🧠 Model used: {model_label}")
+                    st.caption(
+                        f"⚡ Answer cache: hit ({cached.match}, similarity {cached.similarity:.2f})"
+                    )
+                else:
+                    client = get_client()
+
+                    stream = generate_answer_stream(
+                        client=client,
+                        context=context,
+                        question=question,
+                        system_prompt=engine.system_prompt(project_name),
                     )
-                    project_docs = retriever.retrieve(question, top_k=5)
-
-                    for d in project_docs:
-                        d["project"] = project
-
-                    docs.extend(project_docs)
 
-            else:
-                retriever = Retriever(
-                    index_dir=PROJECTS[project_name],
-                    embedder=embedder,
-                )
-                docs = retriever.retrieve(question, top_k=7)
+                    # Render tokens as they arrive (newline fix applied per chunk)
+                    st.write_stream(chunk.replace("\\n", "\n") for chunk in stream)
+                    answer_text = stream.text
+                    model_label = stream.model_label
 
-            # Hard cap context for stability
-            docs = docs[:MAX_CHUNKS]
+                    # Model transparency + timing, once the stream completed
+                    st.caption(
+                        f"🧠 Model used: {model_label} · "
+                        f"first token {stream.first_token_s or 0:.1f}s · "
+                        f"total {stream.total_s or 0:.1f}s"
+                    )
+                    st.caption("Answer cache: miss")
 
-            context = build_context(docs)
+                    engine.store_answer(retrieval, answer_text, model_label)
 
-            client = get_client()
 
-            system_prompt = (
-                SYSTEM_PROMPT_ALL
-                if project_name == "All Projects"
-                else SYSTEM_PROMPT_PROJECT
-            )
+        except Exception as e:
+            if is_rate_limit_error(e):
+                st.error(
+                    "⚠️ The AI model is temporarily unavailable due to usage limits.\n\n"
+                    "Please wait ~30–60 seconds and try again."
+                )
+            else:
+                # The innermost failed span names the stage that raised
+                failed = next((s for s in trace.spans if s.status == "ERROR"), None) if trace else None
+                stage = failed.name if failed else "query"
+                st.error(f"⚠️ The request failed during **{stage}** ({type(e).__name__}).")
 
-            answer = generate_answer(
-                client=client,
-                context=context,
-                question=question,
-                system_prompt=system_prompt,
+    with st.expander("Sources used"):
+        if context_report is not None:
+            st.caption(
+                f"Context: {context_report.tokens_used} tokens used "
+                f"(budget {context_report.budget}), {context_report.tokens_dropped} dropped, "
+                f"{context_report.duplicates_dropped} duplicate chunks removed"
             )
-
-            # Keep compatibility + newline fix
-            answer_text = answer[0] if isinstance(answer, tuple) else answer
-            st.markdown(answer_text.replace("\\n", "\n"))
-
-            # Model transparency (only if tuple)
-            if isinstance(answer, tuple) and len(answer) > 1:
-                st.caption(f"🧠 Model used: {answer[1]}")
-
-
-        except Exception:
-            st.error(
-                "⚠️ The AI model is temporarily unavailable due to usage limits.\n\n"
-                "Please wait ~30–60 seconds and try again."
+        if rerank_report is not None:
+            st.caption(
+                f"Rerank: +{rerank_report.added_ms:.0f} ms, {rerank_report.scored} scored, "
+                f"{rerank_report.cached} cached, {rerank_report.skipped} skipped (latency budget)"
             )
-
-    with st.expander("Sources used"):
-        st.code(context)
+        if context is not None:
+            st.code(context)
+        if config.TRACE_SHOW_IN_UI and trace is not None:
+            # Per-stage timings, token counts and cache hits of this query
+            st.dataframe(trace.summary(), use_container_width=True)
+
+    with st.expander("Index cache"):
+        st.table(load_registry().report())
+
+    with st.expander("LLM scheduler"):
+        # Queue depth, budget waits, retries and fallbacks across all sessions
+        st.json(get_scheduler().snapshot())
@@ -0,0 +1,128 @@
+"""
+Shared timing and relevance metrics for the benchmark runners.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+
+@dataclass
+class StageResult:
+    stage: str
+    n: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    mean_ms: float
+    qps: float
+    recall_at_k: Optional[float] = None
+    mrr: Optional[float] = None
+    k: Optional[int] = None
+
+
+def time_stage(
+    fn: Callable,
+    items: Sequence,
+    repeat: int = 1,
+    warmup: int = 1,
+) -> tuple:
+    """
+    Call fn(item) for every item, repeat times, after warmup untimed calls.
+
+    Returns (outputs of the last pass, per-call latencies in ms, wall seconds).
+    """
+    for item in list(items)[:warmup]:
+        fn(item)
+
+    latencies = []
+    outputs = []
+    wall_start = time.perf_counter()
+    for _ in range(repeat):
+        outputs = []
+        for item in items:
+            start = time.perf_counter()
+            outputs.append(fn(item))
+            latencies.append((time.perf_counter() - start) * 1000)
+    wall = time.perf_counter() - wall_start
+
+    return outputs, latencies, wall
+
+
+def summarize(stage: str, latencies: List[float], wall_s: float) -> StageResult:
+    lat = np.asarray(latencies, dtype=np.float64)
+    if len(lat) == 0:
+        return StageResult(stage, 0, 0.0, 0.0, 0.0, 0.0, 0.0)
+    p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+    return StageResult(
+        stage=stage,
+        n=len(lat),
+        p50_ms=float(p50),
+        p95_ms=float(p95),
+        p99_ms=float(p99),
+        mean_ms=float(lat.mean()),
+        qps=len(lat) / wall_s if wall_s > 0 else float("inf"),
+    )
+
+
+def recall_and_mrr(
+    ranked: Iterable[List[Dict]],
+    is_relevant: Iterable[Callable[[Dict], Optional[int]]],
+    k: int,
+    n_relevant: Iterable[int],
+) -> tuple:
+    """
+    Mean recall@k and MRR over queries.
+
+    is_relevant[q](doc) returns the id of the relevant item doc matches
+    (or None), so several chunks matching one item count once.
+    """
+    recalls, rrs = [], []
+    for docs, match, total in zip(ranked, is_relevant, n_relevant):
+        found = set()
+        first_rank = None
+        for rank, doc in enumerate(docs[:k], start=1):
+            item = match(doc)
+            if item is None:
+                continue
+            found.add(item)
+            if first_rank is None:
+                first_rank = rank
+        recalls.append(len(found) / max(total, 1))
+        rrs.append(1.0 / first_rank if first_rank else 0.0)
+
+    if not recalls:
+        return 0.0, 0.0
+    return float(np.mean(recalls)), float(np.mean(rrs))
+
+
+def print_results(title: str, results: List[StageResult]) -> None:
+    print(f"\n[BENCH] {title}")
+    print(
+        f"{'stage':<24}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        f"{'QPS':>10}{'recall@k':>11}{'MRR':>7}"
+    )
+    for r in results:
+        recall = f"{r.recall_at_k:.3f}@{r.k}" if r.recall_at_k is not None else "-"
+        mrr = f"{r.mrr:.3f}" if r.mrr is not None else "-"
+        print(
+            f"{r.stage:<24}{r.n:>7}{r.p50_ms:>10.3f}{r.p95_ms:>10.3f}{r.p99_ms:>10.3f}"
+            f"{r.qps:>10.1f}{recall:>11}{mrr:>7}"
+        )
+
+
+def write_results(path: Path, title: str, results: List[StageResult], extra: Dict = None) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"benchmark": title, **(extra or {}), "stages": [asdict(r) for r in results]},
+            f,
+            indent=2,
+        )
+    print(f"[OK] results written to {path}")
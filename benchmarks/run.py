@@ -0,0 +1,335 @@
+"""
+Retrieval benchmark suite.
+
+Usage:
+    python -m benchmarks.run bundled                      # rag/indexes + golden.jsonl
+    python -m benchmarks.run synthetic --chunks 100000    # 10k - 1M chunk corpus
+    python -m benchmarks.run bundled --json .cache/benchmarks/bundled.json
+
+Stages (p50/p95/p99 latency and QPS each):
+- encode            query embedding (query cache cleared first; bundled only)
+- retrieve          Retriever.retrieve on the question's own project index
+- route             stage-1 project routing (ProjectRouter.route)
+- multi_retrieve    MultiProjectRetriever.retrieve over all projects
+- combined_retrieve combined index, filtered to the routed projects
+- build_context     token-budgeted context packing of the retrieved chunks
+- end_to_end        QueryEngine retrieve + answer against the local Gemini stub
+
+Relevance: recall@k and MRR against benchmarks/golden.jsonl (bundled) or
+against the chunk each synthetic query was sampled from. Stages after
+encode reuse the warm query-embedding cache, as repeated UI queries do.
+The end-to-end stage uses rag/llm/stub_server.py with a fixed latency and
+no simulated errors, so its numbers are deterministic up to that latency.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import config
+from benchmarks.common import (
+    StageResult,
+    print_results,
+    recall_and_mrr,
+    summarize,
+    time_stage,
+    write_results,
+)
+from rag.embeddings import load_embedder
+from rag.engine import ALL_PROJECTS, QueryEngine
+from rag.llm.gemini_client import FALLBACK_MODEL, PRIMARY_MODEL, get_client
+from rag.llm.scheduler import LLMScheduler, ModelBudget
+from rag.llm.stub_server import StubSettings, serve
+from rag.retrieval.context import build_context
+from rag.retrieval.multi_retriever import MultiProjectRetriever
+from rag.retrieval.query_embeddings import encode_query, query_cache
+from rag.retrieval.registry import RetrieverRegistry
+from rag.retrieval.routing import load_router
+
+
+GOLDEN_PATH = Path(__file__).with_name("golden.jsonl")
+DATA_DIR = Path(".cache/benchmarks")
+
+
+def _stage(
+    name: str,
+    fn: Callable,
+    items: List,
+    repeat: int,
+    results: List[StageResult],
+) -> List:
+    outputs, latencies, wall = time_stage(fn, items, repeat=repeat)
+    results.append(summarize(name, latencies, wall))
+    return outputs
+
+
+def _score(result: StageResult, ranked, matchers, totals, k: int) -> None:
+    result.recall_at_k, result.mrr = recall_and_mrr(ranked, matchers, k, totals)
+    result.k = k
+
+
+def _stub_llm(latency_s: float):
+    """
+    Start the Gemini stub and return (client, scheduler) pointed at it.
+    """
+    server = serve(port=0, settings=StubSettings(latency_s=latency_s, seed=0))
+    os.environ["GEMINI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ.setdefault("GOOGLE_API_KEY", "stub")
+
+    # Budgets high enough that the benchmark measures the pipeline, not throttling
+    scheduler = LLMScheduler(
+        budgets={
+            PRIMARY_MODEL: ModelBudget(rpm=1e9, tpm=1e12),
+            FALLBACK_MODEL: ModelBudget(rpm=1e9, tpm=1e12),
+        },
+        primary=PRIMARY_MODEL,
+        fallback=FALLBACK_MODEL,
+    )
+    return get_client(), scheduler
+
+
+def _end_to_end(engine: QueryEngine, client, scheduler, items, repeat, results):
+    """
+    items: (question, scope, query_vec or None) triples
+    """
+    def run(item):
+        question, scope, query_vec = item
+        retrieval = engine.retrieve(question, scope=scope, query_vec=query_vec)
+        return engine.answer(client, retrieval, scheduler=scheduler)
+
+    answers = _stage("end_to_end", run, items, repeat, results)
+    errors = [a.error for a in answers if a.error]
+    if errors:
+        print(f"[WARN] end_to_end: {len(errors)} errors, first: {errors[0]}")
+
+
+# -------------------------------------------------
+# Bundled corpus (projects/ + golden set)
+# -------------------------------------------------
+def _golden_matcher(relevant: List[Dict]):
+    keys = [(r["project"], r["section_title"]) for r in relevant]
+
+    def match(doc: Dict) -> Optional[int]:
+        # A chunk of a subsection counts for every section it is nested in
+        titles = doc.get("heading_path") or [doc.get("section_title")]
+        for title in reversed(titles):
+            key = (doc.get("project"), title)
+            if key in keys:
+                return keys.index(key)
+        return None
+
+    return match
+
+
+def run_bundled(args) -> List[StageResult]:
+    with open(GOLDEN_PATH, "r", encoding="utf-8") as f:
+        golden = [json.loads(line) for line in f if line.strip()]
+
+    questions = [g["question"] for g in golden]
+    matchers = [_golden_matcher(g["relevant"]) for g in golden]
+    totals = [len(g["relevant"]) for g in golden]
+    # Per-project search only sees its own project's relevant chunks
+    own_totals = [
+        sum(1 for r in g["relevant"] if r["project"] == g["project"]) for g in golden
+    ]
+
+    embedder = load_embedder(
+        config.EMBEDDING_MODEL, config.EMBEDDING_BACKEND, config.EMBEDDING_MODEL_DIR
+    )
+    registry = RetrieverRegistry(embedder, hybrid=config.HYBRID_RETRIEVAL, rrf_k=config.RRF_K)
+    project_indexes = {name: cfg["index_path"] for name, cfg in config.PROJECTS.items()}
+
+    router = load_router(
+        embedder=embedder,
+        path=config.ROUTING_MATRIX_PATH,
+        routing=config.PROJECT_ROUTING,
+    )
+    k = args.k
+    results: List[StageResult] = []
+
+    query_cache().clear()
+    _stage("encode", lambda q: encode_query(embedder, q), questions, 1, results)
+
+    def retrieve(i):
+        project = golden[i]["project"]
+        docs = registry.get(project_indexes[project], name=project).retrieve(questions[i], top_k=k)
+        # Tag with the config key, as MultiProjectRetriever does
+        for d in docs:
+            d["project"] = project
+        return docs
+
+    ranked = _stage("retrieve", retrieve, list(range(len(golden))), args.repeat, results)
+    _score(results[-1], ranked, matchers, own_totals, k)
+
+    routed = _stage(
+        "route",
+        lambda q: router.route(encode_query(embedder, q), top_n=3),
+        questions, args.repeat, results,
+    )
+    hits = [
+        any(r["project"] in {p for p, _ in routes} for r in g["relevant"])
+        for g, routes in zip(golden, routed)
+    ]
+    print(f"[EVAL] routing: relevant project in top-3 for {sum(hits)}/{len(hits)} questions")
+
+    multi = MultiProjectRetriever(project_indexes, embedder, registry=registry)
+    ranked = _stage("multi_retrieve", lambda q: multi.retrieve(q, top_k=k), questions,
+                    args.repeat, results)
+    _score(results[-1], ranked, matchers, totals, k)
+
+    if (config.COMBINED_INDEX_PATH / "rag_index.faiss").exists():
+        combined = registry.get(config.COMBINED_INDEX_PATH, name="all_projects")
+
+        def combined_retrieve(i):
+            return combined.retrieve(questions[i], top_k=k, projects=[p for p, _ in routed[i]])
+
+        ranked = _stage("combined_retrieve", combined_retrieve, list(range(len(golden))),
+                        args.repeat, results)
+        _score(results[-1], ranked, matchers, totals, k)
+
+    candidates = [multi.retrieve(q, top_k=15) for q in questions]
+    _stage(
+        "build_context",
+        lambda docs: build_context(docs, token_budget=config.CONTEXT_TOKEN_BUDGET),
+        candidates, args.repeat, results,
+    )
+
+    if not args.no_llm:
+        engine = QueryEngine(
+            embedder=embedder,
+            registry=registry,
+            project_indexes=project_indexes,
+            router=router,
+            combined_index=config.COMBINED_INDEX_PATH,
+            token_budget=config.CONTEXT_TOKEN_BUDGET,
+            mmr_lambda=config.MMR_LAMBDA,
+        )
+        client, scheduler = _stub_llm(args.llm_latency)
+        items = [(q, ALL_PROJECTS, None) for q in questions]
+        _end_to_end(engine, client, scheduler, items, 1, results)
+
+    return results
+
+
+# -------------------------------------------------
+# Synthetic corpus (scaling)
+# -------------------------------------------------
+def run_synthetic(args) -> List[StageResult]:
+    from benchmarks.synthetic import build_synthetic_corpus, sample_queries
+
+    corpus = build_synthetic_corpus(
+        args.data_dir, chunks=args.chunks, dim=args.dim, projects=args.projects,
+        rebuild=args.rebuild,
+    )
+    queries = sample_queries(corpus, args.queries)
+    registry = RetrieverRegistry(None, hybrid=config.HYBRID_RETRIEVAL, rrf_k=config.RRF_K)
+
+    k = args.k
+    n = len(queries.texts)
+    rows = list(range(n))
+    matchers = [
+        (lambda doc, cid=int(cid): 0 if doc.get("chunk_id") == cid else None)
+        for cid in queries.chunk_ids
+    ]
+    totals = [1] * n
+    results: List[StageResult] = []
+
+    def retrieve(i):
+        name = queries.projects[i]
+        retriever = registry.get(corpus.project_indexes[name], name=name)
+        return retriever.retrieve_by_vector(queries.vectors[i], top_k=k, query_text=queries.texts[i])
+
+    ranked = _stage("retrieve", retrieve, rows, args.repeat, results)
+    _score(results[-1], ranked, matchers, totals, k)
+
+    routed = _stage("route", lambda i: corpus.router.route(queries.vectors[i], top_n=3),
+                    rows, args.repeat, results)
+    hits = sum(queries.projects[i] in {p for p, _ in routed[i]} for i in rows)
+    print(f"[EVAL] routing: source project in top-3 for {hits}/{n} queries")
+
+    multi = MultiProjectRetriever(corpus.project_indexes, None, registry=registry)
+    ranked = _stage(
+        "multi_retrieve",
+        lambda i: multi.retrieve_by_vector(queries.vectors[i], top_k=k, query_text=queries.texts[i]),
+        rows, args.repeat, results,
+    )
+    _score(results[-1], ranked, matchers, totals, k)
+
+    combined = registry.get(corpus.combined_index, name="all_projects")
+    ranked = _stage(
+        "combined_retrieve",
+        lambda i: combined.retrieve_by_vector(
+            queries.vectors[i], top_k=k, projects=[p for p, _ in routed[i]],
+            query_text=queries.texts[i],
+        ),
+        rows, args.repeat, results,
+    )
+    _score(results[-1], ranked, matchers, totals, k)
+
+    candidates = [
+        combined.retrieve_by_vector(queries.vectors[i], top_k=15, query_text=queries.texts[i])
+        for i in rows
+    ]
+    _stage(
+        "build_context",
+        lambda docs: build_context(docs, token_budget=config.CONTEXT_TOKEN_BUDGET),
+        candidates, args.repeat, results,
+    )
+
+    if not args.no_llm:
+        engine = QueryEngine(
+            embedder=None,
+            registry=registry,
+            project_indexes=corpus.project_indexes,
+            router=corpus.router,
+            combined_index=corpus.combined_index,
+            token_budget=config.CONTEXT_TOKEN_BUDGET,
+            mmr_lambda=config.MMR_LAMBDA,
+        )
+        client, scheduler = _stub_llm(args.llm_latency)
+        items = [(queries.texts[i], ALL_PROJECTS, queries.vectors[i]) for i in rows]
+        _end_to_end(engine, client, scheduler, items, 1, results)
+
+    return results
+
+
+def _parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark retrieval stages.")
+    parser.add_argument("corpus", choices=["bundled", "synthetic"])
+    parser.add_argument("--k", type=int, default=config.TOP_K, help="cut-off for recall@k / MRR")
+    parser.add_argument("--repeat", type=int, default=5, help="timed passes per stage")
+    parser.add_argument("--no-llm", action="store_true", help="skip the end-to-end stage")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="stub latency (s)")
+    parser.add_argument("--json", type=Path, default=None, help="also write results as JSON")
+
+    synthetic = parser.add_argument_group("synthetic corpus")
+    synthetic.add_argument("--chunks", type=int, default=10_000)
+    synthetic.add_argument("--dim", type=int, default=384)
+    synthetic.add_argument("--projects", type=int, default=8)
+    synthetic.add_argument("--queries", type=int, default=200)
+    synthetic.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    synthetic.add_argument("--rebuild", action="store_true", help="regenerate the corpus")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+
+    if args.corpus == "bundled":
+        title = "bundled corpus (golden set)"
+        results = run_bundled(args)
+    else:
+        title = f"synthetic corpus ({args.chunks} chunks, {config.INDEX_FACTORY})"
+        results = run_synthetic(args)
+
+    print_results(title, results)
+    if args.json:
+        write_results(args.json, title, results, extra={"index_factory": config.INDEX_FACTORY})
+
+
+if __name__ == "__main__":
+    main()
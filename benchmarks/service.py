@@ -0,0 +1,114 @@
+"""
+Throughput of the shared retrieval service under concurrent clients.
+
+Usage:
+    python -m benchmarks.service --clients 8 --requests 50
+    python -m benchmarks.service --clients 16 --window-ms 2 5
+
+Starts the service in-process on a free port, then each client thread sends
+one-question encode + search requests (as a Streamlit worker does). Every
+configuration is compared with max_batch=1, i.e. no micro-batching.
+Questions get a per-request suffix so the service's query cache never hits.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import threading
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+import config
+from benchmarks.common import summarize
+from rag.retrieval.query_embeddings import query_cache
+from rag.service import RemoteRegistry, RemoteEmbedder, RetrievalService, ServiceClient, build_service, serve
+
+
+GOLDEN_PATH = Path(__file__).with_name("golden.jsonl")
+
+
+def _run_clients(url: str, index_dir: Path, questions: List[str], clients: int, requests: int):
+    client = ServiceClient(url)
+    embedder = RemoteEmbedder(client)
+    retriever = RemoteRegistry(client, embedder).get(index_dir)
+
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def worker(c: int):
+        own = []
+        for r in range(requests):
+            question = f"{questions[(c + r) % len(questions)]} ({c}.{r})"
+            start = time.perf_counter()
+            vec = embedder.encode([question])[0]
+            retriever.retrieve_by_vector(vec, top_k=config.TOP_K, query_text=question)
+            own.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=worker, args=(c,)) for c in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, time.perf_counter() - start
+
+
+def _parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the retrieval service.")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent client threads")
+    parser.add_argument("--requests", type=int, default=50, help="requests per client")
+    parser.add_argument(
+        "--window-ms", type=float, nargs="+", default=[config.SERVICE_BATCH_WINDOW_MS]
+    )
+    parser.add_argument("--max-batch", type=int, default=config.SERVICE_MAX_BATCH)
+    parser.add_argument(
+        "--project", default=next(iter(config.PROJECTS)), choices=list(config.PROJECTS)
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    with open(GOLDEN_PATH, "r", encoding="utf-8") as f:
+        questions = [json.loads(line)["question"] for line in f if line.strip()]
+
+    base = build_service(window_ms=0.0, max_batch=1)
+    index_dir = config.PROJECTS[args.project]["index_path"]
+
+    configs = [("unbatched", 0.0, 1)] + [
+        (f"window {w:g} ms", w, args.max_batch) for w in args.window_ms
+    ]
+    print(
+        f"\n{'service':<18}{'q/s':>9}{'p50 ms':>9}{'p95 ms':>9}"
+        f"{'encode batch':>14}{'search batch':>14}"
+    )
+    for label, window_ms, max_batch in configs:
+        service = RetrievalService(
+            base.embedder, base.registry, list(base.allowed),
+            window_ms=window_ms, max_batch=max_batch,
+        )
+        server = serve(service, port=0)
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        query_cache().clear()
+
+        # Warm-up: load the index and the model outside the timed run
+        _run_clients(url, index_dir, questions, clients=1, requests=2)
+        latencies, wall = _run_clients(url, index_dir, questions, args.clients, args.requests)
+        server.shutdown()
+
+        result = summarize(label, latencies, wall)
+        print(
+            f"{label:<18}{result.qps:>9.1f}{result.p50_ms:>9.2f}{result.p95_ms:>9.2f}"
+            f"{service.encoder.snapshot()['mean_batch']:>14.2f}"
+            f"{service.searcher.snapshot()['mean_batch']:>14.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
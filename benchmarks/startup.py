@@ -0,0 +1,135 @@
+"""
+Cold-start benchmark of the embedding backends.
+
+Usage:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --backends sentence-transformers onnx-int8 --model-dir models/x
+
+Each backend runs in a fresh interpreter, like a new Streamlit worker, and reports:
+- import_s       importing the query path (rag.engine, rag.embeddings, registry)
+- load_s         creating the embedder (backend import + model load)
+- first_query_s  embedding the first question
+- encode_ms      mean per-question latency over the golden questions afterwards
+- rss_mb         peak resident memory of the process
+- agreement      cosine similarity to the sentence-transformers vectors (mean / min)
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+# Not imported from benchmarks.run: that would load the modules being timed
+GOLDEN_PATH = Path(__file__).with_name("golden.jsonl")
+
+
+def _child(backend: str, model_name: str, model_dir: str, out: Path) -> None:
+    start = time.perf_counter()
+    import rag.engine  # noqa: F401  (the modules the UI imports at startup)
+    import rag.retrieval.registry  # noqa: F401
+    from rag.embeddings import load_embedder
+    import_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    embedder = load_embedder(model_name, backend, Path(model_dir))
+    load_s = time.perf_counter() - start
+
+    with open(GOLDEN_PATH, "r", encoding="utf-8") as f:
+        questions = [json.loads(line)["question"] for line in f if line.strip()]
+
+    start = time.perf_counter()
+    first = np.asarray(embedder.encode([questions[0]]), dtype=np.float32)
+    first_query_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectors = [first[0]]
+    for q in questions[1:]:
+        vectors.append(np.asarray(embedder.encode([q]), dtype=np.float32)[0])
+    encode_ms = (time.perf_counter() - start) * 1000 / max(1, len(questions) - 1)
+
+    np.save(out.with_suffix(".npy"), np.stack(vectors))
+    out.write_text(json.dumps({
+        "backend": backend,
+        "import_s": import_s,
+        "load_s": load_s,
+        "first_query_s": first_query_s,
+        "encode_ms": encode_ms,
+        # ru_maxrss is in KiB on Linux
+        "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def _unit(matrix: np.ndarray) -> np.ndarray:
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def _parse_args(argv=None) -> argparse.Namespace:
+    import config
+
+    parser = argparse.ArgumentParser(description="Compare embedding backend cold starts.")
+    parser.add_argument(
+        "--backends", nargs="+", default=["sentence-transformers", "onnx", "onnx-int8"]
+    )
+    parser.add_argument("--model", default=config.EMBEDDING_MODEL)
+    parser.add_argument("--model-dir", type=Path, default=config.EMBEDDING_MODEL_DIR)
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--out", type=Path, default=None, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    if args.child:
+        _child(args.child, args.model, str(args.model_dir), args.out)
+        return
+
+    reports = []
+    vectors = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in args.backends:
+            out = Path(tmp) / f"{backend}.json"
+            start = time.perf_counter()
+            proc = subprocess.run(
+                [sys.executable, "-m", "benchmarks.startup", "--child", backend,
+                 "--model", args.model, "--model-dir", str(args.model_dir), "--out", str(out)],
+                capture_output=True,
+                text=True,
+            )
+            if proc.returncode != 0:
+                error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"
+                print(f"[WARN] {backend}: {error}")
+                continue
+
+            report = json.loads(out.read_text())
+            report["process_s"] = time.perf_counter() - start
+            reports.append(report)
+            vectors[backend] = _unit(np.load(out.with_suffix(".npy")))
+
+    reference = vectors.get("sentence-transformers")
+    print(
+        f"\n{'backend':<24}{'import s':>10}{'load s':>10}{'1st query s':>13}"
+        f"{'encode ms':>11}{'RSS MB':>9}{'process s':>11}{'agreement':>16}"
+    )
+    for r in reports:
+        agreement = "-"
+        if reference is not None and r["backend"] in vectors:
+            cos = (vectors[r["backend"]] * reference).sum(axis=1)
+            agreement = f"{cos.mean():.4f}/{cos.min():.4f}"
+        print(
+            f"{r['backend']:<24}{r['import_s']:>10.2f}{r['load_s']:>10.2f}"
+            f"{r['first_query_s']:>13.3f}{r['encode_ms']:>11.2f}{r['rss_mb']:>9.0f}"
+            f"{r['process_s']:>11.2f}{agreement:>16}"
+        )
+
+
+if __name__ == "__main__":
+    main()
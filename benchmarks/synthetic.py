@@ -0,0 +1,167 @@
+"""
+Synthetic multi-project corpus for scaling benchmarks (10k - 1M chunks).
+
+Design:
+- Chunks are drawn around topic centroids; each topic belongs to one
+  project, so project routing is meaningful.
+- Chunk text is a bag of topic words plus common filler words, so the BM25
+  side of hybrid retrieval sees realistic term statistics.
+- Indexes are written with build_index.write_project_index /
+  build_combined_index, i.e. with the configured INDEX_FACTORY, and reused
+  across runs while the (chunks, dim, projects, factory, seed) key is unchanged.
+- Queries are noisy copies of random chunks; that chunk is the ground truth.
+"""
+
+from __future__ import annotations
+
+import json
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+import build_index
+from config import INDEX_FACTORY, INDEX_METRIC
+from rag.retrieval.docstore import DocStore
+from rag.retrieval.mmr import load_embeddings
+from rag.retrieval.routing import ProjectRouter
+
+
+_WORDS_PER_CHUNK = 40
+_VOCAB = 20_000
+_TOPIC_WORDS = 12
+
+
+@dataclass
+class SyntheticCorpus:
+    root: Path
+    project_indexes: Dict[str, Path]
+    combined_index: Path
+    router: ProjectRouter
+    dim: int
+    chunks: int
+
+
+@dataclass
+class SyntheticQueries:
+    vectors: np.ndarray
+    texts: List[str]
+    chunk_ids: np.ndarray
+    projects: List[str]
+
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def _topic_words(topic: int) -> np.ndarray:
+    rng = np.random.default_rng(topic)
+    return rng.integers(0, _VOCAB, size=_TOPIC_WORDS)
+
+
+def _chunk_text(rng: np.random.Generator, topic: int) -> str:
+    topic_words = _topic_words(topic)
+    words = np.concatenate([
+        rng.choice(topic_words, size=_WORDS_PER_CHUNK // 2),
+        rng.integers(0, _VOCAB, size=_WORDS_PER_CHUNK // 2),
+    ])
+    return " ".join(f"w{w}" for w in words)
+
+
+def build_synthetic_corpus(
+    root: Path,
+    chunks: int,
+    dim: int = 384,
+    projects: int = 8,
+    topics: int = 512,
+    noise: float = 0.35,
+    seed: int = 0,
+    rebuild: bool = False,
+) -> SyntheticCorpus:
+    key = {
+        "chunks": chunks, "dim": dim, "projects": projects, "topics": topics,
+        "noise": noise, "seed": seed, "factory": INDEX_FACTORY, "metric": INDEX_METRIC,
+    }
+    root = root / f"synthetic-{chunks}-{dim}-{INDEX_FACTORY.replace(',', '_')}"
+    names = [f"synthetic_{p}" for p in range(projects)]
+    project_indexes = {name: root / name for name in names}
+    combined = root / "all_projects"
+
+    rng = np.random.default_rng(seed)
+    centroids = _unit_rows(rng.standard_normal((topics, dim)).astype(np.float32))
+    topic_project = np.arange(topics) % projects
+
+    def corpus() -> SyntheticCorpus:
+        # Project descriptor = mean of its topic centroids
+        matrix = np.stack([centroids[topic_project == p].mean(axis=0) for p in range(projects)])
+        router = ProjectRouter(names, matrix, fingerprint="synthetic")
+        return SyntheticCorpus(root, project_indexes, combined, router, dim, chunks)
+
+    marker = root / "corpus.json"
+    if not rebuild and marker.exists() and json.loads(marker.read_text()) == key:
+        print(f"[OK] reusing synthetic corpus at {root}")
+        return corpus()
+
+    if root.exists():
+        shutil.rmtree(root)
+    root.mkdir(parents=True)
+
+    # Every chunk gets a global id; chunk topics decide the owning project
+    chunk_topics = rng.integers(0, topics, size=chunks)
+    results = {}
+    for p, name in enumerate(names):
+        ids = np.flatnonzero(topic_project[chunk_topics] == p)
+        vectors = centroids[chunk_topics[ids]] + noise * rng.standard_normal(
+            (len(ids), dim)
+        ).astype(np.float32) / np.sqrt(dim)
+        vectors = _unit_rows(vectors).astype(np.float32)
+
+        docs = [
+            {
+                "project": name,
+                "source": "synthetic",
+                "chunk_id": int(cid),
+                "text": _chunk_text(rng, int(chunk_topics[cid])),
+            }
+            for cid in ids
+        ]
+        build_index.write_project_index(name, project_indexes[name], docs, vectors, dim)
+        results[name] = (docs, vectors)
+
+    build_index.build_combined_index(results, combined, dim, eval_k=0)
+    marker.write_text(json.dumps(key))
+    return corpus()
+
+
+def sample_queries(
+    corpus: SyntheticCorpus,
+    n: int,
+    noise: float = 0.2,
+    words: int = 6,
+    seed: int = 1,
+) -> SyntheticQueries:
+    """
+    Noisy copies of n random chunks (vector + a few of their words).
+    """
+    rng = np.random.default_rng(seed)
+    vectors, texts, chunk_ids, projects = [], [], [], []
+
+    names = list(corpus.project_indexes)
+    stores = {name: DocStore(path) for name, path in corpus.project_indexes.items()}
+    embeddings = {name: load_embeddings(path) for name, path in corpus.project_indexes.items()}
+
+    for _ in range(n):
+        name = names[rng.integers(len(names))]
+        row = int(rng.integers(len(stores[name])))
+        doc = stores[name][row]
+        base = np.asarray(embeddings[name][row], dtype=np.float32)
+
+        vec = base + noise * rng.standard_normal(corpus.dim).astype(np.float32) / np.sqrt(corpus.dim)
+        vectors.append(vec / np.linalg.norm(vec))
+        texts.append(" ".join(rng.choice(doc["text"].split(), size=words)))
+        chunk_ids.append(doc["chunk_id"])
+        projects.append(name)
+
+    return SyntheticQueries(np.stack(vectors), texts, np.array(chunk_ids), projects)
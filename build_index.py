@@ -1,14 +1,27 @@
 """
 Purpose:
-Build per-project RAG indexes (FAISS + metadata JSON) from external project repos.
+Build per-project RAG indexes (FAISS + compact doc store) from external project repos.
 
 Design:
 - Multi-project indexing via config.PROJECTS
-- Code chunking: one function = one chunk
-- README chunking: one sentence = one chunk
-- Embeddings: local sentence-transformers (reproducible, no API cost)
-- Vector store: FAISS
-- Robust to missing repos: creates an empty index + empty docs JSON
+- Code chunking: one function / method / class = one chunk, parsed in a
+  process pool with a per-file (mtime, size, sha256) manifest
+- README chunking: token-bounded Markdown chunks with heading path and byte offsets
+- Folder tree: one capped chunk per repo, honoring EXCLUDE_DIRS and .gitignore
+- Embeddings: local model via rag/embeddings.py (PyTorch or ONNX Runtime backend,
+  config.EMBEDDING_BACKEND; reproducible, no API cost)
+- Embedding cache: keyed by (model + backend, chunk SHA-256); only changed chunks are embedded
+- Vector store: FAISS, index type from config.INDEX_FACTORY / INDEX_METRIC; quantized
+  types (SQfp16 / SQ8 / PQ) can keep mmap'd float32 vectors for exact re-scoring
+  (--storage-report compares bytes per vector and recall across settings)
+- Pipeline: parallel parsing, cross-project batched encoding, background writes
+  (python build_index.py --workers 8 --batch-size 128)
+- Lexical index: BM25 postings per index for hybrid (dense + keyword) retrieval
+- Combined index: all projects in one FAISS index, filtered by project id
+- Routing descriptors: one normalized matrix for stage-1 project routing
+- Doc store: offset table + memory-mapped blob (--export-json for readable JSON)
+- Chunk embeddings: float16 .npy next to each index, used for MMR at query time
+- Robust to missing repos: creates an empty index + empty doc store
 
 Development approach:
 - Core logic and integration are implemented manually.
@@ -17,37 +30,68 @@ Development approach:
 
 from __future__ import annotations
 
+import argparse
 import json
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Tuple
 
 import faiss
-from sentence_transformers import SentenceTransformer
+import numpy as np
 
+from rag.embeddings import load_embedder
+from rag.indexing.artifacts import atomic_path
+from rag.indexing.embedding_cache import EmbeddingCache
+from rag.indexing.faiss_index import (
+    RESCORE_FILE,
+    build_faiss_index,
+    evaluate_index,
+    is_lossy,
+    write_index_meta,
+    write_rescore_vectors,
+)
 from rag.ingestion.parse_readme import parse_markdown_readme
-from config import PROJECTS, EMBEDDING_MODEL
-from rag.ingestion.parse_readme import parse_markdown_readme
-from config import PROJECTS, EMBEDDING_MODEL
-
+from rag.ingestion.source_scan import MANIFEST_FILE, SourceScan
+from rag.retrieval.docstore import write_docstore
+from rag.retrieval.lexical import write_lexical_index
+from rag.retrieval.mmr import write_embeddings
+from rag.retrieval.routing import build_router
+from config import (
+    PROJECTS,
+    PROJECT_ROUTING,
+    EMBEDDING_MODEL,
+    EMBEDDING_BACKEND,
+    EMBEDDING_MODEL_DIR,
+    ROUTING_MATRIX_PATH,
+    COMBINED_INDEX_PATH,
+    EMBEDDING_CACHE_PATH,
+    EMBED_BATCH_SIZE,
+    EXCLUDE_DIRS,
+    INCLUDE_EXTENSIONS,
+    INDEX_SOURCE_CODE,
+    README_CHUNK_TOKENS,
+    README_CHUNK_OVERLAP,
+    FOLDER_TREE_CACHE_DIR,
+    INDEX_FACTORY,
+    INDEX_METRIC,
+    INDEX_NPROBE,
+    INDEX_EF_SEARCH,
+    INDEX_RESCORE,
+    INDEX_RESCORE_FACTOR,
+    TOP_K,
+)
 
 
 def _ensure_dir(path: Path) -> None:
     path.mkdir(parents=True, exist_ok=True)
 
 
-def _write_docs(docs: List[Dict], out_path: Path) -> None:
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(docs, f, indent=2, ensure_ascii=False)
-
-
-def build_index_for_project(
-    project_name: str,
-    repo_path: Path,
-    index_dir: Path,
-    embedder: SentenceTransformer,
-) -> None:
-    _ensure_dir(index_dir)
-
+def parse_project(project_name: str, repo_path: Path) -> List[Dict]:
+    """
+    Parse one project repo into chunks. Runs in a worker process.
+    """
     docs: List[Dict] = []
 
     if not repo_path.exists():
@@ -62,41 +106,359 @@ def build_index_for_project(
                 parse_markdown_readme(
                     readme_path=readme_path,
                     project_name=project_name,
+                    max_tokens=README_CHUNK_TOKENS,
+                    overlap_tokens=README_CHUNK_OVERLAP,
+                    exclude_dirs=EXCLUDE_DIRS,
+                    tree_cache_dir=FOLDER_TREE_CACHE_DIR,
                 )
             )
 
-    # Always write docs JSON (even if empty) so downstream never fails
-    docs_path = index_dir / "rag_docs.json"
-    _write_docs(docs, docs_path)
+    return docs
+
+
+def _write_faiss_index(vectors: np.ndarray, dim: int, index_dir: Path):
+    """
+    Build the configured index type and write it with its metadata.
+
+    index_meta.json goes last: it is the file serving registries watch.
+    """
+    index, meta = build_faiss_index(
+        vectors,
+        dim=dim,
+        factory=INDEX_FACTORY,
+        metric=INDEX_METRIC,
+        nprobe=INDEX_NPROBE,
+        ef_search=INDEX_EF_SEARCH,
+    )
+    meta["model"] = EMBEDDING_MODEL
+
+    # Exact vectors only pay off when the index itself stores compressed codes
+    rescore_path = index_dir / RESCORE_FILE
+    if INDEX_RESCORE and is_lossy(meta["resolved_factory"]):
+        write_rescore_vectors(vectors, index_dir, INDEX_METRIC)
+        meta["rescore_factor"] = INDEX_RESCORE_FACTOR
+    elif rescore_path.exists():
+        rescore_path.unlink()
+
+    with atomic_path(index_dir / "rag_index.faiss") as tmp:
+        faiss.write_index(index, str(tmp))
+    write_index_meta(meta, index_dir)
+    return index, meta
+
+
+def write_project_index(
+    project_name: str,
+    index_dir: Path,
+    docs: List[Dict],
+    embeddings: np.ndarray,
+    dim: int,
+    export_json: bool = False,
+) -> float:
+    """
+    Write doc store + FAISS index for one project. Returns seconds spent.
+
+    Runs on writer threads, so it does not print; main() logs each project
+    as its write completes.
+    """
+    start = time.perf_counter()
+    _ensure_dir(index_dir)
+
+    # Always write the doc store (even if empty) so downstream never fails
+    write_docstore(docs, index_dir, export_json=export_json)
+    write_lexical_index([d["text"] for d in docs], index_dir)
+    write_embeddings(embeddings, index_dir)
 
     # Build FAISS index (even if empty)
+    _write_faiss_index(embeddings, dim, index_dir)
+    return time.perf_counter() - start
+
+
+def build_combined_index(
+    project_results: Dict[str, Tuple[List[Dict], np.ndarray]],
+    index_dir: Path,
+    dim: int,
+    export_json: bool = False,
+    eval_k: int = 5,
+) -> None:
+    """
+    One index over all projects, plus a compact row -> project-id array.
+
+    Rows are stored project by project; the retriever restricts a search to
+    any subset of projects with a FAISS ID selector built from project_ids.npy.
+    Prints recall@eval_k and latency against exact search (eval_k=0 skips it).
+    """
+    _ensure_dir(index_dir)
+
+    project_names = list(project_results.keys())
+    docs: List[Dict] = []
+    vectors = [np.zeros((0, dim), dtype=np.float32)]
+    project_ids = []
+
+    for pid, name in enumerate(project_names):
+        project_docs, embeddings = project_results[name]
+        docs.extend({**d, "project": name} for d in project_docs)
+        vectors.append(embeddings)
+        project_ids.append(np.full(len(project_docs), pid, dtype=np.uint16))
+
+    all_vectors = np.concatenate(vectors)
+
+    write_docstore(docs, index_dir, export_json=export_json)
+    write_lexical_index([d["text"] for d in docs], index_dir)
+    write_embeddings(all_vectors, index_dir)
+    with atomic_path(index_dir / "project_ids.npy") as tmp, open(tmp, "wb") as f:
+        np.save(f, np.concatenate(project_ids or [np.zeros(0, np.uint16)]))
+    with atomic_path(index_dir / "projects.json") as tmp, open(tmp, "w", encoding="utf-8") as f:
+        json.dump(project_names, f, indent=2)
+    index, meta = _write_faiss_index(all_vectors, dim, index_dir)
+
+    print(
+        f"[OK] combined index: {len(docs)} chunks across {len(project_names)} projects "
+        f"({meta['resolved_factory']}, {meta['metric']})"
+    )
+
+    report = (
+        evaluate_index(index, all_vectors, meta, k=eval_k, rescore_factor=meta.get("rescore_factor"))
+        if eval_k > 0
+        else None
+    )
+    if report:
+        print(
+            f"[EVAL] {report['index']}: recall@{report['k']} = {report['recall_at_k']:.3f} "
+            f"over {report['queries']} queries, "
+            f"{report['latency_ms']:.3f} ms/query (flat: {report['flat_latency_ms']:.3f} ms/query), "
+            f"{report['bytes_per_vector']:.0f} B/vector (flat: {report['flat_bytes_per_vector']})"
+        )
+        if "rescored_recall_at_k" in report:
+            print(
+                f"[EVAL] {report['index']} + exact re-scoring x{meta['rescore_factor']}: "
+                f"recall@{report['k']} = {report['rescored_recall_at_k']:.3f}, "
+                f"{report['rescored_latency_ms']:.3f} ms/query"
+            )
+
+
+# Storage settings compared by --storage-report
+STORAGE_SETTINGS = ["Flat", "SQfp16", "SQ8", "PQ", "IVF,SQ8", "IVF,PQ"]
+
+
+def storage_report(vectors: np.ndarray, dim: int, k: int = 5) -> List[Dict]:
+    """
+    Bytes per vector and recall@k (plain and re-scored) for each storage
+    setting, built in memory over the same vectors.
+    """
+    rows = []
+    for factory in STORAGE_SETTINGS:
+        index, meta = build_faiss_index(
+            vectors,
+            dim=dim,
+            factory=factory,
+            metric=INDEX_METRIC,
+            nprobe=INDEX_NPROBE,
+            ef_search=INDEX_EF_SEARCH,
+        )
+        report = evaluate_index(
+            index, vectors, meta, k=k,
+            rescore_factor=INDEX_RESCORE_FACTOR if is_lossy(meta["resolved_factory"]) else None,
+        )
+        if report:
+            rows.append({"setting": factory, **report})
+
+    print(
+        f"\n[EVAL] storage settings over {len(vectors)} vectors (recall@{k} vs exact search)"
+    )
+    print(
+        f"{'setting':<10}{'resolved':<18}{'B/vector':>10}{'recall':>9}"
+        f"{'rescored':>10}{'ms/query':>10}"
+    )
+    for r in rows:
+        rescored = r.get("rescored_recall_at_k")
+        print(
+            f"{r['setting']:<10}{r['index']:<18}{r['bytes_per_vector']:>10.1f}"
+            f"{r['recall_at_k']:>9.3f}{(f'{rescored:.3f}' if rescored is not None else '-'):>10}"
+            f"{r.get('rescored_latency_ms', r['latency_ms']):>10.3f}"
+        )
+    print(
+        f"(re-scoring reads {INDEX_RESCORE_FACTOR}x{k} rows of a memory-mapped "
+        f"float32 file: {4 * dim} B/vector on disk, not resident)"
+    )
+    return rows
+
+
+def _throughput(stage: str, chunks: int, seconds: float) -> None:
+    rate = chunks / seconds if seconds > 0 else float("inf")
+    print(f"[TIME] {stage}: {chunks} chunks in {seconds:.2f}s ({rate:.1f} chunks/s)")
+
+
+def _parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build per-project RAG indexes.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="processes used for parsing/chunking (default: CPU count)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=EMBED_BATCH_SIZE,
+        help="sentence-transformers encode batch size",
+    )
+    parser.add_argument(
+        "--export-json",
+        action="store_true",
+        help="also write human-readable rag_docs.json next to each index",
+    )
+    parser.add_argument(
+        "--eval-k",
+        type=int,
+        default=TOP_K,
+        help="report recall@k of the configured index vs. exact search (0 = skip)",
+    )
+    parser.add_argument(
+        "--storage-report",
+        action="store_true",
+        help="compare bytes per vector and recall of Flat / SQfp16 / SQ8 / PQ storage",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Pipelined build:
+    - parsing/chunking runs in a process pool,
+    - chunks from finished projects are encoded together in large batches,
+    - per-project FAISS writes run in background threads.
+    """
+    args = _parse_args(argv)
+
+    embedder = load_embedder(EMBEDDING_MODEL, EMBEDDING_BACKEND, EMBEDDING_MODEL_DIR)
     dim = embedder.get_sentence_embedding_dimension()
-    index = faiss.IndexFlatL2(dim)
+    cache = EmbeddingCache(EMBEDDING_CACHE_PATH)
 
-    if len(docs) > 0:
-        embeddings = embedder.encode([d["text"] for d in docs])
-        index.add(embeddings)
-        print(f"[OK] {project_name}: indexed {len(docs)} chunks")
-    else:
-        print(f"[OK] {project_name}: indexed 0 chunks (empty index created)")
+    # Encode once enough chunks are queued to fill several batches
+    encode_group = args.batch_size * 8
 
-    faiss.write_index(index, str(index_dir / "rag_index.faiss"))
+    results: Dict[str, Tuple[List[Dict], np.ndarray]] = {}
+    pending: List[Tuple[str, List[Dict]]] = []
+    write_futures: Dict[Future, Tuple[str, int]] = {}  # -> (project, chunks)
+    encode_seconds = 0.0
+    write_seconds = 0.0
 
+    def log_writes(futures) -> None:
+        # Main thread only, so output never interleaves with flush/encode logs
+        nonlocal write_seconds
+        for future in futures:
+            name, chunks = write_futures.pop(future)
+            write_seconds += future.result()
+            if chunks > 0:
+                print(f"[OK] {name}: indexed {chunks} chunks")
+            else:
+                print(f"[OK] {name}: indexed 0 chunks (empty index created)")
 
-def main():
-    embedder = SentenceTransformer(EMBEDDING_MODEL)
+    def flush(writer: ThreadPoolExecutor) -> None:
+        nonlocal encode_seconds
+        texts = [d["text"] for _, docs in pending for d in docs]
 
-    for project_name, cfg in PROJECTS.items():
-        repo_path: Path = cfg["repo_path"]
-        index_dir: Path = cfg["index_path"]
+        start = time.perf_counter()
+        vectors = cache.encode(embedder, texts, embedder.cache_key, batch_size=args.batch_size)
+        encode_seconds += time.perf_counter() - start
 
-        build_index_for_project(
-            project_name=project_name,
-            repo_path=repo_path,
-            index_dir=index_dir,
-            embedder=embedder,
+        offset = 0
+        for name, docs in pending:
+            embeddings = vectors[offset:offset + len(docs)]
+            offset += len(docs)
+            results[name] = (docs, embeddings)
+            future = writer.submit(
+                write_project_index,
+                name,
+                PROJECTS[name]["index_path"],
+                docs,
+                embeddings,
+                dim,
+                args.export_json,
+            )
+            write_futures[future] = (name, len(docs))
+        pending.clear()
+
+    build_start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as parser_pool, \
+            ThreadPoolExecutor(max_workers=4, thread_name_prefix="index-write") as writer:
+        parse_start = time.perf_counter()
+        parse_futures = {
+            parser_pool.submit(parse_project, name, cfg["repo_path"]): name
+            for name, cfg in PROJECTS.items()
+        }
+
+        # Walk source trees up front so file parsing overlaps with encoding
+        source_scans = {}
+        if INDEX_SOURCE_CODE:
+            source_scans = {
+                name: SourceScan(
+                    project_name=name,
+                    repo_path=cfg["repo_path"],
+                    manifest_path=cfg["index_path"] / MANIFEST_FILE,
+                    pool=parser_pool,
+                    extensions={".py"} & INCLUDE_EXTENSIONS,
+                    exclude_dirs=EXCLUDE_DIRS,
+                )
+                for name, cfg in PROJECTS.items()
+            }
+
+        parsed_chunks = 0
+        for future in as_completed(parse_futures):
+            name = parse_futures[future]
+            docs = future.result()
+
+            scan = source_scans.get(name)
+            if scan is not None:
+                docs = docs + scan.collect()
+                print(
+                    f"[OK] {name}: source files parsed {scan.parsed}, "
+                    f"unchanged {scan.reused}"
+                )
+
+            parsed_chunks += len(docs)
+            pending.append((name, docs))
+
+            if sum(len(d) for _, d in pending) >= encode_group:
+                flush(writer)
+            log_writes([f for f in write_futures if f.done()])
+
+        parse_seconds = time.perf_counter() - parse_start
+        if pending:
+            flush(writer)
+
+        log_writes(as_completed(list(write_futures)))
+
+    _throughput("parse", parsed_chunks, parse_seconds)
+    _throughput("encode", parsed_chunks, encode_seconds)
+    _throughput("write (summed over threads)", parsed_chunks, write_seconds)
+    _throughput("total", parsed_chunks, time.perf_counter() - build_start)
+
+    print(f"[OK] embedding cache: {cache.hits} hits, {cache.misses} embedded")
+    cache.close()
+
+    # Keep config order so project ids are stable across builds
+    build_combined_index(
+        project_results={name: results[name] for name in PROJECTS},
+        index_dir=COMBINED_INDEX_PATH,
+        dim=dim,
+        export_json=args.export_json,
+        eval_k=args.eval_k,
+    )
+
+    if args.storage_report:
+        storage_report(
+            np.concatenate([np.zeros((0, dim), np.float32)] + [e for _, e in results.values()]),
+            dim,
+            k=args.eval_k or TOP_K,
         )
 
+    # Routing descriptors: embedded once, reused by every "All Projects" query
+    router = build_router(embedder, PROJECT_ROUTING)
+    router.save(ROUTING_MATRIX_PATH)
+    print(f"[OK] routing matrix: {len(router.names)} projects -> {ROUTING_MATRIX_PATH}")
+
 
 if __name__ == "__main__":
     main()
@@ -103,8 +103,17 @@ PROJECT_ROUTING = {
 # -------------------------------------------------
 INCLUDE_EXTENSIONS = {".py", ".md"}
 
+# Index functions/classes from .py files in addition to README.md
+INDEX_SOURCE_CODE = True
+
+# README chunks: estimated-token window and overlap between split sections
+# (MiniLM truncates its input at 256 word pieces)
+README_CHUNK_TOKENS = 200
+README_CHUNK_OVERLAP = 30
+
 EXCLUDE_DIRS = {
     ".venv",
+    "node_modules",
     "__pycache__",
     "data",
     "models",
@@ -118,9 +127,106 @@ EXCLUDE_DIRS = {
 # RAG parameters
 # -------------------------------------------------
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+# "sentence-transformers" (PyTorch), "onnx" or "onnx-int8" (see rag/embeddings.py)
+EMBEDDING_BACKEND = "sentence-transformers"
+# Exported model directory for the onnx backends
+EMBEDDING_MODEL_DIR = Path("models/all-MiniLM-L6-v2-onnx")
+EMBED_BATCH_SIZE = 64
 TOP_K = 5
 
 
+# -------------------------------------------------
+# Vector index
+# INDEX_FACTORY: any FAISS factory string, e.g. "Flat", "IVF", "IVF,PQ",
+# "HNSW32", or quantized storage "SQfp16" (2 B/dim), "SQ8" (1 B/dim), "PQ".
+# Bare "IVF"/"PQ" are sized from the corpus at build time.
+# INDEX_METRIC: "ip" (cosine on normalized vectors) or "l2"
+# -------------------------------------------------
+INDEX_FACTORY = "Flat"
+INDEX_METRIC = "ip"
+INDEX_NPROBE = 8
+INDEX_EF_SEARCH = 64
+# Quantized indexes: re-rank INDEX_RESCORE_FACTOR x more candidates with exact
+# float32 vectors memory-mapped from disk (python build_index.py --storage-report)
+INDEX_RESCORE = True
+INDEX_RESCORE_FACTOR = 4
+
+
+# -------------------------------------------------
+# Hybrid retrieval (BM25 + dense, reciprocal-rank fusion)
+# -------------------------------------------------
+HYBRID_RETRIEVAL = True
+RRF_K = 60
+
+# Approximate prompt tokens available for retrieved context
+CONTEXT_TOKEN_BUDGET = 3000
+
+# MMR trade-off between relevance and diversity (1.0 = relevance only, None = off)
+MMR_LAMBDA = 0.7
+
+
+# -------------------------------------------------
+# Optional cross-encoder reranking (CPU)
+# -------------------------------------------------
+RERANK_ENABLED = False
+RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANK_BUDGET_MS = 200
+
+
+# -------------------------------------------------
+# Shared embedding / retrieval service (python -m rag.service)
+# -------------------------------------------------
+# When set, the UI and CLI embed and search through the service instead of
+# loading their own model and indexes (None = in-process)
+SERVICE_URL = None
+# How long the service waits to fill a micro-batch, and its maximum size
+SERVICE_BATCH_WINDOW_MS = 3.0
+SERVICE_MAX_BATCH = 64
+
+
+# -------------------------------------------------
+# Tracing
+# -------------------------------------------------
+# Finished spans are appended here as OpenTelemetry-shaped JSONL (None = off)
+TRACE_PATH = Path(".cache/traces.jsonl")
+# Show the per-stage span table in the "Sources used" expander
+TRACE_SHOW_IN_UI = True
+
+
+# -------------------------------------------------
+# Answer cache (in front of Gemini)
+# -------------------------------------------------
+ANSWER_CACHE_PATH = Path(".cache/answers.sqlite")
+ANSWER_CACHE_TTL_SECONDS = 7 * 24 * 3600
+ANSWER_CACHE_MAX_ENTRIES = 2000
+ANSWER_CACHE_SIMILARITY = 0.95
+
+
+# -------------------------------------------------
+# LLM rate limits (shared by all sessions of a process)
+# -------------------------------------------------
+# Per-model (requests per minute, tokens per minute) budgets, enforced
+# locally before a request is sent; defaults are the Gemini free tier
+LLM_MODEL_LIMITS = {
+    "models/gemini-2.5-flash-lite": (15, 250_000),
+    "models/gemma-3-4b-it": (30, 15_000),
+}
+
+
+# -------------------------------------------------
+# Index artifacts shared across projects
+# -------------------------------------------------
+INDEX_ROOT = Path("rag/indexes")
+COMBINED_INDEX_PATH = INDEX_ROOT / "all_projects"
+ROUTING_MATRIX_PATH = INDEX_ROOT / "routing_matrix.npz"
+
+# Build-time cache of chunk embeddings (not needed at query time)
+EMBEDDING_CACHE_PATH = INDEX_ROOT / "embedding_cache.sqlite"
+
+# Build-time cache of rendered folder trees, validated by directory mtimes
+FOLDER_TREE_CACHE_DIR = Path(".cache/folder_trees")
+
+
 # -------------------------------------------------
 # Safety check (fail fast if config is inconsistent)
 # -------------------------------------------------
@@ -0,0 +1,231 @@
+"""
+Pluggable sentence embedders with lazily imported backends.
+
+Design:
+- Every backend exposes the subset of the SentenceTransformer API the
+  pipeline uses: encode(texts, batch_size=...), get_sentence_embedding_dimension()
+  and model_name, so indexing, routing and retrieval do not care which one runs.
+- Heavy libraries (torch / sentence_transformers, onnxruntime) are imported
+  only when an embedder of that backend is created, never at module import.
+- "onnx" runs an exported model with ONNX Runtime and the Rust `tokenizers`
+  package (no torch at query time); "onnx-int8" additionally applies dynamic
+  int8 weight quantization, cached next to the fp32 model.
+- cache_key includes the backend when it can change the vectors, so the
+  build-time embedding cache never mixes fp32 and int8 embeddings.
+
+Exporting a model directory for the ONNX backends (needs torch + transformers once):
+    python -m rag.embeddings export --model all-MiniLM-L6-v2 --out models/all-MiniLM-L6-v2-onnx
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+
+BACKENDS = ("sentence-transformers", "onnx", "onnx-int8")
+
+ONNX_FILE = "model.onnx"
+ONNX_INT8_FILE = "model.int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+
+
+class SentenceTransformerEmbedder:
+    """
+    PyTorch backend (the reference implementation).
+    """
+
+    backend = "sentence-transformers"
+
+    def __init__(self, model_name: str, device: str = "cpu"):
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.cache_key = model_name
+        self._model = SentenceTransformer(model_name, device=device)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self._model.get_sentence_embedding_dimension()
+
+    def encode(self, texts, batch_size: int = 32, **kwargs) -> np.ndarray:
+        return self._model.encode(texts, batch_size=batch_size, **kwargs)
+
+
+class OnnxEmbedder:
+    """
+    ONNX Runtime backend: tokenizer.json + model.onnx from a local directory,
+    mean pooling over the attention mask, then L2 normalization (as the
+    sentence-transformers MiniLM pipeline does).
+    """
+
+    def __init__(
+        self,
+        model_dir: Path,
+        model_name: str,
+        quantize: bool = False,
+        max_length: int = 256,
+        threads: Optional[int] = None,
+    ):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_dir = Path(model_dir)
+        self.model_name = model_name
+        self.backend = "onnx-int8" if quantize else "onnx"
+        self.cache_key = f"{model_name}@{self.backend}"
+
+        model_path = self.model_dir / ONNX_FILE
+        if quantize:
+            model_path = quantize_onnx(model_path, self.model_dir / ONNX_INT8_FILE)
+
+        self._tokenizer = Tokenizer.from_file(str(self.model_dir / TOKENIZER_FILE))
+        self._tokenizer.enable_truncation(max_length=max_length)
+        self._tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self._session = ort.InferenceSession(
+            str(model_path), options, providers=["CPUExecutionProvider"]
+        )
+        self._inputs = {i.name for i in self._session.get_inputs()}
+        self._dim = self._session.get_outputs()[0].shape[-1]
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return int(self._dim)
+
+    def _encode_batch(self, texts: Sequence[str]) -> np.ndarray:
+        encodings = self._tokenizer.encode_batch(list(texts))
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention}
+        if "token_type_ids" in self._inputs:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        token_embeddings = self._session.run(None, feeds)[0]
+        mask = attention[..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+    def encode(self, texts, batch_size: int = 32, **kwargs) -> np.ndarray:
+        """
+        kwargs accepted for SentenceTransformer compatibility (e.g.
+        show_progress_bar) and ignored.
+        """
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        if not texts:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        # Sort by length so each batch pads to similar sizes
+        order = np.argsort([len(t) for t in texts])
+        out = np.empty((len(texts), self.get_sentence_embedding_dimension()), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            rows = order[start:start + batch_size]
+            out[rows] = self._encode_batch([texts[i] for i in rows])
+
+        return out[0] if single else out
+
+
+def quantize_onnx(model_path: Path, out_path: Path) -> Path:
+    """
+    Dynamic int8 weight quantization; reuses out_path when it is newer.
+    """
+    if out_path.exists() and out_path.stat().st_mtime >= model_path.stat().st_mtime:
+        return out_path
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(str(model_path), str(out_path), weight_type=QuantType.QInt8)
+    return out_path
+
+
+def load_embedder(
+    model_name: str,
+    backend: str = "sentence-transformers",
+    model_dir: Optional[Path] = None,
+):
+    """
+    Create the embedder for backend (see BACKENDS).
+    """
+    if backend == "sentence-transformers":
+        return SentenceTransformerEmbedder(model_name)
+    if backend in ("onnx", "onnx-int8"):
+        if model_dir is None or not (Path(model_dir) / ONNX_FILE).exists():
+            raise FileNotFoundError(
+                f"No {ONNX_FILE} in {model_dir}; export one with "
+                f"`python -m rag.embeddings export --model {model_name} --out <dir>`."
+            )
+        return OnnxEmbedder(model_dir, model_name, quantize=backend == "onnx-int8")
+    raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {BACKENDS}")
+
+
+def export_onnx(model_name: str, out_dir: Path, opset: int = 17) -> Path:
+    """
+    Export the transformer of a sentence-transformers model plus its fast
+    tokenizer to out_dir (model.onnx, tokenizer.json).
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+    tokenizer.save_pretrained(str(out_dir))
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    dynamic = {n: {0: "batch", 1: "sequence"} for n in names}
+    dynamic["token_embeddings"] = {0: "batch", 1: "sequence"}
+
+    class _TokenEmbeddings(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *args):
+            return self.model(**dict(zip(names, args))).last_hidden_state
+
+    torch.onnx.export(
+        _TokenEmbeddings(transformer),
+        tuple(sample[n] for n in names),
+        str(out_dir / ONNX_FILE),
+        input_names=names,
+        output_names=["token_embeddings"],
+        dynamic_axes=dynamic,
+        opset_version=opset,
+        dynamo=False,
+    )
+    return out_dir / ONNX_FILE
+
+
+def _parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Embedding backend utilities.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="export a model for the onnx backends")
+    export.add_argument("--model", required=True, help="sentence-transformers model name or path")
+    export.add_argument("--out", type=Path, required=True, help="output model directory")
+    export.add_argument("--int8", action="store_true", help="also write the int8 model")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+
+    if args.command == "export":
+        path = export_onnx(args.model, args.out)
+        print(f"[OK] exported {args.model} -> {path}")
+        if args.int8:
+            path = quantize_onnx(path, args.out / ONNX_INT8_FILE)
+            print(f"[OK] int8 model -> {path}")
+
+
+if __name__ == "__main__":
+    main()
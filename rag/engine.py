@@ -0,0 +1,343 @@
+"""
+Headless query engine: routing, retrieval, context packing and generation.
+
+Design:
+- The same pipeline as the Streamlit app, without any UI state, so it can
+  be driven by app/ui.py (one question) or rag/query.py (a question file).
+- Batches: all questions are embedded in one encode call, and each index
+  is searched once per batch with a query matrix. In "All Projects" mode,
+  questions routed to the same project set share one filtered search.
+- LLM calls run concurrently under max_concurrency; RPM/TPM budgets and
+  429/503 backoff are still enforced by the shared LLMScheduler.
+- Per-question timings for batched stages are amortized over the batch.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from rag.llm.gemini_client import generate_answer
+from rag.prompts import SYSTEM_PROMPT_ALL, SYSTEM_PROMPT_PROJECT, PROMPT_VERSION
+from rag.retrieval.context import ContextReport, build_context
+from rag.retrieval.multi_retriever import MultiProjectRetriever
+from rag.retrieval.query_embeddings import encode_queries, model_key
+from rag.tracing import span
+
+
+ALL_PROJECTS = "All Projects"
+
+
+@dataclass
+class RetrievalResult:
+    question: str
+    scope: str
+    query_vec: np.ndarray
+    docs: List[Dict]
+    context: str
+    context_report: ContextReport
+    routed_projects: List[str] = field(default_factory=list)
+    rerank_report: Optional[object] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class QueryResult:
+    retrieval: RetrievalResult
+    answer: Optional[str] = None
+    model: Optional[str] = None
+    cache: Optional[str] = None  # None (not used), "miss", "exact" or "semantic"
+    error: Optional[str] = None
+
+    def as_record(self) -> Dict:
+        """
+        JSON-serializable summary (one line of the CLI's JSONL output).
+        """
+        r = self.retrieval
+        return {
+            "question": r.question,
+            "scope": r.scope,
+            "routed_projects": r.routed_projects,
+            "answer": self.answer,
+            "model": self.model,
+            "cache": self.cache,
+            "error": self.error,
+            "sources": [
+                {
+                    "project": d.get("project"),
+                    "source": d.get("source"),
+                    "section_title": d.get("section_title"),
+                    "byte_range": (
+                        [d["byte_start"], d["byte_end"]] if "byte_start" in d else None
+                    ),
+                    "score": d.get("score"),
+                }
+                for d in r.docs
+            ],
+            "context": r.context_report.as_dict(),
+            "timings_ms": {k: round(v, 2) for k, v in r.timings.items()},
+        }
+
+
+class QueryEngine:
+    def __init__(
+        self,
+        embedder,
+        registry,
+        project_indexes: Dict[str, Path],
+        router=None,
+        combined_index: Optional[Path] = None,
+        reranker=None,
+        answer_cache=None,
+        token_budget: Optional[int] = 3000,
+        mmr_lambda: Optional[float] = None,
+        route_top_n: int = 3,
+        all_projects_top_k: int = 15,
+        project_top_k: int = 7,
+    ):
+        """
+        project_indexes:
+            dict: project_name -> index_dir
+        combined_index:
+            optional all-projects index dir; used when it exists on disk
+        """
+        self.embedder = embedder
+        self.registry = registry
+        self.project_indexes = project_indexes
+        self.router = router
+        self.combined_index = combined_index
+        self.reranker = reranker
+        self.answer_cache = answer_cache
+        # Answer-cache vectors are only comparable within one embedder
+        # (embedder may be None when callers always pass query vectors)
+        self.embedder_key = model_key(embedder)
+        self.token_budget = token_budget
+        self.mmr_lambda = mmr_lambda
+        self.route_top_n = route_top_n
+        self.all_projects_top_k = all_projects_top_k
+        self.project_top_k = project_top_k
+
+    # -------------------------------------------------
+    # Retrieval
+    # -------------------------------------------------
+    def retrieve(
+        self,
+        question: str,
+        scope: str = ALL_PROJECTS,
+        query_vec: Optional[np.ndarray] = None,
+    ) -> RetrievalResult:
+        query_vecs = None if query_vec is None else np.asarray(query_vec).reshape(1, -1)
+        return self.retrieve_batch([question], scope, query_vecs)[0]
+
+    def retrieve_batch(
+        self,
+        questions: List[str],
+        scope: str = ALL_PROJECTS,
+        query_vecs: Optional[np.ndarray] = None,
+    ) -> List[RetrievalResult]:
+        if not questions:
+            return []
+
+        start = time.perf_counter()
+        if query_vecs is None:
+            query_vecs = encode_queries(self.embedder, questions)
+        encode_ms = (time.perf_counter() - start) * 1000 / len(questions)
+
+        fetch_factor = 2 if self.reranker is not None else 1
+        routed: List[List[str]] = [[] for _ in questions]
+        docs: List[List[Dict]] = [[] for _ in questions]
+
+        start = time.perf_counter()
+        if scope == ALL_PROJECTS:
+            top_k = self.all_projects_top_k * fetch_factor
+
+            # Questions routed to the same project set share one search
+            groups: Dict[tuple, List[int]] = {}
+            with span("route", queries=len(questions), top_n=self.route_top_n) as s:
+                for i, vec in enumerate(query_vecs):
+                    routed[i] = [p for p, _ in self.router.route(vec, top_n=self.route_top_n)]
+                    groups.setdefault(tuple(sorted(routed[i])), []).append(i)
+                s.set(project_sets=len(groups))
+
+            for projects, rows in groups.items():
+                for row, found in zip(rows, self._search_projects(
+                    list(projects), query_vecs[rows], [questions[i] for i in rows], top_k
+                )):
+                    docs[row] = found
+        else:
+            retriever = self.registry.get(self.project_indexes[scope], name=scope)
+            docs = retriever.retrieve_batch(
+                query_vecs,
+                top_k=self.project_top_k * fetch_factor,
+                query_texts=questions,
+                mmr_lambda=self.mmr_lambda,
+            )
+        retrieve_ms = (time.perf_counter() - start) * 1000 / len(questions)
+
+        results = []
+        for i, question in enumerate(questions):
+            timings = {"encode": encode_ms, "retrieve": retrieve_ms}
+
+            rerank_report = None
+            if self.reranker is not None:
+                with span("rerank", candidates=len(docs[i])) as s:
+                    docs[i], rerank_report = self.reranker.rerank(
+                        question, docs[i], top_k=len(docs[i]) // fetch_factor
+                    )
+                    s.set(
+                        scored=rerank_report.scored,
+                        cache_hits=rerank_report.cached,
+                        skipped=rerank_report.skipped,
+                    )
+                timings["rerank"] = rerank_report.added_ms
+
+            start = time.perf_counter()
+            context, context_report = build_context(
+                docs[i], token_budget=self.token_budget, return_report=True
+            )
+            timings["context"] = (time.perf_counter() - start) * 1000
+
+            results.append(RetrievalResult(
+                question=question,
+                scope=scope,
+                query_vec=query_vecs[i],
+                docs=docs[i],
+                context=context,
+                context_report=context_report,
+                routed_projects=routed[i],
+                rerank_report=rerank_report,
+                timings=timings,
+            ))
+        return results
+
+    def _search_projects(
+        self,
+        projects: List[str],
+        query_vecs: np.ndarray,
+        questions: List[str],
+        top_k: int,
+    ) -> List[List[Dict]]:
+        if self.combined_index is not None and (self.combined_index / "rag_index.faiss").exists():
+            # One filtered matrix search over the combined index
+            retriever = self.registry.get(self.combined_index, name="all_projects")
+            return retriever.retrieve_batch(
+                query_vecs,
+                top_k=top_k,
+                projects=projects,
+                query_texts=questions,
+                mmr_lambda=self.mmr_lambda,
+            )
+
+        # Older index builds: parallel per-project searches, merged by score
+        retriever = MultiProjectRetriever(
+            project_indexes={p: self.project_indexes[p] for p in projects},
+            embedder=self.embedder,
+            registry=self.registry,
+        )
+        return [
+            retriever.retrieve_by_vector(
+                vec, top_k=top_k, query_text=question, mmr_lambda=self.mmr_lambda
+            )
+            for vec, question in zip(query_vecs, questions)
+        ]
+
+    # -------------------------------------------------
+    # Generation
+    # -------------------------------------------------
+    @staticmethod
+    def system_prompt(scope: str) -> str:
+        return SYSTEM_PROMPT_ALL if scope == ALL_PROJECTS else SYSTEM_PROMPT_PROJECT
+
+    def lookup_cached(self, retrieval: RetrievalResult):
+        if self.answer_cache is None:
+            return None
+        with span("answer_cache.lookup") as s:
+            cached = self.answer_cache.lookup(
+                scope=retrieval.scope,
+                prompt_version=PROMPT_VERSION,
+                context=retrieval.context,
+                question=retrieval.question,
+                question_vec=retrieval.query_vec,
+                embedder_key=self.embedder_key,
+            )
+            s.set(cache_hit=cached is not None, match=cached.match if cached else None)
+        return cached
+
+    def store_answer(self, retrieval: RetrievalResult, answer: str, model: str) -> None:
+        if self.answer_cache is None:
+            return
+        self.answer_cache.store(
+            scope=retrieval.scope,
+            prompt_version=PROMPT_VERSION,
+            context=retrieval.context,
+            question=retrieval.question,
+            question_vec=retrieval.query_vec,
+            embedder_key=self.embedder_key,
+            answer=answer,
+            model=model,
+        )
+
+    def answer(self, client, retrieval: RetrievalResult, scheduler=None) -> QueryResult:
+        """
+        Answer one retrieved question (answer cache first, then the LLM).
+        """
+        result = QueryResult(retrieval=retrieval)
+
+        cached = self.lookup_cached(retrieval)
+        if cached is not None:
+            result.answer, result.model, result.cache = cached.answer, cached.model, cached.match
+            return result
+
+        start = time.perf_counter()
+        try:
+            result.answer, result.model = generate_answer(
+                client=client,
+                context=retrieval.context,
+                question=retrieval.question,
+                system_prompt=self.system_prompt(retrieval.scope),
+                scheduler=scheduler,
+            )
+        except Exception as e:
+            # One failed question must not abort a batch run
+            result.error = f"{type(e).__name__}: {e}"
+            return result
+        finally:
+            retrieval.timings["llm"] = (time.perf_counter() - start) * 1000
+
+        if self.answer_cache is not None:
+            result.cache = "miss"
+            self.store_answer(retrieval, result.answer, result.model)
+        return result
+
+    def answer_batch(
+        self,
+        client,
+        questions: List[str],
+        scope: str = ALL_PROJECTS,
+        max_concurrency: int = 4,
+        scheduler=None,
+    ) -> List[QueryResult]:
+        """
+        Retrieve for all questions in one batch, then answer them with at
+        most max_concurrency LLM calls in flight. Results keep input order.
+        """
+        retrievals = self.retrieve_batch(questions, scope)
+
+        if client is None:
+            return [QueryResult(retrieval=r) for r in retrievals]
+
+        with ThreadPoolExecutor(
+            max_workers=max(1, max_concurrency), thread_name_prefix="rag-llm"
+        ) as pool:
+            # copy_context keeps tracing spans parented across threads
+            futures = [
+                pool.submit(contextvars.copy_context().run, self.answer, client, r, scheduler)
+                for r in retrievals
+            ]
+            return [f.result() for f in futures]
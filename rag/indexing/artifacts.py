@@ -0,0 +1,47 @@
+"""
+Atomic replacement of index artifacts.
+
+Design:
+- The retriever memory-maps rag_index.faiss, rag_docs.bin and the .npy
+  sidecars. Rewriting one of them in place while the app is serving would
+  truncate a live mapping (SIGBUS) or serve a half-written file.
+- Every artifact is written to a temp file in the same directory and then
+  os.replace()d into place: existing mappings keep the old inode, and new
+  readers see either the old file or the new one, never a partial one.
+- Builders write index_meta.json last. The registry reloads when that file
+  changes, so a reload starts only once a complete set is in place.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+
+TMP_SUFFIX = ".tmp"
+
+
+def is_temp_file(name: str) -> bool:
+    return name.startswith(".") and name.endswith(TMP_SUFFIX)
+
+
+@contextmanager
+def atomic_path(path: Path) -> Iterator[Path]:
+    """
+    Yield a temporary path next to path; when the block succeeds it replaces
+    path atomically, otherwise it is removed.
+
+    Write through a file handle for numpy (np.save on a path appends ".npy").
+    """
+    path = Path(path)
+    # Writer threads may build several projects at once
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}{TMP_SUFFIX}")
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
@@ -0,0 +1,113 @@
+"""
+Content-addressed on-disk cache of chunk embeddings.
+
+Design:
+- Key = (embedding model name, SHA-256 of the chunk text).
+- Backed by a single SQLite file; vectors are stored as raw float32 blobs.
+- Index rebuilds only embed new or changed chunks; everything else is
+  assembled from cached vectors.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+
+# SQLite's default limit on bound parameters per statement
+_SQL_BATCH = 900
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, path: Path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vec BLOB NOT NULL,
+                PRIMARY KEY (model, sha256)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def _lookup(self, model_name: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+
+        for start in range(0, len(hashes), _SQL_BATCH):
+            batch = hashes[start:start + _SQL_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._conn.execute(
+                f"SELECT sha256, vec FROM embeddings "
+                f"WHERE model = ? AND sha256 IN ({placeholders})",
+                [model_name, *batch],
+            )
+            for sha, blob in rows:
+                found[sha] = np.frombuffer(blob, dtype=np.float32)
+
+        return found
+
+    def _store(self, model_name: str, items: Dict[str, np.ndarray]) -> None:
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, sha256, dim, vec) VALUES (?, ?, ?, ?)",
+            [
+                (model_name, sha, int(vec.shape[0]), vec.astype(np.float32).tobytes())
+                for sha, vec in items.items()
+            ],
+        )
+        self._conn.commit()
+
+    def encode(self, embedder, texts: List[str], model_name: str, **encode_kwargs) -> np.ndarray:
+        """
+        Embed texts, computing only the ones not already cached.
+
+        Returns a (len(texts), dim) float32 matrix in input order.
+        """
+        hashes = [text_hash(t) for t in texts]
+        unique = list(dict.fromkeys(hashes))
+
+        with self._lock:
+            vectors = self._lookup(model_name, unique)
+
+        missing = [h for h in unique if h not in vectors]
+        if missing:
+            text_by_hash = dict(zip(hashes, texts))
+            fresh = np.asarray(
+                embedder.encode([text_by_hash[h] for h in missing], **encode_kwargs),
+                dtype=np.float32,
+            )
+            new_items = dict(zip(missing, fresh))
+            with self._lock:
+                self._store(model_name, new_items)
+            vectors.update(new_items)
+
+        self.hits += len(unique) - len(missing)
+        self.misses += len(missing)
+
+        if not texts:
+            dim = embedder.get_sentence_embedding_dimension()
+            return np.zeros((0, dim), dtype=np.float32)
+
+        return np.stack([vectors[h] for h in hashes]).astype(np.float32, copy=False)
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,324 @@
+"""
+FAISS index construction from config (factory string + metric).
+
+Design:
+- config.INDEX_FACTORY selects the index type: "Flat", "IVF", "IVF,PQ",
+  "HNSW32", or any explicit FAISS factory string ("IVF256,SQ8", ...).
+- Bare "IVF"/"PQ" are sized from the corpus (nlist ~ sqrt(n), PQ m = dim/8),
+  and small corpora that cannot train them fall back to exact Flat search.
+- The resolved type, metric and search parameters are written to
+  index_meta.json so the retriever can configure nprobe/efSearch.
+- Quantized storage ("SQfp16", "SQ8", "PQ", "IVF,SQ8", ...) can be paired
+  with exact re-scoring: the unit float32 vectors are kept in a
+  memory-mapped .npy, and rescore_factor x more candidates are re-ranked
+  with exact distances, so only the candidates' rows are ever read.
+- evaluate_index reports bytes per vector and recall against exact search,
+  with and without re-scoring.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import re
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from rag.indexing.artifacts import atomic_path
+
+
+META_FILE = "index_meta.json"
+RESCORE_FILE = "rag_vectors.f32.npy"
+
+METRICS = {
+    "l2": faiss.METRIC_L2,
+    "ip": faiss.METRIC_INNER_PRODUCT,
+}
+
+# PQ/IVF k-means needs a reasonable number of points per centroid
+_MIN_TRAIN_PER_CENTROID = 39
+
+
+def _nlist_for(n: int) -> int:
+    return max(1, min(int(4 * math.sqrt(n)), n // _MIN_TRAIN_PER_CENTROID))
+
+
+def resolve_factory(factory: str, n: int, dim: int) -> str:
+    """
+    Turn a config factory string into a concrete one for n vectors of size dim.
+    """
+    parts = [p.strip() for p in factory.split(",") if p.strip()]
+    resolved = []
+
+    for part in parts:
+        if part == "IVF":
+            part = f"IVF{_nlist_for(n)}"
+        elif part == "PQ":
+            part = f"PQ{max(1, dim // 8)}"
+        resolved.append(part)
+
+    # IVF with nothing after it stores full vectors
+    if len(resolved) == 1 and resolved[0].startswith("IVF"):
+        resolved.append("Flat")
+
+    resolved_str = ",".join(resolved) or "Flat"
+
+    if _needs_training(resolved_str) and n < _min_train_size(resolved_str):
+        print(
+            f"[WARN] {resolved_str} needs at least {_min_train_size(resolved_str)} "
+            f"vectors to train, have {n}; using Flat"
+        )
+        return "Flat"
+
+    return resolved_str
+
+
+def _needs_training(factory: str) -> bool:
+    return bool(re.search(r"IVF|PQ|SQ", factory))
+
+
+def _min_train_size(factory: str) -> int:
+    size = 1
+    ivf = re.search(r"IVF(\d+)", factory)
+    if ivf:
+        size = max(size, int(ivf.group(1)) * _MIN_TRAIN_PER_CENTROID)
+    pq = re.search(r"PQ\d+(?:x(\d+))?", factory)
+    if pq:
+        nbits = int(pq.group(1) or 8)
+        size = max(size, 2 ** nbits)
+    return size
+
+
+def is_lossy(factory: str) -> bool:
+    """
+    True if the index stores compressed codes instead of the raw vectors.
+    """
+    return bool(re.search(r"PQ|SQ|LSH|RaBitQ", factory))
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32).copy()
+    if len(vectors):
+        faiss.normalize_L2(vectors)
+    return vectors
+
+
+def build_faiss_index(
+    vectors: np.ndarray,
+    dim: int,
+    factory: str = "Flat",
+    metric: str = "ip",
+    nprobe: int = 8,
+    ef_search: int = 64,
+) -> Tuple[faiss.Index, Dict]:
+    """
+    Build (and train, if needed) an index over vectors.
+
+    Returns the index and its metadata dict.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, dim)
+    if metric == "ip":
+        # Inner product on unit vectors == cosine similarity
+        vectors = _normalize(vectors)
+
+    resolved = resolve_factory(factory, len(vectors), dim)
+    index = faiss.index_factory(dim, resolved, METRICS[metric])
+
+    if not index.is_trained:
+        index.train(vectors)
+    if len(vectors):
+        index.add(vectors)
+
+    meta = {
+        "factory": factory,
+        "resolved_factory": resolved,
+        "metric": metric,
+        "dim": dim,
+        "ntotal": int(index.ntotal),
+        "nprobe": nprobe,
+        "efSearch": ef_search,
+    }
+    configure_index(index, meta)
+    return index, meta
+
+
+def configure_index(index: faiss.Index, meta: Optional[Dict]) -> None:
+    """
+    Apply stored search-time parameters (nprobe / efSearch) to an index.
+    """
+    if not meta:
+        return
+
+    params = faiss.ParameterSpace()
+    resolved = meta.get("resolved_factory", "")
+    if "IVF" in resolved:
+        params.set_index_parameter(index, "nprobe", int(meta.get("nprobe", 8)))
+    if "HNSW" in resolved:
+        params.set_index_parameter(index, "efSearch", int(meta.get("efSearch", 64)))
+
+
+def search_parameters(meta: Optional[Dict], selector=None):
+    """
+    SearchParameters of the right type for this index, optionally filtered.
+    """
+    resolved = (meta or {}).get("resolved_factory", "")
+
+    if "IVF" in resolved:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=int(meta.get("nprobe", 8)))
+    if "HNSW" in resolved:
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=int(meta.get("efSearch", 64)))
+    return faiss.SearchParameters(sel=selector)
+
+
+def write_rescore_vectors(vectors: np.ndarray, index_dir: Path, metric: str = "ip") -> None:
+    """
+    Exact float32 copies of the indexed vectors (normalized like the index).
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if metric == "ip":
+        vectors = _normalize(vectors)
+    with atomic_path(index_dir / RESCORE_FILE) as tmp, open(tmp, "wb") as f:
+        np.save(f, vectors)
+
+
+def load_rescore_vectors(index_dir: Path) -> Optional[np.ndarray]:
+    """
+    Memory-mapped float32 vectors, or None if the index has no re-scoring file.
+    """
+    path = index_dir / RESCORE_FILE
+    if not path.exists():
+        return None
+    return np.load(path, mmap_mode="r")
+
+
+def rescore(
+    query_vecs: np.ndarray,
+    indices: np.ndarray,
+    vectors: np.ndarray,
+    metric_type: int,
+    k: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Exact distances for each row's candidate ids; returns the best k per row
+    as (distances, indices), padded like FAISS (-1 ids).
+    """
+    ip = metric_type == faiss.METRIC_INNER_PRODUCT
+    out_distances = np.full((len(query_vecs), k), -np.inf if ip else np.inf, dtype=np.float32)
+    out_indices = np.full((len(query_vecs), k), -1, dtype=np.int64)
+
+    for row, query in enumerate(query_vecs):
+        # Sorted ids read the memory-mapped rows front to back
+        ids = np.unique(indices[row][indices[row] >= 0])
+        if len(ids) == 0:
+            continue
+        candidates = np.asarray(vectors[ids], dtype=np.float32)
+
+        if ip:
+            distances = candidates @ query
+            order = np.argsort(-distances)[:k]
+        else:
+            diff = candidates - query
+            distances = np.einsum("ij,ij->i", diff, diff)
+            order = np.argsort(distances)[:k]
+
+        out_distances[row, :len(order)] = distances[order]
+        out_indices[row, :len(order)] = ids[order]
+
+    return out_distances, out_indices
+
+
+def bytes_per_vector(index: faiss.Index) -> Optional[float]:
+    """
+    Serialized index size divided by its vector count (codes + overhead).
+    """
+    if index.ntotal == 0:
+        return None
+    return len(faiss.serialize_index(index)) / index.ntotal
+
+
+def write_index_meta(meta: Dict, index_dir: Path) -> None:
+    """
+    Written last by the builders: replacing it is what makes a serving
+    registry reload the index.
+    """
+    with atomic_path(index_dir / META_FILE) as tmp, open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+
+def read_index_meta(index_dir: Path) -> Optional[Dict]:
+    """
+    Index metadata, or None for indexes built before it was recorded
+    (those are always exact IndexFlatL2).
+    """
+    path = index_dir / META_FILE
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def evaluate_index(
+    index: faiss.Index,
+    vectors: np.ndarray,
+    meta: Dict,
+    k: int = 5,
+    n_queries: int = 200,
+    seed: int = 0,
+    rescore_factor: Optional[int] = None,
+) -> Optional[Dict]:
+    """
+    recall@k, per-query latency and bytes per vector of index against exact
+    flat search; with rescore_factor, also recall after exact re-scoring of
+    rescore_factor * k candidates.
+
+    Queries are a sample of the indexed vectors; returns None for empty indexes.
+    """
+    n = len(vectors)
+    if n == 0:
+        return None
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if meta["metric"] == "ip":
+        vectors = _normalize(vectors)
+
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.choice(n, size=min(n_queries, n), replace=False)]
+    k = min(k, n)
+
+    exact = faiss.IndexFlat(meta["dim"], METRICS[meta["metric"]])
+    exact.add(vectors)
+
+    start = time.perf_counter()
+    _, truth = exact.search(queries, k)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    start = time.perf_counter()
+    _, found = index.search(queries, k)
+    index_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+
+    report = {
+        "index": meta["resolved_factory"],
+        "k": k,
+        "queries": len(queries),
+        "recall_at_k": hits / (len(queries) * k),
+        "latency_ms": index_ms,
+        "flat_latency_ms": exact_ms,
+        "bytes_per_vector": bytes_per_vector(index),
+        "flat_bytes_per_vector": 4 * meta["dim"],
+    }
+
+    if rescore_factor:
+        start = time.perf_counter()
+        _, candidates = index.search(queries, min(n, k * rescore_factor))
+        _, found = rescore(queries, candidates, vectors, METRICS[meta["metric"]], k)
+        report["rescored_latency_ms"] = (time.perf_counter() - start) * 1000 / len(queries)
+        hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+        report["rescored_recall_at_k"] = hits / (len(queries) * k)
+
+    return report
@@ -0,0 +1,284 @@
+"""
+Bounded folder-tree rendering for the "Folder Structure" chunk.
+
+Design choice:
+- One os.scandir per directory; excluded directories (EXCLUDE_DIRS, .git,
+  __pycache__) and paths matched by .gitignore files are pruned before
+  descending, so .venv / node_modules are never walked.
+- .gitignore support covers what repos commonly use: nested files,
+  comments, "!" negation, trailing "/" (directories only), anchored
+  patterns ("/build", "docs/tmp") and "*", "?", "[...]", "**" globs.
+- At most max_entries_per_dir entries per directory and max_entries in
+  total are listed; the rest is summarized as "… N more", which bounds
+  both the walk and the chunk's token cost.
+- The rendered tree is cached per root. The cache records the mtime of every
+  directory it scanned and every .gitignore it read; adding, removing or
+  renaming an entry changes its directory's mtime, so a cache hit costs
+  one stat() per scanned directory instead of a full walk.
+"""
+
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+ALWAYS_EXCLUDED = {".git", "__pycache__"}
+GITIGNORE_FILE = ".gitignore"
+
+_CACHE_VERSION = 1
+
+
+# -------------------------------------------------
+# .gitignore rules
+# -------------------------------------------------
+def _glob_to_regex(glob: str) -> str:
+    out = []
+    i = 0
+    while i < len(glob):
+        if glob.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif glob.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif glob[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif glob[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif glob[i] == "[" and "]" in glob[i + 1:]:
+            end = glob.index("]", i + 1)
+            body = glob[i + 1:end].replace("\\", "\\\\")
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            out.append(f"[{body}]")
+            i = end + 1
+        else:
+            out.append(re.escape(glob[i]))
+            i += 1
+    return "".join(out)
+
+
+def parse_gitignore(lines: Iterable[str], base: str = "") -> List[Tuple["re.Pattern", bool, bool]]:
+    """
+    Compile .gitignore lines into (regex, negate, dir_only) rules.
+
+    base:
+        posix path of the .gitignore's directory relative to the walk root
+        ("" for the root); patterns match paths relative to the walk root.
+    """
+    prefix = re.escape(base + "/") if base else ""
+    rules = []
+
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if not line.strip() or line.startswith("#"):
+            continue
+        line = line.rstrip()
+
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        if line.startswith("\\"):
+            line = line[1:]
+
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+
+        # A slash anywhere but the end anchors the pattern to the .gitignore's directory
+        anchored = "/" in line
+        pattern = _glob_to_regex(line.lstrip("/"))
+        if anchored:
+            regex = f"^{prefix}{pattern}$"
+        else:
+            regex = f"^{prefix}(?:.*/)?{pattern}$"
+        rules.append((re.compile(regex), negate, dir_only))
+
+    return rules
+
+
+class IgnoreRules:
+    """
+    Rules from the .gitignore files on the path from the root to a directory;
+    the last matching rule wins, so deeper files override shallower ones.
+    """
+
+    def __init__(self, rules: Tuple = ()):
+        self.rules = tuple(rules)
+
+    def extended(self, base: str, lines: Iterable[str]) -> "IgnoreRules":
+        return IgnoreRules(self.rules + tuple(parse_gitignore(lines, base)))
+
+    def ignored(self, rel_path: str, is_dir: bool) -> bool:
+        result = False
+        for regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel_path):
+                result = not negate
+        return result
+
+
+# -------------------------------------------------
+# Walk + render
+# -------------------------------------------------
+class _TreeWalker:
+    def __init__(
+        self,
+        root: Path,
+        max_depth: int,
+        exclude_dirs: Iterable[str],
+        max_entries_per_dir: int,
+        max_entries: int,
+    ):
+        self.root = root
+        self.max_depth = max_depth
+        self.exclude_dirs = ALWAYS_EXCLUDED | set(exclude_dirs)
+        self.max_entries_per_dir = max(1, max_entries_per_dir)
+        self.max_entries = max(1, max_entries)
+
+        self.lines: List[str] = [root.name]
+        self.listed = 0
+        # path -> mtime_ns of every directory scanned and .gitignore read
+        self.mtimes: Dict[str, int] = {}
+
+    def _visible(self, path: str, rel: str, rules: IgnoreRules):
+        try:
+            self.mtimes[path] = os.stat(path).st_mtime_ns
+            with os.scandir(path) as it:
+                entries = [(e, e.is_dir(follow_symlinks=False)) for e in it]
+        except OSError:
+            return [], rules
+
+        for entry, is_dir in entries:
+            if entry.name == GITIGNORE_FILE and not is_dir:
+                try:
+                    with open(entry.path, "r", encoding="utf-8", errors="replace") as f:
+                        rules = rules.extended(rel, f)
+                    self.mtimes[entry.path] = entry.stat().st_mtime_ns
+                except OSError:
+                    pass
+                break
+
+        visible = []
+        for entry, is_dir in entries:
+            if is_dir and entry.name in self.exclude_dirs:
+                continue
+            child_rel = f"{rel}/{entry.name}" if rel else entry.name
+            if rules.ignored(child_rel, is_dir):
+                continue
+            visible.append((entry, is_dir, child_rel))
+
+        visible.sort(key=lambda x: (not x[1], x[0].name.lower()))
+        return visible, rules
+
+    def walk(
+        self,
+        path: str,
+        rel: str = "",
+        prefix: str = "",
+        depth: int = 0,
+        rules: Optional[IgnoreRules] = None,
+    ) -> None:
+        if depth > self.max_depth:
+            return
+        rules = rules or IgnoreRules()
+
+        visible, rules = self._visible(path, rel, rules)
+        shown = visible[:self.max_entries_per_dir]
+        hidden = len(visible) - len(shown)
+
+        for i, (entry, is_dir, child_rel) in enumerate(shown):
+            if self.listed >= self.max_entries:
+                hidden += len(shown) - i
+                break
+
+            last = i == len(shown) - 1 and hidden == 0
+            self.lines.append(prefix + ("└── " if last else "├── ") + entry.name)
+            self.listed += 1
+
+            if is_dir:
+                extension = "    " if last else "│   "
+                self.walk(entry.path, child_rel, prefix + extension, depth + 1, rules)
+
+        if hidden:
+            self.lines.append(prefix + f"└── … {hidden} more")
+
+
+def _cache_file(cache_dir: Path, root: Path, params: Dict) -> Path:
+    key = json.dumps({"root": str(root.resolve()), **params}, sort_keys=True)
+    return cache_dir / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}.json"
+
+
+def _load_cached(path: Path) -> Optional[str]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if cached.get("version") != _CACHE_VERSION:
+        return None
+    for p, mtime_ns in cached["mtimes"].items():
+        try:
+            if os.stat(p).st_mtime_ns != mtime_ns:
+                return None
+        except OSError:
+            return None
+    return cached["tree"]
+
+
+def _save_cached(path: Path, tree: str, mtimes: Dict[str, int]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Parsing workers may render different projects at once: write atomically
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": _CACHE_VERSION, "tree": tree, "mtimes": mtimes}, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def build_folder_tree(
+    root_path,
+    max_depth: int = 4,
+    exclude_dirs: Iterable[str] = (),
+    max_entries_per_dir: int = 20,
+    max_entries: int = 150,
+    cache_dir: Optional[Path] = None,
+) -> str:
+    """
+    Build a readable folder tree as text.
+
+    cache_dir:
+        optional directory for rendered trees; reused while no scanned
+        directory or .gitignore has changed.
+    """
+    root = Path(root_path)
+    params = {
+        "max_depth": max_depth,
+        "exclude_dirs": sorted(set(exclude_dirs)),
+        "max_entries_per_dir": max_entries_per_dir,
+        "max_entries": max_entries,
+    }
+
+    cache_file = _cache_file(cache_dir, root, params) if cache_dir is not None else None
+    if cache_file is not None:
+        tree = _load_cached(cache_file)
+        if tree is not None:
+            return tree
+
+    walker = _TreeWalker(root, max_depth, exclude_dirs, max_entries_per_dir, max_entries)
+    walker.walk(str(root))
+    tree = "\n".join(walker.lines)
+
+    if cache_file is not None:
+        try:
+            _save_cached(cache_file, tree, walker.mtimes)
+        except OSError:
+            pass
+    return tree
@@ -1,4 +1,7 @@
+import os
 from pathlib import Path
+from typing import Iterable, Iterator
+
 
 def get_readme(repo_path: Path) -> Path | None:
     """
@@ -7,3 +10,34 @@ def get_readme(repo_path: Path) -> Path | None:
     readme = repo_path / "README.md"
     return readme if readme.exists() else None
 
+
+def iter_source_files(
+    repo_path: Path,
+    extensions: Iterable[str],
+    exclude_dirs: Iterable[str],
+) -> Iterator[os.DirEntry]:
+    """
+    Lazily yield files under repo_path with one of the given extensions.
+
+    Excluded directories are pruned before descending, so large trees
+    like .git or .venv are never walked.
+    """
+    extensions = set(extensions)
+    exclude_dirs = set(exclude_dirs)
+    stack = [str(repo_path)]
+
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in exclude_dirs:
+                    stack.append(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                if os.path.splitext(entry.name)[1] in extensions:
+                    yield entry
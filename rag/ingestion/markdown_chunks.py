@@ -0,0 +1,348 @@
+"""
+Single-pass, token-bounded Markdown chunking.
+
+Design choice:
+- A line-based block scanner (no regex split over the whole file) that knows
+  ATX headings H1-H6, setext headings, fenced code (``` and ~~~), tables,
+  lists and paragraphs; "#" lines inside code fences are not headings.
+- Headings are metadata, not chunk text: every chunk carries the heading
+  path it sits under, e.g. ["Project", "2. Technical Overview", "Models"].
+- Blocks are packed into chunks of at most max_tokens (rag/tokens.py
+  estimate). Oversized blocks are split at lines, then sentences, then
+  words; split code keeps its fence and split tables repeat their header.
+- Chunks never cross a heading. When a section is split, the next chunk
+  starts with up to overlap_tokens of the previous chunk's prose.
+- Byte offsets (start, end) into the UTF-8 file are recorded per chunk,
+  so an answer can cite the exact span of the README.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from rag.tokens import estimate_tokens
+
+
+_ATX_RE = re.compile(r"^ {0,3}(#{1,6})(?:[ \t]+(.*?))?(?:[ \t]+#+)?[ \t]*$")
+_SETEXT_RE = re.compile(r"^ {0,3}(=+|-+)[ \t]*$")
+_FENCE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+_THEMATIC_RE = re.compile(r"^ {0,3}([-*_])(?:[ \t]*\1){2,}[ \t]*$")
+_LIST_RE = re.compile(r"^ {0,3}(?:[-*+]|\d{1,9}[.)])(?:[ \t]+|$)")
+_TABLE_SEPARATOR_RE = re.compile(r"^\s*\|?\s*:?-{2,}:?\s*(?:\|\s*:?-{2,}:?\s*)*\|?\s*$")
+
+_LINE_SEP = r"\r?\n"
+_SENTENCE_SEP = r"(?<=[.!?])\s+"
+_WORD_SEP = r"\s+"
+
+# Prose can be carried over as overlap; code and tables are not cut mid-block
+_OVERLAP_KINDS = ("paragraph", "list")
+
+
+@dataclass
+class Block:
+    kind: str  # "heading", "paragraph", "code", "table" or "list"
+    text: str
+    start: int  # byte offsets into the UTF-8 source, end exclusive
+    end: int
+    level: int = 0  # heading level (1-6)
+
+
+@dataclass
+class MarkdownChunk:
+    text: str
+    heading_path: List[str] = field(default_factory=list)
+    start: int = 0
+    end: int = 0
+    tokens: int = 0
+
+
+@dataclass
+class _Piece:
+    kind: str
+    text: str
+    start: int
+    end: int
+
+
+# -------------------------------------------------
+# Block scanner
+# -------------------------------------------------
+def iter_blocks(lines: Iterable[str]) -> Iterator[Block]:
+    """
+    Scan Markdown lines (with their line endings) into blocks, in one pass.
+    """
+    offset = 0
+    kind: Optional[str] = None
+    rows: List[Tuple[str, int, int, str]] = []  # (line, byte start, byte end, raw line)
+    fence: Optional[str] = None
+
+    def flush() -> Iterator[Block]:
+        nonlocal kind, rows
+        if rows:
+            # Inner line endings are kept as-is, so char -> byte offsets stay exact
+            text = "".join(r[3] for r in rows[:-1]) + rows[-1][0]
+            yield Block(kind, text, rows[0][1], rows[-1][2])
+        kind, rows = None, []
+
+    for raw in lines:
+        line = raw.rstrip("\r\n")
+        start = offset
+        offset += len(raw.encode("utf-8"))
+        row = (line, start, start + len(line.encode("utf-8")), raw)
+
+        if fence is not None:
+            rows.append(row)
+            stripped = line.strip()
+            if stripped.startswith(fence) and set(stripped) == {fence[0]}:
+                fence = None
+                yield from flush()
+            continue
+
+        match = _FENCE_RE.match(line)
+        if match:
+            yield from flush()
+            fence = match.group(1)
+            kind, rows = "code", [row]
+            continue
+
+        if not line.strip():
+            yield from flush()
+            continue
+
+        match = _ATX_RE.match(line)
+        if match:
+            yield from flush()
+            yield Block("heading", (match.group(2) or "").strip(), row[1], row[2], len(match.group(1)))
+            continue
+
+        if kind == "paragraph" and len(rows) == 1 and _SETEXT_RE.match(line):
+            level = 1 if line.strip()[0] == "=" else 2
+            yield Block("heading", rows[0][0].strip(), rows[0][1], row[2], level)
+            kind, rows = None, []
+            continue
+
+        if _THEMATIC_RE.match(line):
+            yield from flush()
+            continue
+
+        if line.lstrip().startswith("|"):
+            new_kind = "table"
+        elif _LIST_RE.match(line):
+            new_kind = "list"
+        elif kind == "list":
+            # Indented or lazy continuation of the current item
+            new_kind = "list"
+        elif kind == "table" and "|" in line:
+            new_kind = "table"
+        else:
+            new_kind = "paragraph"
+
+        # A paragraph line followed by a separator row is a table header
+        if (
+            kind == "paragraph"
+            and len(rows) == 1
+            and "|" in rows[0][0]
+            and _TABLE_SEPARATOR_RE.match(line)
+        ):
+            kind, new_kind = "table", "table"
+
+        if new_kind != kind:
+            yield from flush()
+            kind = new_kind
+        rows.append(row)
+
+    yield from flush()
+
+
+# -------------------------------------------------
+# Splitting oversized blocks
+# -------------------------------------------------
+def _split_spans(
+    text: str,
+    lo: int,
+    hi: int,
+    max_tokens: int,
+    count: Callable[[str], int],
+    separators: List[str],
+) -> List[Tuple[int, int]]:
+    """
+    Greedy (start, end) character spans of text[lo:hi], each within max_tokens,
+    cut at the first separator that works (coarsest first).
+    """
+    if count(text[lo:hi]) <= max_tokens:
+        return [(lo, hi)]
+
+    if not separators:
+        # No natural boundary left: fixed-size character windows
+        width = max(1, (hi - lo) * max_tokens // max(1, count(text[lo:hi])))
+        return [(s, min(s + width, hi)) for s in range(lo, hi, width)]
+
+    units = []
+    pos = lo
+    for match in re.compile(separators[0]).finditer(text, lo, hi):
+        units.append((pos, match.start()))
+        pos = match.end()
+    units.append((pos, hi))
+
+    spans: List[Tuple[int, int]] = []
+    current: Optional[Tuple[int, int]] = None
+    for s, e in units:
+        if s >= e:
+            continue
+        if current is not None and count(text[current[0]:e]) <= max_tokens:
+            current = (current[0], e)
+            continue
+        if current is not None:
+            spans.append(current)
+            current = None
+        if count(text[s:e]) <= max_tokens:
+            current = (s, e)
+        else:
+            spans.extend(_split_spans(text, s, e, max_tokens, count, separators[1:]))
+    if current is not None:
+        spans.append(current)
+    return spans
+
+
+def _byte_offset(block: Block, char_index: int) -> int:
+    return block.start + len(block.text[:char_index].encode("utf-8"))
+
+
+def _pieces(
+    block: Block,
+    max_tokens: int,
+    overlap_tokens: int,
+    count: Callable[[str], int],
+) -> List[_Piece]:
+    """
+    The block as one piece, or split into pieces that each fit max_tokens.
+    """
+    text = block.text
+    if count(text) <= max_tokens:
+        return [_Piece(block.kind, text, block.start, block.end)]
+
+    lines = text.split("\n")
+    prefix, suffix = "", ""
+    lo, hi = 0, len(text)
+
+    if block.kind == "code":
+        # Every piece is re-wrapped in the original fence
+        prefix = lines[0] + "\n"
+        lo = len(prefix)
+        closed = len(lines) > 1 and _FENCE_RE.match(lines[-1]) is not None
+        suffix = "\n" + (lines[-1] if closed else _FENCE_RE.match(lines[0]).group(1))
+        if closed:
+            hi = len(text) - len(lines[-1]) - 1
+        separators = [_LINE_SEP, _WORD_SEP]
+    elif block.kind == "table":
+        # Every piece after the first repeats the header (and separator) rows
+        n_header = 2 if len(lines) > 1 and _TABLE_SEPARATOR_RE.match(lines[1]) else 1
+        prefix = "\n".join(lines[:n_header]) + "\n"
+        lo = len(prefix)
+        separators = [_LINE_SEP, _WORD_SEP]
+    elif block.kind == "list":
+        item_start = _LINE_SEP + "(?=" + _LIST_RE.pattern[1:] + ")"
+        separators = [item_start, _LINE_SEP, _SENTENCE_SEP, _WORD_SEP]
+    else:
+        separators = [_LINE_SEP, _SENTENCE_SEP, _WORD_SEP]
+
+    # Prose pieces leave room for the overlap carried in front of them
+    reserve = overlap_tokens if block.kind in _OVERLAP_KINDS else 0
+    budget = max(1, max_tokens - reserve - count(prefix + suffix))
+    pieces = []
+    for s, e in _split_spans(text, lo, max(lo, hi), budget, count, separators):
+        piece_text = text[s:e]
+        if block.kind in ("code", "table"):
+            piece_text = prefix + piece_text + suffix
+            if block.kind == "table" and not pieces:
+                s = 0
+        pieces.append(
+            _Piece(block.kind, piece_text, _byte_offset(block, s), _byte_offset(block, e))
+        )
+    return pieces
+
+
+def _overlap(piece: _Piece, overlap_tokens: int, count: Callable[[str], int]) -> Optional[_Piece]:
+    """
+    Trailing sentences (or words) of a prose piece, within overlap_tokens.
+    """
+    if overlap_tokens <= 0 or piece.kind not in _OVERLAP_KINDS:
+        return None
+
+    # Trailing whitespace would otherwise be the first tail that fits
+    text = piece.text.rstrip()
+    end = piece.end - len(piece.text[len(text):].encode("utf-8"))
+    if not text.strip():
+        return None
+    if count(text) <= overlap_tokens:
+        return _Piece(piece.kind, text, piece.start, end)
+
+    for separator in (_SENTENCE_SEP, _WORD_SEP):
+        cut = None
+        for match in re.compile(separator).finditer(text):
+            if count(text[match.end():]) <= overlap_tokens:
+                cut = match.end()
+                break
+        if cut is not None:
+            tail = text[cut:]
+            if not tail.strip():
+                return None
+            return _Piece(piece.kind, tail, end - len(tail.encode("utf-8")), end)
+    return None
+
+
+# -------------------------------------------------
+# Chunking
+# -------------------------------------------------
+def chunk_markdown(
+    lines: Iterable[str],
+    max_tokens: int = 200,
+    overlap_tokens: int = 30,
+    count: Callable[[str], int] = estimate_tokens,
+) -> Iterator[MarkdownChunk]:
+    """
+    Stream token-bounded chunks from Markdown lines (keep their line endings
+    for exact byte offsets, e.g. text.splitlines(keepends=True)).
+    """
+    path: List[Tuple[int, str]] = []  # (level, title) of the open headings
+    pieces: List[_Piece] = []
+    fresh = 0  # pieces not carried over from the previous chunk
+
+    def emit() -> MarkdownChunk:
+        text = "\n\n".join(p.text for p in pieces)
+        return MarkdownChunk(
+            text=text,
+            heading_path=[title for _, title in path],
+            start=pieces[0].start,
+            end=pieces[-1].end,
+            tokens=count(text),
+        )
+
+    for block in iter_blocks(lines):
+        if block.kind == "heading":
+            if fresh:
+                yield emit()
+            pieces, fresh = [], 0
+            while path and path[-1][0] >= block.level:
+                path.pop()
+            path.append((block.level, block.text))
+            continue
+
+        for piece in _pieces(block, max_tokens, overlap_tokens, count):
+            while pieces:
+                joined = "\n\n".join([p.text for p in pieces] + [piece.text])
+                if count(joined) <= max_tokens:
+                    break
+                if fresh:
+                    # Chunk is full: emit it and carry its tail as overlap
+                    yield emit()
+                    carried = _overlap(pieces[-1], overlap_tokens, count)
+                    pieces, fresh = ([carried] if carried else []), 0
+                else:
+                    # Only overlap left and it does not fit next to this piece
+                    pieces.pop(0)
+            pieces.append(piece)
+            fresh += 1
+
+    if fresh:
+        yield emit()
@@ -2,7 +2,9 @@
 Extract function-level knowledge units from Python source code.
 
 Design choice:
-- One function = one chunk
+- One function = one chunk (methods and async defs included)
+- Classes get their own chunk: header, docstring and class attributes,
+  without the method bodies (those are separate chunks)
 - Uses Python AST (robust, not regex-based)
 - Read-only analysis (no execution)
 
@@ -13,12 +15,17 @@ import ast
 from typing import List, Dict
 
 
+_FUNCTION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+
 def extract_functions(code: str) -> List[Dict]:
     """
-    Parse Python source code and extract function definitions.
+    Parse Python source code and extract function and class definitions.
 
     Returns a list of dicts with:
-    - name: function name
+    - name: function / class name
+    - qualname: dotted name including enclosing classes/functions
+    - kind: "function", "async_function", "method" or "class"
     - start_line: starting line number (0-based)
     - end_line: ending line number (exclusive)
     """
@@ -30,15 +37,69 @@ def extract_functions(code: str) -> List[Dict]:
 
     functions = []
 
-    for node in ast.walk(tree):
-        if isinstance(node, ast.FunctionDef):
-            if node.end_lineno is None:
-                continue
+    def visit(node, prefix: str, in_class: bool) -> None:
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, _FUNCTION_NODES + (ast.ClassDef,)):
+                if child.end_lineno is None:
+                    continue
+
+                qualname = f"{prefix}{child.name}"
+                start = min([child.lineno] + [d.lineno for d in child.decorator_list]) - 1
 
-            functions.append({
-                "name": node.name,
-                "start_line": node.lineno - 1,
-                "end_line": node.end_lineno,
-            })
+                if isinstance(child, ast.ClassDef):
+                    # Class chunk stops where its first method starts
+                    methods = [n for n in child.body if isinstance(n, _FUNCTION_NODES)]
+                    end = child.end_lineno
+                    if methods:
+                        first = methods[0]
+                        end = min([first.lineno] + [d.lineno for d in first.decorator_list]) - 1
+                    kind = "class"
+                else:
+                    end = child.end_lineno
+                    if in_class:
+                        kind = "method"
+                    elif isinstance(child, ast.AsyncFunctionDef):
+                        kind = "async_function"
+                    else:
+                        kind = "function"
 
+                functions.append({
+                    "name": child.name,
+                    "qualname": qualname,
+                    "kind": kind,
+                    "start_line": start,
+                    "end_line": end,
+                })
+
+                visit(child, qualname + ".", isinstance(child, ast.ClassDef))
+            else:
+                visit(child, prefix, in_class)
+
+    visit(tree, "", False)
     return functions
+
+
+def parse_python_source(code: str, rel_path: str, project_name: str) -> List[Dict]:
+    """
+    Turn one Python file into RAG chunks (one per function / class).
+    """
+    lines = code.splitlines()
+    chunks = []
+
+    for fn in extract_functions(code):
+        text = "\n".join(lines[fn["start_line"]:fn["end_line"]]).strip()
+        if not text:
+            continue
+
+        chunks.append({
+            "text": text,
+            "project": project_name,
+            "section_title": fn["qualname"],
+            "source": rel_path,
+            "type": "class" if fn["kind"] == "class" else "function",
+            "kind": fn["kind"],
+            "start_line": fn["start_line"],
+            "end_line": fn["end_line"],
+        })
+
+    return chunks
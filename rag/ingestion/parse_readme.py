@@ -1,51 +1,60 @@
-import re
 from pathlib import Path
+from typing import Iterable, Optional
 
-def parse_markdown_readme(readme_path: Path, project_name: str):
+from rag.ingestion.folder_tree import build_folder_tree
+from rag.ingestion.markdown_chunks import chunk_markdown
+
+
+def parse_markdown_readme(
+    readme_path: Path,
+    project_name: str,
+    max_tokens: int = 200,
+    overlap_tokens: int = 30,
+    exclude_dirs: Iterable[str] = (),
+    tree_cache_dir: Optional[Path] = None,
+):
     """
-    Parse a Markdown README into section-level chunks.
+    Parse a Markdown README into token-bounded chunks (see markdown_chunks.py).
 
     Returns a list of dicts with:
     - text
     - project
-    - section_title
+    - section_title (innermost heading, "Introduction" before the first one)
+    - heading_path (all enclosing headings, outermost first)
     - source
-    """
+    - byte_start / byte_end (span of the chunk in README.md)
 
-    text = readme_path.read_text(encoding="utf-8")
+    plus one "Folder Structure" chunk of the repo tree, without exclude_dirs
+    and .gitignored paths (see folder_tree.py).
+    """
 
-    # Split on markdown headers (# or ##)
-    sections = re.split(r"\n(?=##?\s)", text)
+    # Decoded without newline translation so offsets match the bytes on disk
+    text = readme_path.read_bytes().decode("utf-8")
 
     chunks = []
 
-    for section in sections:
-        lines = section.strip().splitlines()
-        if not lines:
-            continue
-
-        header_line = lines[0]
-
-        if header_line.startswith("#"):
-            section_title = header_line.lstrip("#").strip()
-            body = "\n".join(lines[1:]).strip()
-        else:
-            section_title = "Introduction"
-            body = section.strip()
-
-        if not body:
-            continue
-
+    for chunk in chunk_markdown(
+        text.splitlines(keepends=True),
+        max_tokens=max_tokens,
+        overlap_tokens=overlap_tokens,
+    ):
         chunks.append({
-            "text": body,
+            "text": chunk.text,
             "project": project_name,
-            "section_title": section_title,
-            "source": "README.md"
+            "section_title": chunk.heading_path[-1] if chunk.heading_path else "Introduction",
+            "heading_path": chunk.heading_path,
+            "source": "README.md",
+            "byte_start": chunk.start,
+            "byte_end": chunk.end,
         })
 
     # Add folder tree as a first-class RAG chunk
     try:
-        folder_tree = build_folder_tree(readme_path.parent)
+        folder_tree = build_folder_tree(
+            readme_path.parent,
+            exclude_dirs=exclude_dirs,
+            cache_dir=tree_cache_dir,
+        )
         chunks.append({
             "text": folder_tree,
             "project": project_name,
@@ -56,33 +65,3 @@ def parse_markdown_readme(readme_path: Path, project_name: str):
         pass
 
     return chunks
-
-def build_folder_tree(root_path, max_depth=4):
-    """
-    Build a readable folder tree as text.
-    """
-
-    lines = []
-
-    def walk(path, prefix="", depth=0):
-        if depth > max_depth:
-            return
-
-        entries = sorted(
-            [p for p in path.iterdir() if p.name != "__pycache__"],
-            key=lambda x: (x.is_file(), x.name.lower())
-        )
-
-        for i, entry in enumerate(entries):
-            connector = "└── " if i == len(entries) - 1 else "├── "
-            lines.append(prefix + connector + entry.name)
-
-            if entry.is_dir():
-                extension = "    " if i == len(entries) - 1 else "│   "
-                walk(entry, prefix + extension, depth + 1)
-
-    lines.append(root_path.name)
-    walk(root_path)
-
-    return "\n".join(lines)
-
@@ -0,0 +1,144 @@
+"""
+Incremental source-code ingestion for a project repo.
+
+Design:
+- The repo walk is a generator (load_repo.iter_source_files) that prunes
+  EXCLUDE_DIRS before descending.
+- A per-project manifest stores (path, mtime_ns, size, sha256, chunks);
+  files whose mtime and size are unchanged are never re-read or re-parsed,
+  and files that were only touched (same hash) are not re-parsed.
+- Changed files are read, hashed and parsed in a process pool, in batches
+  so IPC overhead stays small on repos with tens of thousands of files.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from concurrent.futures import Executor, Future
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from rag.ingestion.load_repo import iter_source_files
+from rag.ingestion.parse_code import parse_python_source
+
+
+MANIFEST_FILE = "source_manifest.json"
+
+# Files sent to a worker per task
+_FILES_PER_TASK = 64
+
+# (absolute path, relative path, mtime_ns, size, previous sha256 or None)
+FileJob = Tuple[str, str, int, int, Optional[str]]
+
+# (relative path, mtime_ns, size, sha256, chunks or None if content unchanged)
+FileResult = Tuple[str, int, int, str, Optional[List[Dict]]]
+
+
+def parse_files(jobs: List[FileJob], project_name: str) -> List[FileResult]:
+    """
+    Read, hash and parse a batch of files. Runs in a worker process.
+    """
+    results = []
+
+    for path, rel, mtime_ns, size, previous_sha in jobs:
+        try:
+            raw = Path(path).read_bytes()
+        except OSError:
+            continue
+
+        sha = hashlib.sha256(raw).hexdigest()
+        if sha == previous_sha:
+            results.append((rel, mtime_ns, size, sha, None))
+            continue
+
+        code = raw.decode("utf-8", errors="replace")
+        results.append((rel, mtime_ns, size, sha, parse_python_source(code, rel, project_name)))
+
+    return results
+
+
+class SourceScan:
+    """
+    Walks a repo, reuses unchanged files from the manifest and submits the
+    rest to a process pool. collect() waits for the pool and returns chunks.
+    """
+
+    def __init__(
+        self,
+        project_name: str,
+        repo_path: Path,
+        manifest_path: Path,
+        pool: Executor,
+        extensions: Iterable[str] = (".py",),
+        exclude_dirs: Iterable[str] = (),
+    ):
+        self.project_name = project_name
+        self.manifest_path = manifest_path
+        self.reused = 0
+        self.parsed = 0
+
+        previous = self._load_manifest()
+        self._previous = previous
+        self.manifest: Dict[str, Dict] = {}
+        self._futures: List[Future] = []
+
+        if not repo_path.exists():
+            return
+
+        batch: List[FileJob] = []
+        for entry in iter_source_files(repo_path, extensions, exclude_dirs):
+            st = entry.stat()
+            rel = Path(entry.path).relative_to(repo_path).as_posix()
+
+            cached = previous.get(rel)
+            if cached and cached["mtime_ns"] == st.st_mtime_ns and cached["size"] == st.st_size:
+                self.manifest[rel] = cached
+                self.reused += 1
+                continue
+
+            previous_sha = cached["sha256"] if cached else None
+            batch.append((entry.path, rel, st.st_mtime_ns, st.st_size, previous_sha))
+            if len(batch) >= _FILES_PER_TASK:
+                self._futures.append(pool.submit(parse_files, batch, project_name))
+                batch = []
+
+        if batch:
+            self._futures.append(pool.submit(parse_files, batch, project_name))
+
+    def _load_manifest(self) -> Dict[str, Dict]:
+        if not self.manifest_path.exists():
+            return {}
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def collect(self) -> List[Dict]:
+        """
+        Wait for parsing, save the updated manifest and return all chunks
+        in stable path order.
+        """
+        for future in self._futures:
+            for rel, mtime_ns, size, sha, chunks in future.result():
+                if chunks is None:
+                    # Touched but identical: keep the previously parsed chunks
+                    chunks = self._previous[rel]["chunks"]
+                    self.reused += 1
+                else:
+                    self.parsed += 1
+
+                self.manifest[rel] = {
+                    "mtime_ns": mtime_ns,
+                    "size": size,
+                    "sha256": sha,
+                    "chunks": chunks,
+                }
+        self._futures = []
+
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.manifest_path, "w", encoding="utf-8") as f:
+            json.dump(dict(sorted(self.manifest.items())), f, ensure_ascii=False)
+
+        return [chunk for rel in sorted(self.manifest) for chunk in self.manifest[rel]["chunks"]]
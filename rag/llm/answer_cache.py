@@ -0,0 +1,215 @@
+"""
+Persistent answer cache in front of the LLM.
+
+Design:
+- SQLite-backed, shared by all sessions and surviving restarts.
+- Exact key: (project scope, prompt version, retrieved-context hash,
+  normalized question).
+- Semantic fallback: within the same scope, prompt version and retrieved
+  context, reuse the answer of the most similar earlier question if its
+  cosine similarity is above a configurable threshold. Requiring the same
+  context means a paraphrase that retrieves other chunks (or any question
+  after a reindex) never gets an answer grounded in text it was not shown.
+- Question vectors are only compared with vectors from the same embedder
+  (cache key and dimension), so switching model or backend cannot mix them.
+- Entries expire after a TTL; beyond max_entries the least recently used
+  ones are evicted.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+
+def context_hash(context: str) -> str:
+    return hashlib.sha256(context.encode("utf-8")).hexdigest()
+
+
+def _normalize_question(question: str) -> str:
+    return " ".join(question.lower().split())
+
+
+def _unit(vec: np.ndarray) -> np.ndarray:
+    vec = np.asarray(vec, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm > 0 else vec
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    model: str
+    match: str  # "exact" or "semantic"
+    similarity: float
+
+
+class AnswerCache:
+    def __init__(
+        self,
+        path: Path,
+        ttl_seconds: float = 7 * 24 * 3600,
+        max_entries: int = 2000,
+        similarity_threshold: float = 0.95,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.misses = 0
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY,
+                scope TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                context_hash TEXT NOT NULL,
+                question TEXT NOT NULL,
+                question_vec BLOB NOT NULL,
+                embedder TEXT NOT NULL DEFAULT '',
+                dim INTEGER NOT NULL DEFAULT 0,
+                answer TEXT NOT NULL,
+                model TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        # Caches created before embedder/dim were recorded: their rows never
+        # match a semantic lookup and age out with the TTL
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(answers)")}
+        if "embedder" not in columns:
+            self._conn.execute("ALTER TABLE answers ADD COLUMN embedder TEXT NOT NULL DEFAULT ''")
+        if "dim" not in columns:
+            self._conn.execute("ALTER TABLE answers ADD COLUMN dim INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute("DROP INDEX IF EXISTS answers_scope")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS answers_key "
+            "ON answers (scope, prompt_version, context_hash)"
+        )
+        self._conn.commit()
+
+    def lookup(
+        self,
+        scope: str,
+        prompt_version: str,
+        context: str,
+        question: str,
+        question_vec: np.ndarray,
+        embedder_key: str,
+    ) -> Optional[CachedAnswer]:
+        """
+        embedder_key:
+            cache key of the model that produced question_vec
+        """
+        now = time.time()
+        digest = context_hash(context)
+        min_created = now - self.ttl_seconds
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, answer, model FROM answers "
+                "WHERE scope = ? AND prompt_version = ? AND context_hash = ? "
+                "AND question = ? AND created_at >= ? "
+                "ORDER BY created_at DESC LIMIT 1",
+                (scope, prompt_version, digest, _normalize_question(question), min_created),
+            ).fetchone()
+
+            if row is not None:
+                result = CachedAnswer(row[1], row[2], "exact", 1.0)
+            else:
+                result = self._semantic_lookup(
+                    scope, prompt_version, digest, question_vec, embedder_key, min_created
+                )
+
+            if result is None:
+                self.misses += 1
+                return None
+
+            if row is not None:
+                self._touch(row[0], now)
+            self.hits += 1
+            return result
+
+    def _semantic_lookup(
+        self,
+        scope: str,
+        prompt_version: str,
+        digest: str,
+        question_vec: np.ndarray,
+        embedder_key: str,
+        min_created: float,
+    ) -> Optional[CachedAnswer]:
+        query = _unit(question_vec)
+        rows = self._conn.execute(
+            "SELECT id, question_vec, answer, model FROM answers "
+            "WHERE scope = ? AND prompt_version = ? AND context_hash = ? "
+            "AND embedder = ? AND dim = ? AND created_at >= ?",
+            (scope, prompt_version, digest, embedder_key, len(query), min_created),
+        ).fetchall()
+        if not rows:
+            return None
+
+        matrix = np.stack([np.frombuffer(r[1], dtype=np.float32) for r in rows])
+        sims = matrix @ query
+        best = int(np.argmax(sims))
+        if sims[best] < self.similarity_threshold:
+            return None
+
+        self._touch(rows[best][0], time.time())
+        return CachedAnswer(rows[best][2], rows[best][3], "semantic", float(sims[best]))
+
+    def _touch(self, row_id: int, now: float) -> None:
+        self._conn.execute("UPDATE answers SET last_access = ? WHERE id = ?", (now, row_id))
+        self._conn.commit()
+
+    def store(
+        self,
+        scope: str,
+        prompt_version: str,
+        context: str,
+        question: str,
+        question_vec: np.ndarray,
+        embedder_key: str,
+        answer: str,
+        model: str,
+    ) -> None:
+        now = time.time()
+        vec = _unit(question_vec)
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO answers (scope, prompt_version, context_hash, question, "
+                "question_vec, embedder, dim, answer, model, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (scope, prompt_version, context_hash(context), _normalize_question(question),
+                 vec.tobytes(), embedder_key, len(vec), answer, model, now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute(
+            "DELETE FROM answers WHERE created_at < ?", (now - self.ttl_seconds,)
+        )
+        self._conn.execute(
+            "DELETE FROM answers WHERE id NOT IN "
+            "(SELECT id FROM answers ORDER BY last_access DESC LIMIT ?)",
+            (self.max_entries,),
+        )
+
+    def close(self) -> None:
+        self._conn.close()
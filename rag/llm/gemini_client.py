@@ -4,25 +4,44 @@ Gemini LLM client using the official google-genai SDK.
 Design:
 - Gemini is used ONLY for generation (RAG stays model-agnostic).
 - Primary model optimized for instruction-following and RAG synthesis.
-- Fallback model used when free-tier limits or availability issues occur.
+- Fallback model used when the primary's free-tier budget is exhausted.
+- One long-lived client per process; calls go through a shared
+  LLMScheduler (RPM/TPM budgets, backoff with jitter on 429/503).
+- Streaming variant yields text chunks so the UI can render tokens as they arrive.
+- GEMINI_BASE_URL points the client at another endpoint, e.g. the local
+  stand-in in rag/llm/stub_server.py.
 """
 
+import functools
+import itertools
 import os
+import threading
+import time
 from google import genai
-from google.genai.errors import ClientError
+
+from rag.llm.scheduler import LLMScheduler, ModelBudget
+from rag.tokens import estimate_tokens
+from rag.tracing import record, span
+
+
+@functools.lru_cache(maxsize=None)
+def _client_for(api_key: str, base_url: str = None):
+    http_options = {"base_url": base_url} if base_url else None
+    return genai.Client(api_key=api_key, http_options=http_options)
 
 
 def get_client():
     """
-    Initialize and return a Gemini client.
+    Return the process-wide Gemini client (created on first use).
     """
-    api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise RuntimeError(
-            "GOOGLE_API_KEY (or GEMINI_API_KEY) environment variable not set."
-        )
+    with span("get_client"):
+        api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise RuntimeError(
+                "GOOGLE_API_KEY (or GEMINI_API_KEY) environment variable not set."
+            )
 
-    return genai.Client(api_key=api_key)
+        return _client_for(api_key, os.getenv("GEMINI_BASE_URL"))
 
 
 # -------------------------------------------------
@@ -32,8 +51,53 @@ PRIMARY_MODEL = "models/gemini-2.5-flash-lite"
 FALLBACK_MODEL = "models/gemma-3-4b-it"
 
 
-def generate_answer(client, context: str, question: str, system_prompt: str):
-    prompt = f"""{system_prompt}
+PRIMARY_LABEL = "Gemini Flash (primary)"
+FALLBACK_LABEL = "Gemma 3B (fallback – free tier limit)"
+
+PRIMARY_CONFIG = {
+    "temperature": 0.1,
+    "max_output_tokens": 600,
+}
+FALLBACK_CONFIG = {
+    "temperature": 0.2,
+    "max_output_tokens": 600,
+}
+
+MODEL_CONFIGS = {PRIMARY_MODEL: PRIMARY_CONFIG, FALLBACK_MODEL: FALLBACK_CONFIG}
+MODEL_LABELS = {PRIMARY_MODEL: PRIMARY_LABEL, FALLBACK_MODEL: FALLBACK_LABEL}
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> LLMScheduler:
+    """
+    Process-wide scheduler, so budgets are shared by all sessions.
+    Budgets come from config.LLM_MODEL_LIMITS.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            import config
+
+            _scheduler = LLMScheduler(
+                budgets={
+                    model: ModelBudget(rpm=rpm, tpm=tpm)
+                    for model, (rpm, tpm) in config.LLM_MODEL_LIMITS.items()
+                },
+                primary=PRIMARY_MODEL,
+                fallback=FALLBACK_MODEL,
+            )
+        return _scheduler
+
+
+def _request_tokens(prompt: str) -> int:
+    return estimate_tokens(prompt) + PRIMARY_CONFIG["max_output_tokens"]
+
+
+def build_prompt(context: str, question: str, system_prompt: str) -> str:
+    return f"""{system_prompt}
 
 Context:
 {context}
@@ -42,25 +106,104 @@ Question:
 {question}
 """
 
-    try:
-        response = client.models.generate_content(
-            model=PRIMARY_MODEL,
-            contents=prompt,
-            config={
-                "temperature": 0.1,
-                "max_output_tokens": 600,
-            },
+
+def generate_answer(client, context: str, question: str, system_prompt: str, scheduler=None):
+    prompt = build_prompt(context, question, system_prompt)
+    scheduler = scheduler or get_scheduler()
+
+    with span("generate_answer", prompt_tokens=estimate_tokens(prompt)) as s:
+        response, model = scheduler.run(
+            lambda m: client.models.generate_content(
+                model=m,
+                contents=prompt,
+                config=MODEL_CONFIGS[m],
+            ),
+            tokens=_request_tokens(prompt),
         )
-        return response.text.strip(), "Gemini Flash (primary)"
-
-    except ClientError:
-        # Graceful fallback on quota / availability issues
-        response = client.models.generate_content(
-            model=FALLBACK_MODEL,
-            contents=prompt,
-            config={
-                "temperature": 0.2,
-                "max_output_tokens": 600,
-            },
+        text = response.text.strip()
+        s.set(model=model, answer_tokens=estimate_tokens(text))
+    return text, MODEL_LABELS[model]
+
+
+class AnswerStream:
+    """
+    Iterable of answer text chunks from a streaming Gemini call.
+
+    The model is chosen by the scheduler; 429/503 errors raised before the
+    first chunk arrives are retried (or routed to the fallback model) there.
+    Once iteration finishes, model_label, first_token_s, total_s and text are set.
+    """
+
+    def __init__(self, client, prompt: str, scheduler=None):
+        self.client = client
+        self.prompt = prompt
+        self.scheduler = scheduler or get_scheduler()
+        self.model_label = None
+        self.first_token_s = None
+        self.total_s = None
+        self.text = ""
+
+    def _open(self, model: str):
+        stream = iter(
+            self.client.models.generate_content_stream(
+                model=model,
+                contents=self.prompt,
+                config=MODEL_CONFIGS[model],
+            )
         )
-        return response.text.strip(), "Gemma 3B (fallback – free tier limit)"
+        # Pull the first chunk now so request errors surface before any output
+        first = next(stream, None)
+        return first, stream
+
+    def __iter__(self):
+        start = time.perf_counter()
+        start_ns = time.time_ns()
+        model = None
+        error = None
+
+        try:
+            (first, stream), model = self.scheduler.run(
+                self._open, tokens=_request_tokens(self.prompt)
+            )
+            self.model_label = MODEL_LABELS[model]
+
+            chunks = itertools.chain([first], stream) if first is not None else stream
+            for chunk in chunks:
+                text = chunk.text
+                if not text:
+                    continue
+                if self.first_token_s is None:
+                    self.first_token_s = time.perf_counter() - start
+                    text = text.lstrip()
+                self.text += text
+                yield text
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self.text = self.text.rstrip()
+            self.total_s = time.perf_counter() - start
+            # A generator cannot hold a span open across yields; record it once consumed
+            record(
+                "generate_answer_stream",
+                start_ns,
+                self.total_s * 1000,
+                error=error,
+                model=model,
+                prompt_tokens=estimate_tokens(self.prompt),
+                answer_tokens=estimate_tokens(self.text),
+                first_token_ms=round((self.first_token_s or 0) * 1000, 2),
+            )
+
+
+def generate_answer_stream(
+    client,
+    context: str,
+    question: str,
+    system_prompt: str,
+    scheduler=None,
+) -> AnswerStream:
+    """
+    Streaming variant of generate_answer (e.g. for st.write_stream).
+    """
+    return AnswerStream(client, build_prompt(context, question, system_prompt), scheduler)
@@ -0,0 +1,257 @@
+"""
+Rate-limit-aware scheduling of LLM calls.
+
+Design:
+- Per-model token buckets enforce requests-per-minute and tokens-per-minute
+  budgets locally, before a request is sent.
+- Every attempt, retries included, reserves budget before it is sent.
+- A 429 from the primary means its quota is gone: the primary is skipped for
+  the server's retryDelay and the request moves to the fallback at once,
+  instead of waiting out tens of seconds of retries.
+- 503s (and 429s with nowhere else to go) are retried with exponential
+  backoff and full jitter, capped at backoff_max_s; a primary that is still
+  unavailable after max_retries hands the request to the fallback.
+- The fallback model is used only when the primary budget is exhausted
+  (locally or server-side) or the primary is down, not on every error.
+- Queue depth and wait times are exposed for monitoring.
+
+The scheduler is SDK-agnostic: callers pass a function model -> result.
+"""
+
+from __future__ import annotations
+
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = {429, 503}
+
+_RETRY_DELAY_RE = re.compile(r"retryDelay['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)s")
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def reserve(self, amount: float, now: float) -> float:
+        """
+        Take amount now (possibly going negative) and return how long the
+        caller must wait before the reservation is covered.
+        """
+        wait = self.wait_time(amount, now)
+        self.tokens -= min(amount, self.capacity)
+        return wait
+
+
+@dataclass
+class ModelBudget:
+    rpm: float
+    tpm: float
+
+    def __post_init__(self):
+        self.requests = TokenBucket(self.rpm)
+        self.tokens = TokenBucket(self.tpm)
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        return max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+
+    def reserve(self, tokens: int, now: float) -> float:
+        return max(self.requests.reserve(1, now), self.tokens.reserve(tokens, now))
+
+
+@dataclass
+class SchedulerStats:
+    queue_depth: int = 0
+    max_queue_depth: int = 0
+    waits: int = 0
+    total_wait_s: float = 0.0
+    max_wait_s: float = 0.0
+    retries: int = 0
+    fallbacks: int = 0
+    requests: Dict[str, int] = field(default_factory=dict)
+
+
+class BudgetExhausted(RuntimeError):
+    pass
+
+
+def _status(exc: Exception) -> Optional[int]:
+    for attr in ("code", "status_code"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_rate_limit_error(exc: Exception) -> bool:
+    """
+    True for errors caused by quotas/overload rather than by the request.
+    """
+    return isinstance(exc, BudgetExhausted) or _status(exc) in RETRYABLE_STATUS
+
+
+def _retry_hint(exc: Exception) -> Optional[float]:
+    match = _RETRY_DELAY_RE.search(str(getattr(exc, "details", "")) or str(exc))
+    return float(match.group(1)) if match else None
+
+
+class LLMScheduler:
+    def __init__(
+        self,
+        budgets: Dict[str, ModelBudget],
+        primary: str,
+        fallback: Optional[str] = None,
+        max_retries: int = 3,
+        backoff_base_s: float = 1.0,
+        backoff_max_s: float = 20.0,
+        max_budget_wait_s: float = 2.0,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.budgets = budgets
+        self.primary = primary
+        self.fallback = fallback
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.max_budget_wait_s = max_budget_wait_s
+        self.stats = SchedulerStats()
+
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        # Primary is skipped until this time after the server reported quota exhaustion
+        self._primary_blocked_until = 0.0
+
+    # ---------------------------------------------
+    # Budget handling
+    # ---------------------------------------------
+    def _choose_model(self, tokens: int, skip_primary: bool = False) -> Tuple[str, float]:
+        """
+        Pick a model and reserve budget on it. Returns (model, wait seconds).
+        """
+        with self._lock:
+            now = time.monotonic()
+            primary_wait = (
+                self.budgets[self.primary].wait_time(tokens, now)
+                if self.primary in self.budgets else 0.0
+            )
+            primary_blocked = skip_primary or now < self._primary_blocked_until
+
+            model = self.primary
+            if self.fallback and (primary_blocked or primary_wait > self.max_budget_wait_s):
+                model = self.fallback
+
+            budget = self.budgets.get(model)
+            wait = budget.reserve(tokens, now) if budget else 0.0
+            self.stats.requests[model] = self.stats.requests.get(model, 0) + 1
+            return model, wait
+
+    def _wait(self, seconds: float) -> None:
+        if seconds <= 0:
+            return
+
+        with self._lock:
+            self.stats.queue_depth += 1
+            self.stats.max_queue_depth = max(self.stats.max_queue_depth, self.stats.queue_depth)
+            self.stats.waits += 1
+            self.stats.total_wait_s += seconds
+            self.stats.max_wait_s = max(self.stats.max_wait_s, seconds)
+        try:
+            self._sleep(seconds)
+        finally:
+            with self._lock:
+                self.stats.queue_depth -= 1
+
+    def _backoff(self, attempt: int, exc: Exception) -> float:
+        delay = random.uniform(0, min(self.backoff_max_s, self.backoff_base_s * 2 ** attempt))
+        hint = _retry_hint(exc)
+        if hint is not None:
+            delay = max(delay, min(hint, self.backoff_max_s))
+        return delay
+
+    # ---------------------------------------------
+    # Execution
+    # ---------------------------------------------
+    def run(self, call: Callable[[str], T], tokens: int) -> Tuple[T, str]:
+        """
+        Run call(model) under the budgets, with retries and fallback routing.
+
+        Returns (result, model used).
+        """
+        skip_primary = False
+        fell_back = False
+        attempt = 0
+        while True:
+            # Retries are real requests too: each attempt reserves budget
+            model, wait = self._choose_model(tokens, skip_primary)
+            if model != self.primary and not fell_back:
+                # Counted per request, not per attempt on the fallback
+                fell_back = True
+                with self._lock:
+                    self.stats.fallbacks += 1
+            self._wait(wait)
+            try:
+                return call(model), model
+            except Exception as exc:
+                status = _status(exc)
+                if status not in RETRYABLE_STATUS:
+                    raise
+
+                can_fall_back = model == self.primary and self.fallback is not None
+                if status == 429 and can_fall_back:
+                    # Server-side quota is gone: route to the fallback for a while
+                    with self._lock:
+                        self._primary_blocked_until = time.monotonic() + max(
+                            _retry_hint(exc) or self.backoff_max_s, 1.0
+                        )
+                    attempt = 0
+                    continue
+
+                if attempt >= self.max_retries:
+                    if can_fall_back:
+                        # Primary still unavailable: give this request to the fallback
+                        skip_primary = True
+                        attempt = 0
+                        continue
+                    raise
+
+                with self._lock:
+                    self.stats.retries += 1
+                self._wait(self._backoff(attempt, exc))
+                attempt += 1
+
+    def snapshot(self) -> Dict:
+        """
+        Current queue depth and wait statistics as a plain dict.
+        """
+        with self._lock:
+            stats = self.stats
+            return {
+                "queue_depth": stats.queue_depth,
+                "max_queue_depth": stats.max_queue_depth,
+                "waits": stats.waits,
+                "avg_wait_s": stats.total_wait_s / stats.waits if stats.waits else 0.0,
+                "max_wait_s": stats.max_wait_s,
+                "retries": stats.retries,
+                "fallbacks": stats.fallbacks,
+                "requests": dict(stats.requests),
+            }
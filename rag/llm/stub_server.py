@@ -0,0 +1,196 @@
+"""
+Local HTTP stand-in for the Gemini generateContent endpoints.
+
+Design:
+- Speaks enough of the REST API for google-genai: POST
+  /<version>/models/<model>:generateContent and :streamGenerateContent (SSE).
+- Simulates latency, random 429/503 errors and per-model RPM quotas, so the
+  scheduler's backoff and fallback routing can be exercised offline.
+- Answers are deterministic echoes of the request size.
+
+Usage:
+    python -m rag.llm.stub_server --port 8765 --latency 0.2 --fail-rate 0.2 --rpm 5
+    GEMINI_BASE_URL=http://127.0.0.1:8765 GOOGLE_API_KEY=stub streamlit run app/ui.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+
+_PATH_RE = re.compile(r"/models/([^/:]+):(generateContent|streamGenerateContent)")
+
+_STATUS_NAMES = {429: "RESOURCE_EXHAUSTED", 503: "UNAVAILABLE"}
+
+
+class StubSettings:
+    def __init__(
+        self,
+        latency_s: float = 0.0,
+        fail_rate: float = 0.0,
+        fail_status: int = 503,
+        rpm: Optional[int] = None,
+        retry_delay_s: float = 1.0,
+        chunks: int = 5,
+        seed: Optional[int] = None,
+    ):
+        self.latency_s = latency_s
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.rpm = rpm
+        self.retry_delay_s = retry_delay_s
+        self.chunks = chunks
+        self.random = random.Random(seed)
+
+        self.lock = threading.Lock()
+        self.calls: Dict[str, deque] = defaultdict(deque)
+        self.requests: Dict[str, int] = defaultdict(int)
+
+    def check(self, model: str) -> Optional[int]:
+        """
+        Record a call and return an error status to simulate, if any.
+        """
+        now = time.monotonic()
+        with self.lock:
+            self.requests[model] += 1
+            window = self.calls[model]
+            while window and now - window[0] > 60:
+                window.popleft()
+
+            if self.rpm is not None and len(window) >= self.rpm:
+                return 429
+            window.append(now)
+
+            if self.random.random() < self.fail_rate:
+                return self.fail_status
+        return None
+
+
+def _response(text: str, finish: bool = True) -> Dict:
+    candidate = {"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}
+    if finish:
+        candidate["finishReason"] = "STOP"
+    return {"candidates": [candidate]}
+
+
+def make_handler(settings: StubSettings):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send_json(self, status: int, payload: Dict) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_error(self, status: int) -> None:
+            self._send_json(status, {
+                "error": {
+                    "code": status,
+                    "message": f"stub: simulated {status}",
+                    "status": _STATUS_NAMES.get(status, "UNKNOWN"),
+                    "details": [{
+                        "@type": "type.googleapis.com/google.rpc.RetryInfo",
+                        "retryDelay": f"{settings.retry_delay_s:g}s",
+                    }],
+                }
+            })
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length) or b"{}")
+
+            match = _PATH_RE.search(self.path)
+            if not match:
+                self._send_json(404, {"error": {"code": 404, "message": "unknown path"}})
+                return
+            model, method = match.groups()
+
+            if settings.latency_s:
+                time.sleep(settings.latency_s)
+
+            status = settings.check(model)
+            if status is not None:
+                self._send_error(status)
+                return
+
+            prompt_chars = sum(
+                len(part.get("text", ""))
+                for content in request.get("contents", [])
+                for part in content.get("parts", [])
+            )
+            words = [f"[{model}]", "stub", "answer", "for", f"{prompt_chars}", "prompt", "chars."]
+
+            if method == "generateContent":
+                self._send_json(200, _response(" ".join(words)))
+                return
+
+            # Server-sent events, one JSON response per chunk
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            per_chunk = max(1, len(words) // max(1, settings.chunks))
+            pieces = [words[i:i + per_chunk] for i in range(0, len(words), per_chunk)]
+            for i, piece in enumerate(pieces):
+                text = " ".join(piece) + ("" if i == len(pieces) - 1 else " ")
+                event = json.dumps(_response(text, finish=i == len(pieces) - 1))
+                self.wfile.write(f"data: {event}\r\n\r\n".encode("utf-8"))
+                self.wfile.flush()
+                if settings.latency_s:
+                    time.sleep(settings.latency_s / len(pieces))
+            self.close_connection = True
+
+    return Handler
+
+
+def serve(host: str = "127.0.0.1", port: int = 8765, settings: Optional[StubSettings] = None):
+    """
+    Start the stub in a background thread and return the server.
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(settings or StubSettings()))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local Gemini API stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="probability of an error")
+    parser.add_argument("--fail-status", type=int, default=503, choices=[429, 503])
+    parser.add_argument("--rpm", type=int, default=None, help="per-model requests per minute")
+    parser.add_argument("--retry-delay", type=float, default=1.0, help="retryDelay hint (s)")
+    args = parser.parse_args(argv)
+
+    settings = StubSettings(
+        latency_s=args.latency,
+        fail_rate=args.fail_rate,
+        fail_status=args.fail_status,
+        rpm=args.rpm,
+        retry_delay_s=args.retry_delay,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(settings))
+    print(f"[OK] Gemini stub listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 # rag/prompts.py
 
+import hashlib
+
 SYSTEM_PROMPT_ALL = """
 You are an assistant helping a technical reviewer or an Human resources Interviewer evaluate this candidate
 based strictly on evidence from the candidate’s PROJECT DOCUMENTATION.
@@ -80,3 +82,9 @@ If the question requires aggregating evidence from more than two or three projec
 state that the assessment may be unreliable due to context limits.
 
 """
+
+
+# Changes whenever a prompt is edited; part of the answer-cache key
+PROMPT_VERSION = hashlib.sha256(
+    (SYSTEM_PROMPT_ALL + SYSTEM_PROMPT_PROJECT).encode("utf-8")
+).hexdigest()[:12]
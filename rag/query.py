@@ -0,0 +1,210 @@
+"""
+Batch question answering from the command line.
+
+Usage:
+    python -m rag.query questions.txt --out results.jsonl
+    python -m rag.query questions.jsonl --project "All Projects" --concurrency 4
+    python -m rag.query questions.txt --no-llm      # retrieval only
+
+Input:
+- .txt: one question per line (blank lines and lines starting with # are skipped)
+- .jsonl: {"question": ..., "project": ...}; "project" overrides --project.
+  A malformed line or an unknown project fails only that question (its
+  record carries "error", starting with the line number).
+
+Output: one JSON record per question (answer, model, sources, timings),
+in input order, to --out or stdout.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import config
+from rag.embeddings import load_embedder
+from rag.engine import ALL_PROJECTS, QueryEngine
+from rag.llm.answer_cache import AnswerCache
+from rag.llm.gemini_client import get_client, get_scheduler
+from rag.retrieval.registry import RetrieverRegistry
+from rag.retrieval.rerank import CrossEncoderReranker
+from rag.retrieval.routing import load_router
+from rag.service import connect
+from rag.tracing import JsonlSink, set_sink, start_trace
+
+
+def read_questions(path: Path, default_scope: str) -> List[Tuple[str, str, Optional[str]]]:
+    """
+    (question, scope, error) triples in file order. error names the input
+    line when it is not valid JSON, has no "question" string or names a
+    project that does not exist; the raw line then stands in for the question.
+    """
+    scopes = [ALL_PROJECTS] + list(config.PROJECTS)
+    items = []
+    with open(path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if path.suffix != ".jsonl":
+                items.append((line, default_scope, None))
+                continue
+
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                items.append((line, default_scope, f"line {lineno}: JSONDecodeError: {e}"))
+                continue
+            if not isinstance(record, dict) or not isinstance(record.get("question"), str):
+                error = f'line {lineno}: ValueError: expected an object with a "question" string'
+                items.append((line, default_scope, error))
+                continue
+
+            scope = record.get("project") or default_scope
+            error = None
+            if scope not in scopes:
+                error = f"line {lineno}: ValueError: unknown project {scope!r} (expected one of {scopes})"
+            items.append((record["question"], scope, error))
+    return items
+
+
+def _error_record(question: str, scope: str, error: str) -> Dict:
+    """
+    Output record for a question that could not be run (same keys as
+    QueryResult.as_record()).
+    """
+    return {
+        "question": question,
+        "scope": scope,
+        "routed_projects": [],
+        "answer": None,
+        "model": None,
+        "cache": None,
+        "error": error,
+        "sources": [],
+        "context": None,
+        "timings_ms": {},
+    }
+
+
+def build_engine(embedder, use_cache: bool = True, registry=None) -> QueryEngine:
+    project_indexes = {name: cfg["index_path"] for name, cfg in config.PROJECTS.items()}
+
+    return QueryEngine(
+        embedder=embedder,
+        registry=registry or RetrieverRegistry(
+            embedder=embedder,
+            hybrid=config.HYBRID_RETRIEVAL,
+            rrf_k=config.RRF_K,
+        ),
+        project_indexes=project_indexes,
+        router=load_router(
+            embedder=embedder,
+            path=config.ROUTING_MATRIX_PATH,
+            routing=config.PROJECT_ROUTING,
+        ),
+        combined_index=config.COMBINED_INDEX_PATH,
+        reranker=(
+            CrossEncoderReranker(config.RERANK_MODEL, budget_ms=config.RERANK_BUDGET_MS)
+            if config.RERANK_ENABLED
+            else None
+        ),
+        answer_cache=(
+            AnswerCache(
+                path=config.ANSWER_CACHE_PATH,
+                ttl_seconds=config.ANSWER_CACHE_TTL_SECONDS,
+                max_entries=config.ANSWER_CACHE_MAX_ENTRIES,
+                similarity_threshold=config.ANSWER_CACHE_SIMILARITY,
+            )
+            if use_cache
+            else None
+        ),
+        token_budget=config.CONTEXT_TOKEN_BUDGET,
+        mmr_lambda=config.MMR_LAMBDA,
+    )
+
+
+def _parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Answer a file of questions in one batch.")
+    parser.add_argument("questions", type=Path, help=".txt (one per line) or .jsonl file")
+    parser.add_argument(
+        "--project",
+        default=ALL_PROJECTS,
+        choices=[ALL_PROJECTS] + list(config.PROJECTS),
+        help="scope for questions without their own project",
+    )
+    parser.add_argument("--out", type=Path, default=None, help="JSONL output (default: stdout)")
+    parser.add_argument("--concurrency", type=int, default=4, help="max LLM calls in flight")
+    parser.add_argument("--no-llm", action="store_true", help="retrieval only, no answers")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the answer cache")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    items = read_questions(args.questions, args.project)
+    if not items:
+        print("[WARN] no questions found", file=sys.stderr)
+        return
+
+    if config.TRACE_PATH is not None:
+        set_sink(JsonlSink(config.TRACE_PATH))
+
+    start = time.perf_counter()
+    if config.SERVICE_URL:
+        embedder, registry = connect(config.SERVICE_URL)
+    else:
+        embedder = load_embedder(
+            config.EMBEDDING_MODEL, config.EMBEDDING_BACKEND, config.EMBEDDING_MODEL_DIR
+        )
+        registry = None
+    engine = build_engine(embedder, use_cache=not args.no_cache, registry=registry)
+    client = None if args.no_llm else get_client()
+    print(f"[OK] engine ready in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+    # One batch per scope; records are written back in input order
+    records: List[Dict] = [None] * len(items)
+    by_scope: Dict[str, List[int]] = {}
+    for i, (question, scope, error) in enumerate(items):
+        if error:
+            records[i] = _error_record(question, scope, error)
+        else:
+            by_scope.setdefault(scope, []).append(i)
+
+    start = time.perf_counter()
+    for scope, rows in by_scope.items():
+        with start_trace("query_batch", scope=scope, questions=len(rows)):
+            results = engine.answer_batch(
+                client,
+                [items[i][0] for i in rows],
+                scope=scope,
+                max_concurrency=args.concurrency,
+            )
+        for i, result in zip(rows, results):
+            records[i] = result.as_record()
+    elapsed = time.perf_counter() - start
+
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    try:
+        for record in records:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    finally:
+        if args.out:
+            out.close()
+
+    errors = sum(1 for r in records if r["error"])
+    print(
+        f"[OK] {len(records)} questions in {elapsed:.2f}s "
+        f"({len(records) / elapsed:.2f} q/s), {errors} errors",
+        file=sys.stderr,
+    )
+    if client is not None:
+        print(f"[OK] LLM scheduler: {get_scheduler().snapshot()}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,177 @@
-from typing import List, Dict
+from dataclasses import dataclass, asdict
+from typing import List, Dict, Optional, Tuple
+import hashlib
+import re
 
-def build_context(docs: List[Dict]) -> str:
-    """
-    Build a grounded context block for the LLM.
+from rag.tokens import estimate_tokens
+from rag.tracing import span
 
-    Each chunk includes:
-    - project name
-    - source file
-    - section title (if available)
-    - content text
 
-    This enables explicit citations in answers.
-    """
-    if not docs:
-        return "No relevant project documentation was found."
+@dataclass
+class ContextReport:
+    budget: Optional[int]
+    tokens_used: int
+    tokens_dropped: int
+    chunks_used: int
+    chunks_over_budget: int
+    duplicates_dropped: int
 
-    blocks = []
+    def as_dict(self) -> Dict:
+        return asdict(self)
 
-    for i, doc in enumerate(docs, start=1):
-        header_parts = []
 
-        project = doc.get("project")
-        if project:
-            header_parts.append(f"Project: {project}")
+def _format_block(i: int, doc: Dict) -> str:
+    header_parts = []
 
-        source = doc.get("source")
-        if source:
-            header_parts.append(f"Source: {source}")
+    project = doc.get("project")
+    if project:
+        header_parts.append(f"Project: {project}")
 
-        section = doc.get("section_title")
-        if section:
-            header_parts.append(f"Section: {section}")
+    source = doc.get("source")
+    if source:
+        header_parts.append(f"Source: {source}")
 
-        header = " | ".join(header_parts)
+    # Full heading path where the chunker recorded one
+    section = " > ".join(doc.get("heading_path") or []) or doc.get("section_title")
+    if section:
+        header_parts.append(f"Section: {section}")
 
-        block = f"""
+    header = " | ".join(header_parts)
+
+    return f"""
 [Context {i}]
 {header}
 {doc["text"]}
 """.strip()
 
-        blocks.append(block)
 
-    return "\n\n".join(blocks)
+_WORD_RE = re.compile(r"\w+")
+
+
+def _shingles(text: str, n: int = 3) -> set:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < n:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+
+def dedupe_docs(docs: List[Dict], near_duplicate_threshold: float = 0.85) -> Tuple[List[Dict], int]:
+    """
+    Drop exact and near-duplicate chunks, keeping the first (most relevant).
+
+    Near-duplicates are detected by Jaccard similarity of word 3-shingles,
+    which catches e.g. the same folder tree indexed in several projects.
+    """
+    kept: List[Dict] = []
+    kept_shingles: List[set] = []
+    seen_hashes = set()
+    dropped = 0
+
+    for doc in docs:
+        normalized = " ".join(doc["text"].lower().split())
+        digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+        if digest in seen_hashes:
+            dropped += 1
+            continue
+
+        shingles = _shingles(normalized)
+        if any(
+            len(shingles & other) / max(1, len(shingles | other)) >= near_duplicate_threshold
+            for other in kept_shingles
+        ):
+            dropped += 1
+            continue
+
+        seen_hashes.add(digest)
+        kept_shingles.append(shingles)
+        kept.append(doc)
+
+    return kept, dropped
+
+
+def pack_docs(
+    docs: List[Dict],
+    token_budget: int,
+    near_duplicate_threshold: float = 0.85,
+) -> Tuple[List[Dict], ContextReport]:
+    """
+    Select docs that fit token_budget, greedily by relevance per token.
+
+    Relevance is the doc's "score" when present, otherwise 1 / rank.
+    Selected docs keep their original (relevance) order.
+    """
+    unique, duplicates = dedupe_docs(docs, near_duplicate_threshold)
+
+    candidates = []
+    for rank, doc in enumerate(unique):
+        tokens = estimate_tokens(_format_block(rank + 1, doc))
+        relevance = doc.get("score")
+        if relevance is None:
+            relevance = 1.0 / (rank + 1)
+        candidates.append((max(float(relevance), 1e-6) / max(tokens, 1), rank, tokens))
+
+    selected = set()
+    used = 0
+    for _, rank, tokens in sorted(candidates, key=lambda c: c[0], reverse=True):
+        if used + tokens <= token_budget:
+            selected.add(rank)
+            used += tokens
+
+    packed = [doc for rank, doc in enumerate(unique) if rank in selected]
+    dropped_tokens = sum(tokens for _, rank, tokens in candidates if rank not in selected)
+
+    report = ContextReport(
+        budget=token_budget,
+        tokens_used=used,
+        tokens_dropped=dropped_tokens,
+        chunks_used=len(packed),
+        chunks_over_budget=len(unique) - len(packed),
+        duplicates_dropped=duplicates,
+    )
+    return packed, report
+
+
+def build_context(
+    docs: List[Dict],
+    token_budget: Optional[int] = None,
+    return_report: bool = False,
+):
+    """
+    Build a grounded context block for the LLM.
+
+    Each chunk includes:
+    - project name
+    - source file
+    - section title (if available)
+    - content text
+
+    This enables explicit citations in answers.
+
+    With token_budget, duplicates are dropped and chunks are packed by
+    relevance per token until the budget is reached. With return_report,
+    returns (context, ContextReport) instead of just the context.
+    """
+    with span("build_context", candidates=len(docs), budget=token_budget) as s:
+        report = None
+        if token_budget is not None:
+            docs, report = pack_docs(docs, token_budget)
+
+        if not docs:
+            context = "No relevant project documentation was found."
+        else:
+            blocks = [_format_block(i, doc) for i, doc in enumerate(docs, start=1)]
+            context = "\n\n".join(blocks)
 
+        if report is None:
+            tokens = estimate_tokens(context)
+            report = ContextReport(None, tokens, 0, len(docs), 0, 0)
+        s.set(
+            chunks=report.chunks_used,
+            tokens_used=report.tokens_used,
+            tokens_dropped=report.tokens_dropped,
+            duplicates_dropped=report.duplicates_dropped,
+        )
 
+    if return_report:
+        return context, report
+    return context
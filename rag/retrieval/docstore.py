@@ -0,0 +1,95 @@
+"""
+Compact, lazily-loaded chunk store keyed by FAISS row id.
+
+Layout (next to rag_index.faiss):
+- rag_docs.bin          concatenated compact JSON records (UTF-8)
+- rag_docs.offsets.npy  int64 byte offsets, len = n_docs + 1
+
+Design:
+- The blob is memory-mapped and only the top-k hits are decoded per query,
+  so opening a store costs two small reads regardless of corpus size.
+- Indexes built before the store existed still load from rag_docs.json.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List
+
+import numpy as np
+
+from rag.indexing.artifacts import atomic_path
+
+
+BLOB_FILE = "rag_docs.bin"
+OFFSETS_FILE = "rag_docs.offsets.npy"
+JSON_FILE = "rag_docs.json"
+
+
+def write_docstore(docs: List[Dict], index_dir: Path, export_json: bool = False) -> None:
+    """
+    Write docs as blob + offset table; optionally also as pretty JSON.
+    """
+    offsets = np.zeros(len(docs) + 1, dtype=np.int64)
+
+    # Both files are memory-mapped by serving retrievers: replace, never rewrite
+    with atomic_path(index_dir / BLOB_FILE) as tmp, open(tmp, "wb") as f:
+        for i, doc in enumerate(docs):
+            record = json.dumps(doc, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            f.write(record)
+            offsets[i + 1] = offsets[i] + len(record)
+
+    with atomic_path(index_dir / OFFSETS_FILE) as tmp, open(tmp, "wb") as f:
+        np.save(f, offsets)
+
+    json_path = index_dir / JSON_FILE
+    if export_json:
+        with atomic_path(json_path) as tmp, open(tmp, "w", encoding="utf-8") as f:
+            json.dump(docs, f, indent=2, ensure_ascii=False)
+    elif json_path.exists():
+        # A stale export would silently disagree with the binary store
+        json_path.unlink()
+
+
+class DocStore:
+    def __init__(self, index_dir: Path):
+        self.index_dir = index_dir
+        self._blob = None
+        self._offsets = None
+        self._docs = None
+
+        if (index_dir / BLOB_FILE).exists():
+            self._offsets = np.load(index_dir / OFFSETS_FILE, mmap_mode="r")
+            with open(index_dir / BLOB_FILE, "rb") as f:
+                # mmap cannot map empty files
+                if self._offsets[-1] > 0:
+                    self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            with open(index_dir / JSON_FILE, "r", encoding="utf-8") as f:
+                self._docs = json.load(f)
+
+    def __len__(self) -> int:
+        if self._docs is not None:
+            return len(self._docs)
+        return len(self._offsets) - 1
+
+    def __getitem__(self, idx: int) -> Dict:
+        """
+        Return a fresh dict for the doc at FAISS row idx.
+        """
+        if self._docs is not None:
+            return dict(self._docs[idx])
+
+        if idx < 0:
+            idx += len(self)
+        start, end = int(self._offsets[idx]), int(self._offsets[idx + 1])
+        return json.loads(self._blob[start:end].decode("utf-8"))
+
+    def get_many(self, ids: Iterable[int]) -> List[Dict]:
+        return [self[int(i)] for i in ids]
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self[i]
@@ -0,0 +1,161 @@
+"""
+Index-time inverted index with vectorized BM25 scoring.
+
+Layout (lexical_index.npz next to rag_index.faiss):
+- terms     sorted vocabulary (looked up with np.searchsorted, no dict build)
+- indptr    CSR row pointers, len = n_terms + 1
+- postings  doc (FAISS row) ids per term
+- tf        term frequency per posting
+- doc_len   token count per doc
+
+Design:
+- Tokens keep tool names intact ("tf-idf", "c++", "easyocr") and also emit
+  their hyphen/dot parts, so exact technology names score lexically.
+- A query touches only the postings of its own terms; scores are
+  accumulated with NumPy, not Python loops over documents.
+- Fused with dense results via reciprocal-rank fusion (rrf_fuse).
+"""
+
+from __future__ import annotations
+
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from rag.indexing.artifacts import atomic_path
+
+
+LEXICAL_FILE = "lexical_index.npz"
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#]*(?:[-.][a-z0-9+#]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        if "-" in token or "." in token:
+            tokens.extend(p for p in re.split(r"[-.]", token) if p)
+    return tokens
+
+
+def write_lexical_index(texts: Sequence[str], index_dir: Path) -> None:
+    """
+    Build the inverted index for texts (in FAISS row order) and save it.
+    """
+    postings: Dict[str, List[Tuple[int, int]]] = {}
+    doc_len = np.zeros(len(texts), dtype=np.float32)
+
+    for doc_id, text in enumerate(texts):
+        counts = Counter(tokenize(text))
+        doc_len[doc_id] = sum(counts.values())
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((doc_id, tf))
+
+    terms = sorted(postings)
+    indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+    for i, term in enumerate(terms):
+        indptr[i + 1] = indptr[i] + len(postings[term])
+
+    flat = [p for term in terms for p in postings[term]]
+    doc_ids = np.array([d for d, _ in flat], dtype=np.int32)
+    tf = np.array([t for _, t in flat], dtype=np.float32)
+
+    with atomic_path(index_dir / LEXICAL_FILE) as tmp, open(tmp, "wb") as f:
+        np.savez(
+            f,
+            terms=np.array(terms, dtype=str),
+            indptr=indptr,
+            postings=doc_ids,
+            tf=tf,
+            doc_len=doc_len,
+        )
+
+
+class LexicalIndex:
+    def __init__(self, path: Path, k1: float = 1.2, b: float = 0.75):
+        with np.load(path, allow_pickle=False) as data:
+            self.terms = data["terms"]
+            self.indptr = data["indptr"]
+            self.postings = data["postings"]
+            self.tf = data["tf"]
+            self.doc_len = data["doc_len"]
+
+        self.k1 = k1
+        self.b = b
+        self.n_docs = len(self.doc_len)
+        avg_len = float(self.doc_len.mean()) if self.n_docs else 1.0
+        # Per-doc length normalization, precomputed once
+        self._norm = self.k1 * (1 - self.b + self.b * self.doc_len / max(avg_len, 1e-9))
+
+    @classmethod
+    def load(cls, index_dir: Path) -> Optional["LexicalIndex"]:
+        path = index_dir / LEXICAL_FILE
+        return cls(path) if path.exists() else None
+
+    def _term_ids(self, tokens: List[str]) -> np.ndarray:
+        if not tokens or len(self.terms) == 0:
+            return np.zeros(0, dtype=np.int64)
+        query = np.unique(np.array(tokens, dtype=str))
+        pos = np.searchsorted(self.terms, query)
+        pos = np.clip(pos, 0, len(self.terms) - 1)
+        return pos[self.terms[pos] == query]
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        allowed: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k (doc_ids, bm25 scores), best first.
+
+        allowed:
+            optional boolean mask over doc ids (project filter).
+        """
+        term_ids = self._term_ids(tokenize(query))
+        if len(term_ids) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        starts, ends = self.indptr[term_ids], self.indptr[term_ids + 1]
+        df = (ends - starts).astype(np.float32)
+        idf = np.log1p((self.n_docs - df + 0.5) / (df + 0.5))
+
+        # Gather all postings of the query terms in one shot
+        lengths = ends - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        docs = self.postings[offsets]
+        tf = self.tf[offsets]
+        weights = np.repeat(idf, lengths) * tf * (self.k1 + 1) / (tf + self._norm[docs])
+
+        if allowed is not None:
+            keep = allowed[docs]
+            docs, weights = docs[keep], weights[keep]
+        if len(docs) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        # Sum contributions per doc
+        order = np.argsort(docs, kind="stable")
+        docs, weights = docs[order], weights[order]
+        boundaries = np.flatnonzero(np.r_[True, docs[1:] != docs[:-1]])
+        unique_docs = docs[boundaries]
+        scores = np.add.reduceat(weights, boundaries)
+
+        k = min(k, len(unique_docs))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return unique_docs[top].astype(np.int64), scores[top]
+
+
+def rrf_fuse(rankings: Sequence[Sequence[int]], rrf_k: int = 60) -> List[Tuple[int, float]]:
+    """
+    Reciprocal-rank fusion of several ranked id lists, best first.
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (rrf_k + rank + 1)
+    return sorted(fused.items(), key=lambda x: x[1], reverse=True)
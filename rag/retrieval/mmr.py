@@ -0,0 +1,96 @@
+"""
+Stored chunk embeddings + Maximal Marginal Relevance (MMR) selection.
+
+Layout (next to rag_index.faiss):
+- rag_embeddings.npy  float16 unit vectors, one row per FAISS row id
+
+Design:
+- float16 halves the footprint of the raw vectors; the file is memory-mapped
+  so only the rows of a query's candidates are ever read.
+- MMR runs on the candidate set only: one (n, n) similarity matrix, then a
+  greedy loop of k vectorized steps.
+- lambda_ = 1.0 is pure relevance, lower values trade relevance for diversity.
+- Relevance defaults to the query cosine; hybrid retrieval passes its fused
+  (dense + BM25) relevance instead, so keyword hits are not judged on
+  cosine alone.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from rag.indexing.artifacts import atomic_path
+
+
+EMBEDDINGS_FILE = "rag_embeddings.npy"
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def write_embeddings(vectors: np.ndarray, index_dir: Path) -> None:
+    vectors = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+    with atomic_path(index_dir / EMBEDDINGS_FILE) as tmp, open(tmp, "wb") as f:
+        np.save(f, vectors.astype(np.float16))
+
+
+def load_embeddings(index_dir: Path) -> Optional[np.ndarray]:
+    """
+    Memory-mapped float16 embeddings, or None for indexes built without them.
+    """
+    path = index_dir / EMBEDDINGS_FILE
+    if not path.exists():
+        return None
+    return np.load(path, mmap_mode="r")
+
+
+def mmr_select(
+    query_vec: np.ndarray,
+    candidate_vecs: np.ndarray,
+    k: Optional[int] = None,
+    lambda_: float = 0.7,
+    relevance: Optional[np.ndarray] = None,
+) -> List[int]:
+    """
+    Order candidates by MMR; returns positions into candidate_vecs.
+
+    Each step picks argmax of
+        lambda_ * rel(c) - (1 - lambda_) * max sim(c, already selected)
+
+    relevance:
+        optional per-candidate relevance in [0, 1] used as rel(c);
+        default is sim(query, c).
+    """
+    n = len(candidate_vecs)
+    k = n if k is None else min(k, n)
+    if k <= 0:
+        return []
+
+    candidates = _normalize_rows(np.asarray(candidate_vecs, dtype=np.float32))
+    query = _normalize_rows(np.asarray(query_vec, dtype=np.float32).reshape(1, -1))[0]
+
+    if relevance is None:
+        relevance = candidates @ query
+    else:
+        relevance = np.asarray(relevance, dtype=np.float32)
+    pairwise = candidates @ candidates.T
+
+    redundancy = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    selected: List[int] = []
+
+    for step in range(k):
+        mmr = lambda_ * relevance - (1.0 - lambda_) * redundancy
+        mmr[~available] = -np.inf
+        best = int(np.argmax(mmr))
+
+        selected.append(best)
+        available[best] = False
+        redundancy = pairwise[best] if step == 0 else np.maximum(redundancy, pairwise[best])
+
+    return selected
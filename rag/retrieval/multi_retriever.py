@@ -1,26 +1,92 @@
+import contextvars
+import heapq
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict
-from sentence_transformers import SentenceTransformer
+from typing import List, Dict, Optional
+
+import numpy as np
 from rag.retrieval.retrieve import Retriever
+from rag.retrieval.query_embeddings import encode_query
+
+
+# FAISS releases the GIL during search, so threads give real parallelism
+_pool: Optional[ThreadPoolExecutor] = None
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(
+            max_workers=min(8, os.cpu_count() or 1),
+            thread_name_prefix="rag-search",
+        )
+    return _pool
 
 
 class MultiProjectRetriever:
-    def __init__(self, project_indexes: Dict[str, Path], embedder: SentenceTransformer):
+    def __init__(
+        self,
+        project_indexes: Dict[str, Path],
+        embedder,
+        registry=None,
+    ):
         """
         project_indexes:
             dict: project_name -> index_dir
+        registry:
+            optional RetrieverRegistry; reuses already-loaded indexes
         """
+        self.embedder = embedder
         self.retrievers = {
-            name: Retriever(index_dir=path, embedder=embedder)
+            name: (
+                registry.get(path, name=name)
+                if registry is not None
+                else Retriever(index_dir=path, embedder=embedder)
+            )
             for name, path in project_indexes.items()
         }
 
     def retrieve(self, query: str, top_k: int = 5) -> List[Dict]:
-        all_docs = []
+        return self.retrieve_by_vector(
+            encode_query(self.embedder, query), top_k=top_k, query_text=query
+        )
+
+    def retrieve_by_vector(
+        self,
+        query_vec: np.ndarray,
+        top_k: int = 5,
+        query_text: Optional[str] = None,
+        mmr_lambda: Optional[float] = None,
+    ) -> List[Dict]:
+        """
+        Search all projects concurrently and return the global top_k by score.
+
+        Every returned doc carries its "project" and calibrated "score".
+        Projects are merged on that cosine, never on per-index values such
+        as "rrf_score", which only rank hits within one index.
+        """
+        futures = {
+            # copy_context keeps tracing spans parented across threads
+            name: _executor().submit(
+                contextvars.copy_context().run,
+                retriever.retrieve_by_vector,
+                query_vec,
+                top_k,
+                query_text=query_text,
+                mmr_lambda=mmr_lambda,
+            )
+            for name, retriever in self.retrievers.items()
+        }
 
-        for retriever in self.retrievers.values():
-            docs = retriever.retrieve(query, top_k=top_k)
-            all_docs.extend(docs)
+        ranked_lists = []
+        for name, future in futures.items():
+            docs = future.result()
+            for d in docs:
+                d["project"] = name
+            ranked_lists.append(sorted(docs, key=lambda d: d["score"], reverse=True))
 
-        # simple relevance trimming
-        return all_docs[:top_k]
+        # k-way merge of per-project lists, each already sorted by score
+        merged = heapq.merge(*ranked_lists, key=lambda d: d["score"], reverse=True)
+        return list(itertools.islice(merged, top_k))
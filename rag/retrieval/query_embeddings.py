@@ -0,0 +1,137 @@
+"""
+Process-wide LRU cache of query embeddings.
+
+Design:
+- One question is encoded once and shared by routing and every retriever.
+- Keys are (embedder key, normalized text). The embedder key is the
+  embedder's cache_key (model name plus backend, e.g. "@onnx-int8") and
+  dimension, so switching backends never reuses another model's vectors.
+  Text normalization only collapses whitespace, so cased embedding models
+  are not affected.
+- Repeated sample questions skip the embedding forward pass entirely.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from rag.tracing import span
+
+
+def normalize_query(text: str) -> str:
+    return " ".join(text.split())
+
+
+def model_key(embedder) -> str:
+    """
+    Stable key for the vectors an embedder produces: its cache_key (falling
+    back to model_name) and embedding dimension.
+    """
+    name = getattr(embedder, "cache_key", None) or getattr(embedder, "model_name", None)
+    if not name:
+        return f"{type(embedder).__name__}@{id(embedder)}"
+    dim = getattr(embedder, "get_sentence_embedding_dimension", None)
+    return f"{name}/{dim()}" if dim is not None else str(name)
+
+
+class QueryEmbeddingCache:
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+
+    def encode(self, embedder, text: str) -> np.ndarray:
+        """
+        Return the embedding of text as a 1-D float32 vector.
+        """
+        key = (model_key(embedder), normalize_query(text))
+
+        with self._lock:
+            vec = self._entries.get(key)
+            if vec is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vec
+
+        vec = np.asarray(embedder.encode([key[1]]), dtype=np.float32)[0]
+        vec.setflags(write=False)
+
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = vec
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+        return vec
+
+    def encode_many(self, embedder, texts: List[str]) -> np.ndarray:
+        """
+        Embed many queries; all cache misses go through one encode call.
+        """
+        model = model_key(embedder)
+        keys = [(model, normalize_query(t)) for t in texts]
+
+        found: Dict[Tuple[str, str], np.ndarray] = {}
+        with self._lock:
+            for key in keys:
+                vec = self._entries.get(key)
+                if vec is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = vec
+            self.hits += sum(1 for key in keys if key in found)
+
+        missing = list(dict.fromkeys(key for key in keys if key not in found))
+        if missing:
+            vecs = np.asarray(embedder.encode([key[1] for key in missing]), dtype=np.float32)
+            with self._lock:
+                self.misses += len(missing)
+                for key, vec in zip(missing, vecs):
+                    vec.setflags(write=False)
+                    found[key] = vec
+                    self._entries[key] = vec
+                    self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+
+        return np.stack([found[key] for key in keys]) if keys else np.zeros((0, 0), np.float32)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_default_cache = QueryEmbeddingCache()
+
+
+def encode_query(embedder, text: str) -> np.ndarray:
+    """
+    Encode a query through the shared process-wide cache.
+    """
+    with span("encode_query") as s:
+        misses = _default_cache.misses
+        vec = _default_cache.encode(embedder, text)
+        s.set(cache_hit=_default_cache.misses == misses)
+    return vec
+
+
+def encode_queries(embedder, texts: List[str]) -> np.ndarray:
+    """
+    Batched encode_query(): returns one row per text.
+    """
+    with span("encode_queries", queries=len(texts)) as s:
+        hits = _default_cache.hits
+        vecs = _default_cache.encode_many(embedder, texts)
+        s.set(cache_hits=_default_cache.hits - hits)
+    return vecs
+
+
+def query_cache() -> QueryEmbeddingCache:
+    return _default_cache
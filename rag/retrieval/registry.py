@@ -0,0 +1,181 @@
+"""
+Process-wide cache of loaded Retrievers.
+
+Design:
+- Each index directory is loaded once per process and shared by all sessions.
+- FAISS indexes are memory-mapped where the index type allows it.
+- A cheap stat() of index_meta.json is checked on every lookup, so a rebuilt
+  index is picked up without restarting the app. Builders replace every
+  artifact atomically and write the meta file last (rag/indexing/artifacts.py),
+  so a changed meta file means a complete new set is on disk, and mappings
+  held by the old Retriever stay valid. Directories without a meta file
+  (older builds) fall back to a stat() of every artifact.
+- Load cost, approximate resident memory and whether the index really is
+  memory-mapped are recorded per project (report()); loads are also traced
+  as "retriever.load" spans. Nothing is printed, since the registry lives
+  for the whole process and reloads whenever an index is rebuilt.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from rag.indexing.artifacts import is_temp_file
+from rag.indexing.faiss_index import META_FILE
+from rag.retrieval.retrieve import Retriever
+
+
+Signature = Tuple[Tuple, ...]
+
+
+@dataclass
+class LoadStats:
+    name: str
+    index_dir: str
+    load_ms: float
+    artifact_bytes: int
+    rss_delta_bytes: Optional[int]
+    mmap: bool  # as loaded; False when the index type could not be mmapped
+    loads: int
+
+
+def _artifacts(index_dir: Path) -> Signature:
+    """
+    (file name, mtime_ns, size) for every artifact in the index directory,
+    skipping temp files of a build in progress.
+    """
+    entries = []
+    try:
+        with os.scandir(index_dir) as it:
+            for entry in it:
+                if entry.is_file() and not is_temp_file(entry.name):
+                    st = entry.stat()
+                    entries.append((entry.name, st.st_mtime_ns, st.st_size))
+    except FileNotFoundError:
+        return ()
+
+    return tuple(sorted(entries))
+
+
+def _signature(index_dir: Path) -> Signature:
+    """
+    (name, mtime_ns, size, inode) of index_meta.json, which builders replace
+    last; every artifact for indexes written without one.
+    """
+    try:
+        st = os.stat(index_dir / META_FILE)
+    except FileNotFoundError:
+        return _artifacts(index_dir)
+    return ((META_FILE, st.st_mtime_ns, st.st_size, st.st_ino),)
+
+
+def _current_rss() -> Optional[int]:
+    """
+    Resident set size of this process in bytes (Linux only).
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class RetrieverRegistry:
+    def __init__(self, embedder, mmap: bool = True, **retriever_kwargs):
+        """
+        retriever_kwargs:
+            passed to every Retriever (e.g. hybrid=False)
+        """
+        self.embedder = embedder
+        self.mmap = mmap
+        self.retriever_kwargs = retriever_kwargs
+
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Path, threading.Lock] = {}
+        self._entries: Dict[Path, Tuple[Signature, Retriever]] = {}
+        self._stats: Dict[Path, LoadStats] = {}
+
+    def get(self, index_dir: Path, name: Optional[str] = None) -> Retriever:
+        """
+        Return the cached Retriever for index_dir, (re)loading it if the
+        artifacts on disk changed since the last load.
+        """
+        key = Path(index_dir).resolve()
+        signature = _signature(key)
+
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # Another session may have loaded it while we waited
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                return entry[1]
+
+            retriever = self._load(key, signature, name or key.name)
+
+        return retriever
+
+    def _load(self, key: Path, signature: Signature, name: str) -> Retriever:
+        rss_before = _current_rss()
+        start = time.perf_counter()
+
+        retriever = Retriever(
+            index_dir=key,
+            embedder=self.embedder,
+            mmap=self.mmap,
+            **self.retriever_kwargs,
+        )
+
+        load_ms = (time.perf_counter() - start) * 1000
+        rss_after = _current_rss()
+        rss_delta = (
+            rss_after - rss_before
+            if rss_before is not None and rss_after is not None
+            else None
+        )
+
+        previous = self._stats.get(key)
+        stats = LoadStats(
+            name=name,
+            index_dir=str(key),
+            load_ms=round(load_ms, 2),
+            artifact_bytes=sum(entry[2] for entry in _artifacts(key)),
+            rss_delta_bytes=rss_delta,
+            mmap=retriever.mmapped,
+            loads=(previous.loads + 1) if previous else 1,
+        )
+
+        self._entries[key] = (signature, retriever)
+        self._stats[key] = stats
+        return retriever
+
+    def invalidate(self, index_dir: Optional[Path] = None) -> None:
+        """
+        Drop one cached index (or all of them), with its load stats, so the
+        next get() reloads.
+        """
+        with self._lock:
+            if index_dir is None:
+                self._entries.clear()
+                self._stats.clear()
+            else:
+                key = Path(index_dir).resolve()
+                self._entries.pop(key, None)
+                self._stats.pop(key, None)
+
+    def report(self) -> List[Dict]:
+        """
+        Load cost and memory footprint per loaded project, as plain dicts.
+        """
+        return [asdict(s) for s in self._stats.values()]
@@ -0,0 +1,153 @@
+"""
+Optional cross-encoder reranking of retrieved candidates (CPU).
+
+Design:
+- A small local cross-encoder scores (query, chunk) pairs jointly, which is
+  more precise than bi-encoder similarity at small k.
+- Candidates are scored in batched forward passes (one pass for typical
+  candidate counts); scores are cached per (query, chunk hash).
+- A per-query latency budget is checked between batches; candidates left
+  unscored when it runs out keep their retrieval order after the scored ones,
+  with scores placed below the lowest reranker score (same [0, 1] scale).
+- sentence_transformers is imported lazily, so a disabled reranker costs nothing.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+
+@dataclass
+class RerankReport:
+    added_ms: float
+    scored: int
+    cached: int
+    skipped: int
+    budget_exceeded: bool
+
+
+def _chunk_key(query: str, text: str) -> Tuple[str, str]:
+    return " ".join(query.split()), hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class CrossEncoderReranker:
+    def __init__(
+        self,
+        model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        budget_ms: Optional[float] = 200.0,
+        batch_size: int = 32,
+        cache_size: int = 4096,
+    ):
+        self.model_name = model_name
+        self.budget_ms = budget_ms
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+
+        self._model = None
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+
+    def _load(self):
+        if self._model is None:
+            from sentence_transformers import CrossEncoder
+
+            self._model = CrossEncoder(self.model_name, device="cpu")
+        return self._model
+
+    def _cache_get(self, key) -> Optional[float]:
+        with self._lock:
+            score = self._cache.get(key)
+            if score is not None:
+                self._cache.move_to_end(key)
+            return score
+
+    def _cache_put(self, items: Dict[Tuple[str, str], float]) -> None:
+        with self._lock:
+            self._cache.update(items)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def rerank(
+        self,
+        query: str,
+        docs: List[Dict],
+        top_k: Optional[int] = None,
+    ) -> Tuple[List[Dict], RerankReport]:
+        """
+        Reorder docs by cross-encoder score.
+
+        Scored docs get "rerank_score" (raw logit) and their "score" is replaced
+        by its sigmoid, so downstream relevance weighting uses the reranker;
+        the original score is kept as "retrieval_score". Docs skipped by the
+        latency budget get evenly spaced scores below the lowest sigmoid, so
+        every "score" in the result is on one scale and in result order.
+        """
+        start = time.perf_counter()
+        keys = [_chunk_key(query, d["text"]) for d in docs]
+
+        scores: Dict[int, float] = {}
+        for i, key in enumerate(keys):
+            cached = self._cache_get(key)
+            if cached is not None:
+                scores[i] = cached
+        n_cached = len(scores)
+
+        pending = [i for i in range(len(docs)) if i not in scores]
+        budget_exceeded = False
+
+        if pending:
+            model = self._load()
+            for b in range(0, len(pending), self.batch_size):
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                if self.budget_ms is not None and b > 0 and elapsed_ms > self.budget_ms:
+                    budget_exceeded = True
+                    break
+
+                batch = pending[b:b + self.batch_size]
+                batch_scores = model.predict([(query, docs[i]["text"]) for i in batch])
+                fresh = {}
+                for i, score in zip(batch, batch_scores):
+                    scores[i] = float(score)
+                    fresh[keys[i]] = float(score)
+                self._cache_put(fresh)
+
+        scored = sorted(scores, key=lambda i: scores[i], reverse=True)
+        unscored = [i for i in range(len(docs)) if i not in scores]
+
+        result = []
+        for i in scored:
+            doc = dict(docs[i])
+            doc["rerank_score"] = scores[i]
+            doc["retrieval_score"] = doc.get("score")
+            doc["score"] = 1.0 / (1.0 + math.exp(-scores[i]))
+            result.append(doc)
+
+        if scored:
+            # A cosine or RRF value is not comparable with a sigmoid: rank the
+            # skipped docs below every scored one, keeping their retrieval order
+            floor = result[-1]["score"]
+            for j, i in enumerate(unscored):
+                doc = dict(docs[i])
+                doc["retrieval_score"] = doc.get("score")
+                doc["score"] = floor * (len(unscored) - j) / (len(unscored) + 1)
+                result.append(doc)
+        else:
+            result.extend(dict(docs[i]) for i in unscored)
+
+        if top_k is not None:
+            result = result[:top_k]
+
+        report = RerankReport(
+            added_ms=(time.perf_counter() - start) * 1000,
+            scored=len(scores) - n_cached,
+            cached=n_cached,
+            skipped=len(unscored),
+            budget_exceeded=budget_exceeded,
+        )
+        return result, report
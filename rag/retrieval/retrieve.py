@@ -1,27 +1,310 @@
 from pathlib import Path
+from typing import Dict, List, Optional
 import json
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
+
+from rag.indexing.faiss_index import (
+    configure_index,
+    load_rescore_vectors,
+    read_index_meta,
+    rescore,
+    search_parameters,
+)
+from rag.retrieval.docstore import DocStore
+from rag.retrieval.lexical import LexicalIndex, rrf_fuse
+from rag.retrieval.mmr import load_embeddings, mmr_select
+from rag.retrieval.query_embeddings import encode_query
+from rag.tracing import span
+
+
+def read_index(path: Path, mmap: bool = False):
+    """
+    Read a FAISS index, memory-mapping it when the index type allows it.
+
+    Falls back to a regular read if the installed FAISS build (or the
+    index type) does not support mmap flags.
+
+    Returns (index, whether it is actually memory-mapped).
+    """
+    if mmap:
+        flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+        flags |= faiss.IO_FLAG_READ_ONLY
+        try:
+            return faiss.read_index(str(path), flags), True
+        except RuntimeError:
+            pass
+
+    return faiss.read_index(str(path)), False
+
 
 class Retriever:
-    def __init__(self, index_dir: Path, embedder: SentenceTransformer):
+    def __init__(
+        self,
+        index_dir: Path,
+        embedder,
+        mmap: bool = False,
+        hybrid: bool = True,
+        rrf_k: int = 60,
+    ):
+        with span("retriever.load", index=Path(index_dir).name, mmap=mmap) as s:
+            self._load(index_dir, embedder, mmap, hybrid, rrf_k)
+            s.set(
+                chunks=self.index.ntotal,
+                mmapped=self.mmapped,
+                hybrid=self.lexical is not None,
+            )
+
+    def _load(self, index_dir: Path, embedder, mmap: bool, hybrid: bool, rrf_k: int) -> None:
         self.index_dir = index_dir
         self.embedder = embedder
+        self.rrf_k = rrf_k
+
+        # mmapped: what actually happened, not what was requested
+        self.index, self.mmapped = read_index(index_dir / "rag_index.faiss", mmap=mmap)
+        # Index type + search parameters recorded at build time (None = legacy Flat L2)
+        self.meta = read_index_meta(index_dir)
+        configure_index(self.index, self.meta)
+        # Quantized indexes: exact float32 vectors (memory-mapped) to re-rank candidates
+        self.rescore_factor = int((self.meta or {}).get("rescore_factor") or 0)
+        self.rescore_vectors = load_rescore_vectors(index_dir) if self.rescore_factor else None
+        # Lazily decoded: only the hits of each search are parsed
+        self.docs = DocStore(index_dir)
+        # BM25 side of hybrid retrieval (absent for indexes built before it existed)
+        self.lexical = LexicalIndex.load(index_dir) if hybrid else None
+        # float16 chunk vectors for MMR (absent for indexes built before it existed)
+        self.embeddings = load_embeddings(index_dir)
+
+        # Combined (multi-project) indexes carry a row -> project-id array
+        self.project_names = []
+        self.project_ids = None
+        if (index_dir / "project_ids.npy").exists():
+            with open(index_dir / "projects.json", "r", encoding="utf-8") as f:
+                self.project_names = json.load(f)
+            self.project_ids = np.load(index_dir / "project_ids.npy", mmap_mode="r")
+        self._selectors = {}
+
+    def _project_filter(self, projects):
+        """
+        (row mask, FAISS search parameters) restricting a search to projects.
+        """
+        key = frozenset(projects)
+        if key not in self._selectors:
+            wanted = [i for i, name in enumerate(self.project_names) if name in key]
+            mask = np.isin(self.project_ids, wanted)
+            bitmap = np.packbits(mask, bitorder="little")
+            selector = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bitmap))
+            # Keep the bitmap alive for as long as the selector is used
+            self._selectors[key] = (mask, search_parameters(self.meta, selector), selector, bitmap)
+
+        mask, params = self._selectors[key][:2]
+        return mask, params
+
+    def _filtered_search(self, query_vecs: np.ndarray, k: int, projects):
+        mask, params = self._project_filter(projects)
+        try:
+            return self.index.search(query_vecs, k, params=params)
+        except RuntimeError:
+            pass
+
+        # Index types without selector support (e.g. plain PQ): over-fetch, then filter
+        fetch = min(self.index.ntotal, k * 8)
+        distances, indices = self.index.search(query_vecs, fetch)
+
+        out_distances = np.full((len(query_vecs), k), np.inf, dtype=np.float32)
+        out_indices = np.full((len(query_vecs), k), -1, dtype=np.int64)
+        for row in range(len(query_vecs)):
+            valid = indices[row] >= 0
+            keep = valid.copy()
+            keep[valid] = mask[indices[row][valid]]
+            n = min(k, int(keep.sum()))
+            out_distances[row, :n] = distances[row, keep][:n]
+            out_indices[row, :n] = indices[row, keep][:n]
+        return out_distances, out_indices
+
+    def score(self, distance: float) -> float:
+        """
+        Convert a raw FAISS distance into a cosine similarity.
+
+        Embeddings are unit-normalized, so for L2 indexes ||a-b||^2 = 2 - 2cos;
+        this makes scores comparable across indexes and index types.
+        """
+        if self.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            return float(distance)
+        return 1.0 - float(distance) / 2.0
 
-        self.index = faiss.read_index(str(index_dir / "rag_index.faiss"))
-        with open(index_dir / "rag_docs.json", "r", encoding="utf-8") as f:
-            self.docs = json.load(f)
+    def _cosines(self, query_vec: np.ndarray, ids: List[int], dense: Dict[int, float]) -> Dict[int, float]:
+        """
+        Calibrated scores for ids, including BM25-only hits missing from dense.
+        """
+        missing = [idx for idx in ids if idx not in dense]
+        if not missing:
+            return dense
 
-    def retrieve(self, query: str, top_k: int = 5):
-        query_vec = self.embedder.encode([query])
-        distances, indices = self.index.search(query_vec, top_k * 2)
+        scores = dict(dense)
+        vectors = self.rescore_vectors if self.rescore_vectors is not None else self.embeddings
+        if vectors is not None:
+            rows = np.asarray(vectors[np.array(missing)], dtype=np.float32)
+            rows /= np.maximum(np.linalg.norm(rows, axis=1, keepdims=True), 1e-12)
+            query = query_vec / max(float(np.linalg.norm(query_vec)), 1e-12)
+            scores.update(zip(missing, (rows @ query).astype(float).tolist()))
+        else:
+            # Not among the dense hits, so its cosine is at most the lowest of them
+            floor = min(dense.values()) if dense else 0.0
+            scores.update((idx, floor) for idx in missing)
+        return scores
+
+    def encode_query(self, query: str) -> np.ndarray:
+        return encode_query(self.embedder, query)
+
+    def retrieve(self, query: str, top_k: int = 5, projects=None):
+        """
+        projects:
+            optional list of project names; only valid for a combined index.
+            Restricts the search to those projects in a single FAISS call.
+        """
+        return self.retrieve_by_vector(
+            self.encode_query(query), top_k=top_k, projects=projects, query_text=query
+        )
+
+    def retrieve_by_vector(
+        self,
+        query_vec: np.ndarray,
+        top_k: int = 5,
+        projects=None,
+        query_text: str = None,
+        mmr_lambda: float = None,
+    ):
+        """
+        Same as retrieve(), for a query that has already been embedded.
+
+        If query_text is given and the index has a lexical side, dense and
+        BM25 rankings are fused with RRF. The fused value orders the hits of
+        this index and is kept in "rrf_score"; "score" stays the calibrated
+        cosine, which is what is comparable across indexes.
+
+        mmr_lambda:
+            optional MMR trade-off (1.0 = relevance only). Candidates are
+            re-ordered by MMR over their stored embeddings before the
+            priority sort, so near-duplicates fall out of the top_k.
+        """
+        return self.retrieve_batch(
+            np.asarray(query_vec).reshape(1, -1),
+            top_k=top_k,
+            projects=projects,
+            query_texts=[query_text],
+            mmr_lambda=mmr_lambda,
+        )[0]
+
+    def retrieve_batch(
+        self,
+        query_vecs: np.ndarray,
+        top_k: int = 5,
+        projects=None,
+        query_texts: List[Optional[str]] = None,
+        mmr_lambda: float = None,
+    ) -> List[List[Dict]]:
+        """
+        retrieve_by_vector() for a matrix of queries, with one FAISS search.
+
+        Returns one result list per row of query_vecs.
+        """
+        query_vecs = np.array(query_vecs, dtype=np.float32).reshape(len(query_vecs), -1)
+        if self.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            faiss.normalize_L2(query_vecs)
+
+        n_fetch = top_k * 2
+        filtered = projects is not None and self.project_ids is not None
+
+        with span(
+            "retrieve",
+            index=Path(self.index_dir).name,
+            queries=len(query_vecs),
+            top_k=top_k,
+            filtered=filtered,
+            hybrid=self.lexical is not None,
+            mmr=mmr_lambda is not None and self.embeddings is not None,
+        ) as s:
+            rescoring = self.rescore_vectors is not None
+            fetch = n_fetch
+            if rescoring:
+                fetch = max(n_fetch, min(self.index.ntotal, n_fetch * self.rescore_factor))
+            with span("retrieve.search", fetch=fetch):
+                if filtered:
+                    distances, indices = self._filtered_search(query_vecs, fetch, projects)
+                else:
+                    distances, indices = self.index.search(query_vecs, fetch)
+
+            if rescoring:
+                with span("retrieve.rescore", candidates=fetch):
+                    distances, indices = rescore(
+                        query_vecs, indices, self.rescore_vectors, self.index.metric_type, n_fetch
+                    )
+
+            allowed = self._project_filter(projects)[0] if filtered else None
+            query_texts = query_texts or [None] * len(query_vecs)
+
+            results = [
+                self._rank(
+                    query_vecs[row], distances[row], indices[row], query_texts[row],
+                    top_k, allowed, mmr_lambda,
+                )
+                for row in range(len(query_vecs))
+            ]
+            s.set(results=sum(len(r) for r in results))
+        return results
+
+    def _rank(
+        self,
+        query_vec: np.ndarray,
+        distances: np.ndarray,
+        indices: np.ndarray,
+        query_text: Optional[str],
+        top_k: int,
+        allowed: Optional[np.ndarray],
+        mmr_lambda: Optional[float],
+    ) -> List[Dict]:
+        """
+        Fuse, diversify and priority-sort the dense hits of one query.
+        """
+        n_fetch = top_k * 2
+        dense = {
+            int(idx): self.score(distance)
+            for distance, idx in zip(distances, indices)
+            if idx != -1
+        }
+
+        if self.lexical is not None and query_text:
+            lex_ids, lex_scores = self.lexical.search(query_text, n_fetch, allowed=allowed)
+            bm25 = dict(zip(lex_ids.tolist(), lex_scores.tolist()))
+            # (idx, rrf score): rank-based, only meaningful within this index
+            ranked = rrf_fuse([list(dense), list(bm25)], rrf_k=self.rrf_k)[:n_fetch]
+            dense = self._cosines(query_vec, [idx for idx, _ in ranked], dense)
+        else:
+            bm25 = {}
+            ranked = list(dense.items())
+
+        if mmr_lambda is not None and self.embeddings is not None and ranked:
+            rows = np.array([idx for idx, _ in ranked])
+            relevance = None
+            if bm25:
+                # MMR must keep the fused order: a BM25-only keyword hit can
+                # have a low cosine yet rank first. Min-max the RRF scores
+                fused = np.array([score for _, score in ranked], dtype=np.float32)
+                spread = float(fused.max() - fused.min())
+                relevance = (fused - fused.min()) / spread if spread > 0 else np.ones_like(fused)
+            order = mmr_select(
+                query_vec, self.embeddings[rows], lambda_=mmr_lambda, relevance=relevance
+            )
+            ranked = [ranked[i] for i in order]
 
         candidates = []
-        for idx in indices[0]:
-            if idx == -1:
-                continue
+        for idx, fused in ranked:
             doc = self.docs[idx]
+            doc["score"] = dense[idx]
+            if bm25:
+                doc["rrf_score"] = fused
+                doc["bm25_score"] = bm25.get(idx)
 
             priority = 0
             if doc.get("source") == "folder_tree":
@@ -35,4 +318,3 @@ class Retriever:
 
         candidates.sort(key=lambda x: x[0], reverse=True)
         return [doc for _, doc in candidates[:top_k]]
-
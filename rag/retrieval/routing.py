@@ -0,0 +1,127 @@
+"""
+Stage-1 project routing for "All Projects" mode.
+
+Design:
+- Routing descriptors are embedded once (at build time or on first use)
+  and stored as a row-normalized matrix next to the indexes.
+- A query is routed with a single matrix-vector product.
+- The artifact carries a fingerprint of the embedder (cache_key, i.e. model
+  and backend, plus dimension) and PROJECT_ROUTING, so changing the model,
+  the backend or a descriptor invalidates it automatically.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from rag.indexing.artifacts import atomic_path
+from rag.retrieval.query_embeddings import model_key
+
+
+def routing_fingerprint(routing: Dict[str, str], embedder_key: str) -> str:
+    """
+    embedder_key:
+        model_key(embedder) of the embedder that encodes the descriptors
+    """
+    payload = json.dumps(
+        {"model": embedder_key, "routing": routing},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class ProjectRouter:
+    def __init__(self, names: List[str], matrix: np.ndarray, fingerprint: str):
+        self.names = list(names)
+        self.matrix = _normalize_rows(matrix)
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["ProjectRouter"]:
+        if not path.exists():
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                names=[str(n) for n in data["names"]],
+                matrix=data["matrix"],
+                fingerprint=str(data["fingerprint"]),
+            )
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write through a file handle so numpy keeps the exact file name
+        with atomic_path(path) as tmp, open(tmp, "wb") as f:
+            np.savez(
+                f,
+                names=np.array(self.names),
+                matrix=self.matrix,
+                fingerprint=np.array(self.fingerprint),
+            )
+
+    def scores(self, query_vec: np.ndarray) -> np.ndarray:
+        """
+        Cosine similarity of the query against every project descriptor.
+        """
+        query = _normalize_rows(np.asarray(query_vec).reshape(1, -1))[0]
+        return self.matrix @ query
+
+    def route(self, query_vec: np.ndarray, top_n: int = 3) -> List[Tuple[str, float]]:
+        """
+        Return the top_n (project, score) pairs, best first.
+        """
+        scores = self.scores(query_vec)
+        top_n = min(top_n, len(self.names))
+        if top_n <= 0:
+            return []
+
+        top = np.argpartition(-scores, top_n - 1)[:top_n]
+        top = top[np.argsort(-scores[top])]
+        return [(self.names[i], float(scores[i])) for i in top]
+
+
+def build_router(embedder, routing: Dict[str, str]) -> ProjectRouter:
+    """
+    Embed all routing descriptors in one batched call.
+    """
+    names = list(routing.keys())
+    matrix = embedder.encode([routing[n] for n in names])
+    return ProjectRouter(
+        names=names,
+        matrix=matrix,
+        fingerprint=routing_fingerprint(routing, model_key(embedder)),
+    )
+
+
+def load_router(
+    embedder,
+    path: Path,
+    routing: Dict[str, str],
+) -> ProjectRouter:
+    """
+    Load the stored routing matrix, rebuilding it if it is missing or stale.
+    """
+    router = ProjectRouter.load(path)
+    fingerprint = routing_fingerprint(routing, model_key(embedder))
+    if router is not None and router.fingerprint == fingerprint:
+        return router
+
+    router = build_router(embedder, routing)
+    try:
+        router.save(path)
+    except OSError:
+        # Read-only deployments still route correctly from memory
+        pass
+    return router
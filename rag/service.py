@@ -0,0 +1,523 @@
+"""
+Local embedding / retrieval sidecar shared by every app worker on a host.
+
+Design:
+- One process owns the embedder and the FAISS indexes (via a
+  RetrieverRegistry); Streamlit workers and the batch CLI talk to it over
+  localhost HTTP instead of each loading their own model copy.
+- Concurrent requests are micro-batched: a MicroBatcher waits up to
+  window_ms for more work (or max_batch items), then runs one encode call
+  for all queued texts, or one retrieve_batch() per (index, top_k,
+  projects, mmr_lambda) group of queued searches.
+- RemoteEmbedder and RemoteRegistry / RemoteRetriever expose the same
+  methods as the local embedder, RetrieverRegistry and Retriever, so the
+  QueryEngine, router and answer cache run unchanged on top of them.
+- Vectors travel as base64 float32; documents as plain JSON.
+- Only the index directories the service was started with can be searched.
+
+Usage:
+    python -m rag.service --port 8766 --window-ms 3
+    # config.py: SERVICE_URL = "http://127.0.0.1:8766"
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import http.client
+import json
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from rag.retrieval.query_embeddings import encode_query, query_cache
+from rag.tracing import span
+
+
+# -------------------------------------------------
+# Wire format
+# -------------------------------------------------
+def pack_array(array: np.ndarray) -> Dict:
+    array = np.ascontiguousarray(array, dtype=np.float32)
+    return {"shape": list(array.shape), "data": base64.b64encode(array.tobytes()).decode("ascii")}
+
+
+def unpack_array(payload: Dict) -> np.ndarray:
+    data = base64.b64decode(payload["data"])
+    return np.frombuffer(data, dtype=np.float32).reshape(payload["shape"])
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+# -------------------------------------------------
+# Micro-batching
+# -------------------------------------------------
+class MicroBatcher:
+    """
+    Collects items submitted from many threads and hands them to
+    fn(items) -> results in batches, from a single worker thread.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[List], List],
+        window_ms: float = 3.0,
+        max_batch: int = 64,
+        name: str = "batcher",
+    ):
+        self.fn = fn
+        self.window_s = window_ms / 1000
+        self.max_batch = max(1, max_batch)
+        self.name = name
+
+        self.batches = 0
+        self.items = 0
+        self.largest = 0
+
+        self._queue: "queue.Queue" = queue.Queue()
+        threading.Thread(target=self._run, name=f"rag-{name}", daemon=True).start()
+
+    def submit(self, item):
+        """
+        Queue item and block until its batch has run; returns its result.
+        """
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future.result()
+
+    def _collect(self) -> List:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window_s
+        while len(batch) < self.max_batch:
+            remaining = max(0.0, deadline - time.monotonic())
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            # Counted before any caller is released, so snapshot() includes this batch
+            self.batches += 1
+            self.items += len(items)
+            self.largest = max(self.largest, len(items))
+
+            try:
+                with span(f"service.{self.name}", batch=len(items)):
+                    results = list(self.fn(items))
+                if len(results) != len(items):
+                    # zip() would leave the extra callers blocked forever
+                    raise RuntimeError(
+                        f"{self.name}: {len(results)} results for {len(items)} items"
+                    )
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                # fn may return an exception for items that failed on their own
+                for (_, future), result in zip(batch, results):
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+
+    def snapshot(self) -> Dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest,
+        }
+
+
+# -------------------------------------------------
+# Server
+# -------------------------------------------------
+class RetrievalService:
+    def __init__(
+        self,
+        embedder,
+        registry,
+        index_dirs: List[Path],
+        window_ms: float = 3.0,
+        max_batch: int = 64,
+    ):
+        """
+        index_dirs:
+            the only index directories clients may search
+        """
+        self.embedder = embedder
+        self.registry = registry
+        self.allowed = {Path(p).resolve() for p in index_dirs}
+
+        self.encoder = MicroBatcher(self._encode_batch, window_ms, max_batch, name="encode")
+        self.searcher = MicroBatcher(self._search_batch, window_ms, max_batch, name="search")
+
+    def info(self) -> Dict:
+        return {
+            "model_name": self.embedder.model_name,
+            "cache_key": getattr(self.embedder, "cache_key", self.embedder.model_name),
+            "dim": int(self.embedder.get_sentence_embedding_dimension()),
+        }
+
+    def stats(self) -> Dict:
+        return {
+            **self.info(),
+            "encode": self.encoder.snapshot(),
+            "search": self.searcher.snapshot(),
+            "indexes": self.registry.report(),
+        }
+
+    def _encode_batch(self, requests: List[List[str]]) -> List[np.ndarray]:
+        # One forward pass for every queued text; repeats hit the shared query cache
+        texts = [t for texts in requests for t in texts]
+        vecs = query_cache().encode_many(self.embedder, texts)
+
+        out, start = [], 0
+        for texts in requests:
+            out.append(vecs[start:start + len(texts)])
+            start += len(texts)
+        return out
+
+    def _search_batch(self, requests: List[Dict]) -> List:
+        groups: Dict[tuple, List[int]] = {}
+        for i, r in enumerate(requests):
+            projects = tuple(sorted(r["projects"])) if r["projects"] is not None else None
+            key = (r["index_dir"], r["top_k"], projects, r["mmr_lambda"])
+            groups.setdefault(key, []).append(i)
+
+        results: List = [None] * len(requests)
+        for (index_dir, top_k, projects, mmr_lambda), rows in groups.items():
+            query_vecs = np.concatenate([requests[i]["query_vecs"] for i in rows])
+            query_texts = [t for i in rows for t in requests[i]["query_texts"]]
+
+            try:
+                retriever = self.registry.get(Path(index_dir), name=requests[rows[0]]["name"])
+                found = retriever.retrieve_batch(
+                    query_vecs,
+                    top_k=top_k,
+                    projects=list(projects) if projects is not None else None,
+                    query_texts=query_texts,
+                    mmr_lambda=mmr_lambda,
+                )
+            except Exception as e:
+                # A broken index only fails the requests that asked for it
+                for i in rows:
+                    results[i] = e
+                continue
+
+            start = 0
+            for i in rows:
+                n = len(requests[i]["query_vecs"])
+                results[i] = found[start:start + n]
+                start += n
+        return results
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.encoder.submit(texts)
+
+    def search(self, request: Dict) -> List[List[Dict]]:
+        index_dir = Path(request["index_dir"]).resolve()
+        if index_dir not in self.allowed:
+            raise PermissionError(f"index {index_dir} is not served here")
+
+        vecs = unpack_array(request["query_vecs"])
+        return self.searcher.submit({
+            "index_dir": str(index_dir),
+            "name": request.get("name"),
+            "query_vecs": vecs,
+            "query_texts": request.get("query_texts") or [None] * len(vecs),
+            "top_k": int(request.get("top_k", 5)),
+            "projects": request.get("projects"),
+            "mmr_lambda": request.get("mmr_lambda"),
+        })
+
+
+def make_handler(service: RetrievalService):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            # Headers and body go out as separate writes; without this, Nagle +
+            # delayed ACK adds ~40 ms to every keep-alive request
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send_json(self, status: int, payload: Dict) -> None:
+            body = json.dumps(payload, ensure_ascii=False, default=_json_default).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/info":
+                self._send_json(200, service.info())
+            elif self.path == "/stats":
+                self._send_json(200, service.stats())
+            else:
+                self._send_json(404, {"error": "unknown path"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length) or b"{}")
+
+            try:
+                if self.path == "/encode":
+                    self._send_json(200, {"vectors": pack_array(service.encode(request["texts"]))})
+                elif self.path == "/search":
+                    self._send_json(200, {"results": service.search(request)})
+                else:
+                    self._send_json(404, {"error": "unknown path"})
+            except PermissionError as e:
+                self._send_json(403, {"error": str(e)})
+            except Exception as e:
+                self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+
+    return Handler
+
+
+def serve(service: RetrievalService, host: str = "127.0.0.1", port: int = 8766):
+    """
+    Start the service in a background thread and return the server.
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# -------------------------------------------------
+# Client
+# -------------------------------------------------
+class ServiceError(RuntimeError):
+    pass
+
+
+class ServiceClient:
+    """
+    Keep-alive HTTP connection per calling thread.
+    """
+
+    def __init__(self, url: str, timeout_s: float = 30.0):
+        parts = urlsplit(url)
+        self.url = url
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.timeout_s = timeout_s
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout_s)
+            self._local.conn = conn
+        return conn
+
+    def request(self, method: str, path: str, payload: Optional[Dict] = None) -> Dict:
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = json.loads(response.read() or b"{}")
+                break
+            except (ConnectionError, http.client.HTTPException, OSError):
+                # Stale keep-alive connection (e.g. service restarted): reconnect once
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+
+        if response.status != 200:
+            raise ServiceError(f"{self.url}{path}: {response.status} {data.get('error')}")
+        return data
+
+
+class RemoteEmbedder:
+    """
+    Embedder interface (encode, get_sentence_embedding_dimension,
+    model_name, cache_key) backed by the service.
+    """
+
+    backend = "service"
+
+    def __init__(self, client: ServiceClient):
+        self.client = client
+        info = client.request("GET", "/info")
+        self.model_name = info["model_name"]
+        self.cache_key = info["cache_key"]
+        self._dim = info["dim"]
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self._dim
+
+    def encode(self, texts, batch_size: int = 32, **kwargs) -> np.ndarray:
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        if not texts:
+            return np.zeros((0, self._dim), dtype=np.float32)
+
+        vecs = unpack_array(self.client.request("POST", "/encode", {"texts": texts})["vectors"])
+        return vecs[0] if single else vecs
+
+
+class RemoteRetriever:
+    """
+    Retriever interface for one index served by the service.
+    """
+
+    def __init__(self, client: ServiceClient, index_dir: Path, embedder, name: Optional[str] = None):
+        self.client = client
+        self.index_dir = Path(index_dir).resolve()
+        self.embedder = embedder
+        self.name = name or self.index_dir.name
+
+    def retrieve(self, query: str, top_k: int = 5, projects=None) -> List[Dict]:
+        return self.retrieve_by_vector(
+            encode_query(self.embedder, query), top_k=top_k, projects=projects, query_text=query
+        )
+
+    def retrieve_by_vector(
+        self,
+        query_vec: np.ndarray,
+        top_k: int = 5,
+        projects=None,
+        query_text: str = None,
+        mmr_lambda: float = None,
+    ) -> List[Dict]:
+        return self.retrieve_batch(
+            np.asarray(query_vec).reshape(1, -1),
+            top_k=top_k,
+            projects=projects,
+            query_texts=[query_text],
+            mmr_lambda=mmr_lambda,
+        )[0]
+
+    def retrieve_batch(
+        self,
+        query_vecs: np.ndarray,
+        top_k: int = 5,
+        projects=None,
+        query_texts: List[Optional[str]] = None,
+        mmr_lambda: float = None,
+    ) -> List[List[Dict]]:
+        query_vecs = np.asarray(query_vecs, dtype=np.float32).reshape(len(query_vecs), -1)
+        with span("retrieve", index=self.name, queries=len(query_vecs), top_k=top_k, remote=True):
+            return self.client.request("POST", "/search", {
+                "index_dir": str(self.index_dir),
+                "name": self.name,
+                "query_vecs": pack_array(query_vecs),
+                "query_texts": list(query_texts) if query_texts is not None else None,
+                "top_k": top_k,
+                "projects": list(projects) if projects is not None else None,
+                "mmr_lambda": mmr_lambda,
+            })["results"]
+
+
+class RemoteRegistry:
+    """
+    RetrieverRegistry interface; indexes are loaded (and reloaded) by the service.
+    """
+
+    def __init__(self, client: ServiceClient, embedder):
+        self.client = client
+        self.embedder = embedder
+        self._retrievers: Dict[Path, RemoteRetriever] = {}
+
+    def get(self, index_dir: Path, name: Optional[str] = None) -> RemoteRetriever:
+        key = Path(index_dir).resolve()
+        if key not in self._retrievers:
+            self._retrievers[key] = RemoteRetriever(self.client, key, self.embedder, name=name)
+        return self._retrievers[key]
+
+    def invalidate(self, index_dir: Optional[Path] = None) -> None:
+        pass
+
+    def report(self) -> List[Dict]:
+        return self.client.request("GET", "/stats")["indexes"]
+
+
+def connect(url: str, timeout_s: float = 30.0):
+    """
+    (RemoteEmbedder, RemoteRegistry) for a running service.
+    """
+    client = ServiceClient(url, timeout_s=timeout_s)
+    embedder = RemoteEmbedder(client)
+    return embedder, RemoteRegistry(client, embedder)
+
+
+# -------------------------------------------------
+# CLI
+# -------------------------------------------------
+def _parse_args(argv=None) -> argparse.Namespace:
+    import config
+
+    url = urlsplit(config.SERVICE_URL or "http://127.0.0.1:8766")
+    parser = argparse.ArgumentParser(description="Shared embedding / retrieval service.")
+    parser.add_argument("--host", default=url.hostname)
+    parser.add_argument("--port", type=int, default=url.port)
+    parser.add_argument("--window-ms", type=float, default=config.SERVICE_BATCH_WINDOW_MS)
+    parser.add_argument("--max-batch", type=int, default=config.SERVICE_MAX_BATCH)
+    return parser.parse_args(argv)
+
+
+def build_service(window_ms: float, max_batch: int) -> RetrievalService:
+    import config
+    from rag.embeddings import load_embedder
+    from rag.retrieval.registry import RetrieverRegistry
+
+    embedder = load_embedder(
+        config.EMBEDDING_MODEL, config.EMBEDDING_BACKEND, config.EMBEDDING_MODEL_DIR
+    )
+    registry = RetrieverRegistry(
+        embedder=embedder,
+        hybrid=config.HYBRID_RETRIEVAL,
+        rrf_k=config.RRF_K,
+    )
+    index_dirs = [cfg["index_path"] for cfg in config.PROJECTS.values()]
+    index_dirs.append(config.COMBINED_INDEX_PATH)
+
+    return RetrievalService(embedder, registry, index_dirs, window_ms=window_ms, max_batch=max_batch)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    service = build_service(args.window_ms, args.max_batch)
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    server.daemon_threads = True
+    print(
+        f"[OK] retrieval service ({service.embedder.model_name}) on "
+        f"http://{args.host}:{args.port}, batch window {args.window_ms:g} ms"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+"""
+Cheap token-count estimates shared by prompt budgeting and rate limiting.
+
+Gemini's tokenizer is not available locally; ~4 characters per token is
+close enough for English prose and code to size budgets conservatively.
+"""
+
+import math
+
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
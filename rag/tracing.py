@@ -0,0 +1,204 @@
+"""
+Lightweight spans for the query path.
+
+Design:
+- span(name, **attributes) is a context manager; nesting follows contextvars,
+  so spans opened in worker threads are parented correctly when the task is
+  submitted through contextvars.copy_context().run.
+- start_trace() opens a root span whose Trace collects every finished span,
+  e.g. for display in the UI.
+- Finished spans are exported to an optional sink; JsonlSink writes one
+  OpenTelemetry-shaped record per line (trace/span ids, unix-nano times,
+  attributes, status).
+- With no active trace and no sink, span() does no bookkeeping at all.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+
+def _new_id(n_bytes: int) -> str:
+    return os.urandom(n_bytes).hex()
+
+
+class Trace:
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or _new_id(16)
+        self.spans: List["Span"] = []
+        self._lock = threading.Lock()
+
+    def record(self, span: "Span") -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self) -> List[Dict]:
+        """
+        Finished spans in start order, with their nesting depth.
+        """
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start_ns)
+
+        depth: Dict[str, int] = {}
+        rows = []
+        for s in spans:
+            depth[s.span_id] = depth.get(s.parent_id, -1) + 1 if s.parent_id else 0
+            rows.append({
+                "stage": "  " * depth[s.span_id] + s.name,
+                "ms": round(s.duration_ms, 2),
+                "status": s.status,
+                **s.attributes,
+            })
+        return rows
+
+
+class Span:
+    __slots__ = (
+        "name", "trace", "span_id", "parent_id", "attributes",
+        "start_ns", "end_ns", "_t0", "duration_ms", "status", "error",
+    )
+
+    def __init__(self, name: str, trace: Trace, parent_id: Optional[str], attributes: Dict):
+        self.name = name
+        self.trace = trace
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes)
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self._t0 = time.perf_counter()
+        self.duration_ms = 0.0
+        self.status = "OK"
+        self.error = None
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def _finish(self) -> None:
+        self.duration_ms = (time.perf_counter() - self._t0) * 1000
+        self.end_ns = self.start_ns + int(self.duration_ms * 1e6)
+
+    def as_record(self) -> Dict:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "status": {"code": self.status, "message": self.error},
+        }
+
+
+class _NoopSpan:
+    def set(self, **attributes) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+_current: ContextVar[Optional[Span]] = ContextVar("rag_span", default=None)
+_sink = None
+
+
+class JsonlSink:
+    """
+    Appends one JSON record per finished span to path.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.as_record(), ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+def set_sink(sink) -> None:
+    """
+    Export finished spans to sink (anything with export(span)); None disables.
+    """
+    global _sink
+    _sink = sink
+
+
+@contextmanager
+def _open_span(name: str, trace: Trace, parent_id: Optional[str], attributes: Dict) -> Iterator[Span]:
+    s = Span(name, trace, parent_id, attributes)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.status = "ERROR"
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        s._finish()
+        _current.reset(token)
+        trace.record(s)
+        if _sink is not None:
+            _sink.export(s)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time a stage as a child of the current span (or as a new trace root if
+    a sink is set). Yields an object with set(**attributes).
+    """
+    parent = _current.get()
+    if parent is None and _sink is None:
+        yield _NOOP
+        return
+
+    trace = parent.trace if parent is not None else Trace()
+    parent_id = parent.span_id if parent is not None else None
+    with _open_span(name, trace, parent_id, attributes) as s:
+        yield s
+
+
+@contextmanager
+def start_trace(name: str, **attributes) -> Iterator[Span]:
+    """
+    Open a root span with a fresh Trace; span.trace collects all children.
+    """
+    with _open_span(name, Trace(), None, attributes) as s:
+        yield s
+
+
+def record(name: str, start_ns: int, duration_ms: float, error: Optional[str] = None, **attributes):
+    """
+    Record an already finished stage (e.g. a consumed stream) under the
+    current span; for code that cannot hold a context manager open.
+    """
+    parent = _current.get()
+    if parent is None and _sink is None:
+        return
+
+    trace = parent.trace if parent is not None else Trace()
+    s = Span(name, trace, parent.span_id if parent is not None else None, attributes)
+    s.start_ns = start_ns
+    s.duration_ms = duration_ms
+    s.end_ns = start_ns + int(duration_ms * 1e6)
+    if error:
+        s.status, s.error = "ERROR", error
+    trace.record(s)
+    if _sink is not None:
+        _sink.export(s)
@@ -0,0 +1,45 @@
+"""
+QueryEngine without an embedder: callers that always pass query vectors
+(benchmarks/run.py synthetic, the retrieval service) build it with
+embedder=None.
+
+Run from the repo root:
+    python -m pytest tests
+"""
+
+import numpy as np
+
+from rag.engine import ALL_PROJECTS, QueryEngine, RetrievalResult
+from rag.llm.answer_cache import AnswerCache
+from rag.retrieval.context import ContextReport
+
+
+def make_retrieval(question: str, query_vec: np.ndarray) -> RetrievalResult:
+    return RetrievalResult(
+        question=question,
+        scope=ALL_PROJECTS,
+        query_vec=query_vec,
+        docs=[],
+        context="[1] some context",
+        context_report=ContextReport(None, 0, 0, 0, 0, 0),
+    )
+
+
+def test_engine_builds_without_embedder(tmp_path):
+    cache = AnswerCache(tmp_path / "answers.sqlite")
+    engine = QueryEngine(
+        embedder=None,
+        registry=None,
+        project_indexes={},
+        answer_cache=cache,
+    )
+
+    vec = np.ones(8, dtype=np.float32)
+    engine.store_answer(make_retrieval("What does it do?", vec), "It does things.", "stub")
+
+    exact = engine.lookup_cached(make_retrieval("what does it do?", vec))
+    assert exact is not None and exact.match == "exact"
+
+    semantic = engine.lookup_cached(make_retrieval("What is it for?", vec))
+    assert semantic is not None and semantic.match == "semantic"
+    cache.close()
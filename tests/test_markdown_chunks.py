@@ -0,0 +1,64 @@
+"""
+Token-bounded Markdown chunking (rag/ingestion/markdown_chunks.py):
+overlap text and byte offsets of consecutive chunks.
+
+Run from the repo root:
+    python -m pytest tests
+"""
+
+from pathlib import Path
+
+import pytest
+
+from rag.ingestion.markdown_chunks import chunk_markdown
+
+
+def chunks_of(text: str, **kwargs):
+    data = text.encode("utf-8")
+    return data, list(chunk_markdown(text.splitlines(keepends=True), **kwargs))
+
+
+def assert_overlaps(data: bytes, chunks):
+    """
+    Check offsets and overlap of consecutive chunks; returns how many
+    chunks start with an overlap carried from the previous one.
+    """
+    for chunk in chunks:
+        assert chunk.text.strip() and not chunk.text[0].isspace(), repr(chunk.text[:40])
+        if not chunk.text.startswith("```"):
+            # Split code re-adds its fence; everything else starts at .start
+            first = chunk.text.split(None, 1)[0]
+            assert data[chunk.start:].decode("utf-8", "replace").startswith(first)
+
+    carried = 0
+    for prev, chunk in zip(chunks, chunks[1:]):
+        assert chunk.start >= prev.start
+        if chunk.heading_path != prev.heading_path or chunk.start >= prev.end:
+            continue
+        carried += 1
+        # The overlap is the end of the previous chunk, byte for byte
+        # (minus trailing whitespace, which is never carried)
+        overlap = data[chunk.start:prev.end].decode("utf-8").rstrip()
+        assert overlap.strip()
+        assert prev.text.rstrip().endswith(overlap)
+        assert chunk.text.startswith(overlap)
+    return carried
+
+
+def test_overlap_skips_trailing_whitespace():
+    # Markdown hard breaks leave trailing spaces on every line of the paragraph
+    lines = [f"Sentence number {i} explains one more detail of the setup.  " for i in range(40)]
+    data, chunks = chunks_of("# Guide\n\n" + "\n".join(lines) + "\n", max_tokens=60, overlap_tokens=8)
+
+    assert len(chunks) > 2
+    assert assert_overlaps(data, chunks) == len(chunks) - 1
+
+
+def test_overlap_and_offsets_on_a_readme():
+    path = Path("projects/ml_category_classifier/README.md")
+    if not path.exists():
+        pytest.skip("bundled project READMEs not checked out")
+
+    data = path.read_bytes()
+    chunks = list(chunk_markdown(data.decode("utf-8").splitlines(keepends=True)))
+    assert assert_overlaps(data, chunks) > 0
@@ -0,0 +1,44 @@
+"""
+Batch input parsing (rag/query.py): a bad line fails only its own record.
+
+Run from the repo root:
+    python -m pytest tests
+"""
+
+import json
+
+from rag.engine import ALL_PROJECTS
+from rag.query import _error_record, read_questions
+
+
+def test_bad_jsonl_lines_become_per_line_errors(tmp_path):
+    path = tmp_path / "questions.jsonl"
+    path.write_text(
+        "\n".join([
+            json.dumps({"question": "What is indexed?"}),
+            '{"question": "unterminated',
+            json.dumps({"project": ALL_PROJECTS}),
+            "",
+            json.dumps({"question": "Which model?", "project": "no-such-project"}),
+            json.dumps(["not", "an", "object"]),
+            json.dumps({"question": "Last one"}),
+        ]),
+        encoding="utf-8",
+    )
+
+    items = read_questions(path, ALL_PROJECTS)
+    assert len(items) == 6
+
+    assert items[0] == ("What is indexed?", ALL_PROJECTS, None)
+    assert items[5] == ("Last one", ALL_PROJECTS, None)
+
+    errors = [error for _, _, error in items[1:5]]
+    assert errors[0].startswith("line 2: JSONDecodeError")
+    assert errors[1].startswith('line 3: ValueError: expected an object with a "question"')
+    assert errors[2].startswith("line 5: ValueError: unknown project 'no-such-project'")
+    assert errors[3].startswith("line 6: ValueError")
+
+    # The raw line identifies the failed input in the output record
+    record = _error_record(*items[1])
+    assert record["question"] == '{"question": "unterminated'
+    assert record["error"] == errors[0]
@@ -0,0 +1,49 @@
+"""
+Rebuilding an index while a RetrieverRegistry is serving it: the running
+retriever keeps reading its own (old) artifacts, and the registry reloads
+once the new index_meta.json is in place.
+
+Run from the repo root:
+    python -m pytest tests
+"""
+
+import numpy as np
+
+import build_index
+from rag.indexing.artifacts import is_temp_file
+from rag.retrieval.registry import RetrieverRegistry
+
+
+DIM = 8
+
+
+def write_index(index_dir, texts, seed):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((len(texts), DIM)).astype(np.float32)
+    docs = [{"text": t, "source": "notes.txt", "type": "text"} for t in texts]
+    build_index.write_project_index("test", index_dir, docs, vectors, DIM)
+    return vectors
+
+
+def test_rebuild_does_not_disturb_a_loaded_retriever(tmp_path):
+    old_texts = [f"old chunk {i} " + "x" * 200 for i in range(20)]
+    old_vectors = write_index(tmp_path, old_texts, seed=0)
+
+    registry = RetrieverRegistry(embedder=None)
+    old = registry.get(tmp_path)
+    assert registry.get(tmp_path) is old
+
+    # Smaller rebuild: rewriting in place would truncate the old mappings
+    new_texts = [f"new chunk {i}" for i in range(3)]
+    write_index(tmp_path, new_texts, seed=1)
+
+    docs = old.retrieve_by_vector(old_vectors[5], top_k=3)
+    assert docs[0]["text"] == old_texts[5]
+    assert all(d["text"] in old_texts for d in docs)
+
+    new = registry.get(tmp_path)
+    assert new is not old
+    assert {d["text"] for d in new.retrieve_by_vector(old_vectors[5], top_k=3)} <= set(new_texts)
+    assert registry.report()[0]["loads"] == 2
+
+    assert not [p.name for p in tmp_path.iterdir() if is_temp_file(p.name)]
@@ -0,0 +1,60 @@
+"""
+Hybrid (dense + BM25) retrieval with MMR on a tiny index written by the
+real build path (build_index.write_project_index).
+
+Run from the repo root:
+    python -m pytest tests
+"""
+
+import numpy as np
+
+import build_index
+from rag.retrieval.retrieve import Retriever
+
+
+DIM = 8
+
+
+def write_index(index_dir, texts, vectors):
+    docs = [{"text": t, "source": "notes.txt", "type": "text"} for t in texts]
+    build_index.write_project_index("test", index_dir, docs, vectors, DIM)
+    return Retriever(index_dir, embedder=None)
+
+
+def test_bm25_only_keyword_hit_survives_mmr(tmp_path):
+    rng = np.random.default_rng(0)
+    query = np.eye(DIM, dtype=np.float32)[0]
+
+    # Nine near-duplicates close to the query, and one keyword-only chunk
+    # orthogonal to it that the dense search alone never returns
+    near = query + 0.05 * rng.standard_normal((9, DIM)).astype(np.float32)
+    keyword = np.eye(DIM, dtype=np.float32)[1:2]
+    texts = [f"general overview paragraph {i}" for i in range(9)]
+    texts.append("set the zyxqwv flag to enable batching")
+
+    retriever = write_index(tmp_path, texts, np.vstack([near, keyword]))
+    assert retriever.lexical is not None and retriever.embeddings is not None
+
+    docs = retriever.retrieve_by_vector(query, top_k=3, query_text="zyxqwv", mmr_lambda=0.7)
+    texts_found = [d["text"] for d in docs]
+
+    assert texts[-1] in texts_found
+    hit = docs[texts_found.index(texts[-1])]
+    # "score" stays the calibrated cosine; fusion lives in "rrf_score"
+    assert abs(hit["score"]) < 0.1
+    assert hit["bm25_score"] > 0 and hit["rrf_score"] > 0
+
+
+def test_mmr_without_keyword_match_uses_cosine(tmp_path):
+    rng = np.random.default_rng(1)
+    query = np.eye(DIM, dtype=np.float32)[0]
+    vectors = query + 0.3 * rng.standard_normal((12, DIM)).astype(np.float32)
+    texts = [f"chunk {i}" for i in range(12)]
+
+    retriever = write_index(tmp_path, texts, vectors)
+    docs = retriever.retrieve_by_vector(query, top_k=4, query_text="nomatch", mmr_lambda=1.0)
+
+    # lambda 1.0 is pure relevance: the dense order by cosine
+    scores = [d["score"] for d in docs]
+    assert scores == sorted(scores, reverse=True)
+    assert "rrf_score" not in docs[0]
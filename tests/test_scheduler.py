@@ -0,0 +1,149 @@
+"""
+LLMScheduler against the local Gemini stand-in (rag/llm/stub_server.py).
+
+Every request goes over HTTP through the google-genai client, as in the
+app; the scheduler's sleep is recorded instead of slept, so backoff and
+budget waits are asserted without slowing the suite down.
+
+Run from the repo root:
+    python -m pytest tests
+"""
+
+import pytest
+
+genai = pytest.importorskip("google.genai")
+
+from rag.llm.scheduler import LLMScheduler, ModelBudget
+from rag.llm.stub_server import StubSettings, serve
+
+
+PRIMARY = "models/primary"
+FALLBACK = "models/fallback"
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**kwargs):
+        settings = StubSettings(seed=0, **kwargs)
+        server = serve(port=0, settings=settings)
+        servers.append(server)
+        client = genai.Client(
+            api_key="stub",
+            http_options={"base_url": f"http://127.0.0.1:{server.server_address[1]}"},
+        )
+        return settings, client
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def make_scheduler(sleeps, fallback=FALLBACK, rpm=600, **kwargs):
+    return LLMScheduler(
+        budgets={PRIMARY: ModelBudget(rpm, 1_000_000), FALLBACK: ModelBudget(rpm, 1_000_000)},
+        primary=PRIMARY,
+        fallback=fallback,
+        sleep=sleeps.append,
+        **kwargs,
+    )
+
+
+def ask(scheduler, client):
+    response, model = scheduler.run(
+        lambda m: client.models.generate_content(model=m, contents="hi"), tokens=10
+    )
+    return response.text, model
+
+
+def test_quota_429_moves_to_fallback_without_retrying(stub):
+    settings, client = stub(rpm=2, retry_delay_s=30)
+    sleeps = []
+    scheduler = make_scheduler(sleeps)
+
+    assert ask(scheduler, client)[1] == PRIMARY
+    assert ask(scheduler, client)[1] == PRIMARY
+    assert ask(scheduler, client)[1] == FALLBACK
+
+    snapshot = scheduler.snapshot()
+    assert snapshot["retries"] == 0
+    assert snapshot["fallbacks"] == 1
+    assert sleeps == []
+
+    # The primary stays blocked for the retryDelay hint: not even tried
+    assert ask(scheduler, client)[1] == FALLBACK
+    assert settings.requests["primary"] == 3
+    assert settings.requests["fallback"] == 2
+    assert scheduler.snapshot()["fallbacks"] == 2
+
+
+def test_503_backoff_is_bounded_then_falls_back(stub):
+    settings, client = stub(fail_rate=1.0, fail_status=503, retry_delay_s=30)
+    sleeps = []
+    scheduler = make_scheduler(sleeps, max_retries=3, backoff_max_s=0.5)
+
+    with pytest.raises(genai.errors.ServerError):
+        ask(scheduler, client)
+
+    # max_retries retries per model, then the fallback gets its own
+    assert settings.requests["primary"] == 4
+    assert settings.requests["fallback"] == 4
+    snapshot = scheduler.snapshot()
+    assert snapshot["retries"] == 6
+    assert snapshot["fallbacks"] == 1
+    assert len(sleeps) == 6
+    # The 30 s retryDelay hint is honoured only up to backoff_max_s
+    assert all(0 <= s <= 0.5 for s in sleeps)
+
+
+def test_503_without_fallback_raises_after_max_retries(stub):
+    settings, client = stub(fail_rate=1.0, fail_status=503)
+    sleeps = []
+    scheduler = make_scheduler(sleeps, fallback=None, max_retries=2)
+
+    with pytest.raises(genai.errors.ServerError):
+        ask(scheduler, client)
+
+    assert settings.requests["primary"] == 3
+    assert scheduler.snapshot()["retries"] == 2
+
+
+def test_every_attempt_reserves_budget(stub):
+    _, client = stub(fail_rate=1.0, fail_status=503)
+    scheduler = make_scheduler([], fallback=None, rpm=60, max_retries=3)
+
+    with pytest.raises(genai.errors.ServerError):
+        ask(scheduler, client)
+
+    # One request token per attempt (1 + 3 retries), refill is ~1 per second
+    assert scheduler.budgets[PRIMARY].requests.tokens == pytest.approx(56, abs=0.5)
+    assert scheduler.snapshot()["requests"][PRIMARY] == 4
+
+
+def test_token_bucket_waits_when_rpm_is_spent(stub):
+    settings, client = stub()
+    sleeps = []
+    scheduler = make_scheduler(sleeps, fallback=None, rpm=2)
+
+    for _ in range(3):
+        assert ask(scheduler, client)[1] == PRIMARY
+
+    snapshot = scheduler.snapshot()
+    assert snapshot["waits"] == 1
+    # 2 requests per minute: the third waits about 30 s for a refill
+    assert snapshot["max_wait_s"] == pytest.approx(30, abs=1)
+    assert sleeps == [pytest.approx(30, abs=1)]
+    assert settings.requests["primary"] == 3
+
+
+def test_spent_local_budget_routes_to_fallback(stub):
+    settings, client = stub()
+    scheduler = make_scheduler([], rpm=1, max_budget_wait_s=2.0)
+
+    assert ask(scheduler, client)[1] == PRIMARY
+    # Waiting ~60 s for the primary exceeds max_budget_wait_s
+    assert ask(scheduler, client)[1] == FALLBACK
+    assert scheduler.snapshot()["fallbacks"] == 1
+    assert settings.requests["primary"] == 1
@@ -0,0 +1,113 @@
+"""
+MicroBatcher (rag/service.py) under concurrent submits: flush on size,
+flush on timeout and error propagation.
+
+Run from the repo root:
+    python -m pytest tests
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from rag.service import MicroBatcher
+
+
+def submit_all(batcher, items):
+    """
+    Submit every item from its own thread at (nearly) the same time.
+    Returns one result or exception per item, in item order.
+    """
+    barrier = threading.Barrier(len(items))
+
+    def one(item):
+        barrier.wait()
+        try:
+            return batcher.submit(item)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=len(items)) as pool:
+        return list(pool.map(one, items))
+
+
+def test_flushes_when_the_batch_is_full():
+    calls = []
+
+    def double(items):
+        calls.append(list(items))
+        return [2 * x for x in items]
+
+    # A window far longer than the test: only max_batch can trigger the flush
+    batcher = MicroBatcher(double, window_ms=30_000, max_batch=4)
+
+    start = time.perf_counter()
+    assert submit_all(batcher, [1, 2, 3, 4]) == [2, 4, 6, 8]
+    assert time.perf_counter() - start < 5
+
+    assert [sorted(c) for c in calls] == [[1, 2, 3, 4]]
+    assert batcher.snapshot() == {
+        "batches": 1, "items": 4, "mean_batch": 4.0, "largest_batch": 4,
+    }
+
+
+def test_flushes_a_partial_batch_after_the_window():
+    batcher = MicroBatcher(lambda items: [x + 1 for x in items], window_ms=50, max_batch=64)
+
+    start = time.perf_counter()
+    assert batcher.submit(1) == 2
+    elapsed = time.perf_counter() - start
+
+    assert 0.04 <= elapsed < 2
+    assert batcher.snapshot()["batches"] == 1
+    assert batcher.snapshot()["largest_batch"] == 1
+
+
+def test_concurrent_submits_share_batches():
+    batcher = MicroBatcher(lambda items: [x * x for x in items], window_ms=200, max_batch=8)
+
+    items = list(range(16))
+    assert submit_all(batcher, items) == [x * x for x in items]
+
+    snapshot = batcher.snapshot()
+    assert snapshot["items"] == 16
+    assert snapshot["largest_batch"] <= 8
+    assert snapshot["batches"] < 16
+
+
+def test_a_failing_batch_fails_every_caller():
+    def broken(items):
+        raise ValueError("model crashed")
+
+    batcher = MicroBatcher(broken, window_ms=200, max_batch=3)
+    results = submit_all(batcher, ["a", "b", "c"])
+
+    assert all(isinstance(r, ValueError) for r in results)
+
+    # The worker thread survives and serves the next batch
+    batcher.fn = lambda items: [x.upper() for x in items]
+    assert batcher.submit("d") == "D"
+
+
+def test_per_item_exceptions_fail_only_their_caller():
+    def picky(items):
+        return [KeyError(x) if x < 0 else x for x in items]
+
+    batcher = MicroBatcher(picky, window_ms=30_000, max_batch=4)
+    results = submit_all(batcher, [1, -2, 3, -4])
+
+    assert results[0] == 1 and results[2] == 3
+    assert isinstance(results[1], KeyError) and isinstance(results[3], KeyError)
+
+
+def test_wrong_number_of_results_fails_instead_of_hanging():
+    batcher = MicroBatcher(lambda items: items[:1], window_ms=30_000, max_batch=3)
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        results = pool.submit(submit_all, batcher, [1, 2, 3]).result(timeout=10)
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    with pytest.raises(RuntimeError, match="0 results for 1 items"):
+        MicroBatcher(lambda items: [], window_ms=0).submit(1)